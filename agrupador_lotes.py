@@ -0,0 +1,150 @@
+# agrupador_lotes.py
+# ------------------
+# Este módulo implementa un "micro-batching" dinámico: las peticiones de
+# reconocimiento que llegan dentro de una ventana corta de tiempo se agrupan
+# en un solo lote, que pasa por una única inferencia MTCNN + PCA
+# (extraer_embeddings_pca_lote). Cada petición recibe su propio resultado.
+#
+# La detección agrupa las imágenes del lote por tamaño (ver
+# preprocesar_caras_lote): solo las de las mismas dimensiones comparten una
+# inferencia MTCNN. Con subidas de tamaños distintos cada imagen se detecta
+# por separado y el lote solo ahorra el paso por el pool y el PCA conjunto.
+# Una caja detectada en lote puede diferir en unos píxeles de la individual,
+# así que el embedding de una foto no es bit a bit el de /recognize/ sin lotes.
+
+import asyncio
+import os
+
+from pool_embeddings import ColaLlenaError
+
+# --- Configuración del Micro-batching ---
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() == "true"
+# Tamaño máximo de un lote
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "8"))
+# Tiempo máximo (ms) que la primera petición de un lote espera a que lleguen otras
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "10"))
+# Máximo de peticiones pendientes (en cola o en un lote en proceso); al
+# superarlo se responde 503, igual que con la cola del pool de embeddings
+MICRO_BATCH_QUEUE_SIZE = int(os.getenv("MICRO_BATCH_QUEUE_SIZE", "64"))
+
+
+class AgrupadorLotes:
+    """
+    Agrupa elementos enviados concurrentemente y los procesa por lotes.
+
+    Un lote reúne peticiones por tiempo de llegada, no por tamaño de imagen:
+    la función de lote decide cómo subdividirlo (la detección lo hace por
+    dimensiones de la imagen).
+
+    Args:
+        funcion_lote (callable): Recibe una lista de elementos y devuelve una
+                                 lista de resultados del mismo largo y orden.
+        ejecutor (callable): Corutina ejecutor(funcion, *args) que corre la
+                             función fuera del event loop (ej. pool_embeddings.ejecutar).
+        max_lote (int): Número máximo de elementos por lote.
+        max_espera_ms (float): Espera máxima para completar un lote.
+        max_pendientes (int): Máximo de elementos pendientes antes de
+                              rechazar nuevos envíos con ColaLlenaError.
+    """
+
+    def __init__(self, funcion_lote, ejecutor, max_lote=MICRO_BATCH_MAX_SIZE,
+                 max_espera_ms=MICRO_BATCH_MAX_WAIT_MS, max_pendientes=MICRO_BATCH_QUEUE_SIZE):
+        self._funcion_lote = funcion_lote
+        self._ejecutor = ejecutor
+        self.max_lote = max(1, max_lote)
+        self.max_espera = max(0.0, max_espera_ms) / 1000.0
+        self.max_pendientes = max(1, max_pendientes)
+        self._pendientes = 0
+        self._cola = None
+        self._tarea = None
+        # Referencias a los lotes en proceso (evita que el GC recoja las tareas)
+        self._en_curso = set()
+        # Estadísticas simples para monitoreo
+        self.lotes_procesados = 0
+        self.elementos_procesados = 0
+
+    @property
+    def tamaño_medio_lote(self):
+        if self.lotes_procesados == 0:
+            return 0.0
+        return self.elementos_procesados / self.lotes_procesados
+
+    def _asegurar_tarea(self):
+        # La cola y la tarea se crean dentro del event loop que las va a usar
+        if self._tarea is None or self._tarea.done():
+            self._cola = asyncio.Queue()
+            self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+
+    async def enviar(self, elemento):
+        """
+        Encola un elemento y espera el resultado de su lote.
+
+        Raises:
+            ColaLlenaError: Si ya hay max_pendientes elementos sin resolver.
+        """
+        if self._pendientes >= self.max_pendientes:
+            raise ColaLlenaError(
+                f"Hay {self._pendientes} peticiones pendientes de micro-batching"
+            )
+        self._asegurar_tarea()
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes += 1
+        try:
+            self._cola.put_nowait((elemento, futuro))
+            return await futuro
+        finally:
+            self._pendientes -= 1
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _bucle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Bloquear hasta que llegue el primer elemento de un lote nuevo
+            lote = [await self._cola.get()]
+            limite = loop.time() + self.max_espera
+
+            while len(lote) < self.max_lote:
+                # Tomar sin esperar todo lo que ya está encolado
+                if not self._cola.empty():
+                    lote.append(self._cola.get_nowait())
+                    continue
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            # El lote se procesa en segundo plano para seguir agrupando el siguiente
+            tarea = loop.create_task(self._procesar(lote))
+            self._en_curso.add(tarea)
+            tarea.add_done_callback(self._en_curso.discard)
+
+    async def _procesar(self, lote):
+        # Descartar peticiones cuyo cliente ya canceló
+        lote = [(elemento, futuro) for elemento, futuro in lote if not futuro.done()]
+        if not lote:
+            return
+
+        try:
+            resultados = await self._ejecutor(self._funcion_lote, [elemento for elemento, _ in lote])
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.lotes_procesados += 1
+        self.elementos_procesados += len(lote)
+        for (_, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
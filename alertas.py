@@ -0,0 +1,368 @@
+# alertas.py
+# ----------
+# Sistema de alertas: cuando se reconoce a un usuario requisitoriado, la
+# petición solo deja el evento en una cola acotada en memoria (sin E/S), y un
+# hilo escritor lo entrega por lotes a los sumideros configurados: al llenarse
+# un lote o al cumplirse el intervalo de vaciado desde su primer evento.
+#
+# Sumideros disponibles (ALERT_SINKS, separados por comas):
+#   - archivo: líneas JSON en ALERT_LOG_FILE, rotado por tamaño.
+#   - bd:      tabla 'alert_events' (la que consulta GET /alertas/eventos).
+#   - webhook: POST JSON con el lote a ALERT_WEBHOOK_URL (un receptor local
+#              que hace las veces del sistema de notificaciones).
+#
+# Si la cola se llena (los sumideros no dan abasto), los eventos nuevos se
+# descartan y se cuentan: la petición de reconocimiento nunca espera. Las
+# estadísticas de la cola (pendientes, máximo alcanzado, descartes, fallos
+# por sumidero) se publican en /stats/.
+
+import base64
+import binascii
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+
+from serializadores import CursorInvalidoError
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración del Sistema de Alertas ---
+# Eventos que caben en la cola antes de empezar a descartar
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "10000"))
+# Eventos por lote entregado a los sumideros
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "100"))
+# Espera máxima (ms) desde el primer evento de un lote hasta entregarlo
+ALERT_FLUSH_INTERVAL_MS = float(os.getenv("ALERT_FLUSH_INTERVAL_MS", "500"))
+ALERT_SINKS = os.getenv("ALERT_SINKS", "archivo,bd")
+ALERT_LOG_FILE = os.getenv("ALERT_LOG_FILE", "alerts.log")
+# Tamaño a partir del cual se rota el archivo, y copias antiguas conservadas
+ALERT_LOG_MAX_BYTES = int(os.getenv("ALERT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+ALERT_LOG_BACKUPS = int(os.getenv("ALERT_LOG_BACKUPS", "5"))
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+ALERT_WEBHOOK_TIMEOUT = float(os.getenv("ALERT_WEBHOOK_TIMEOUT", "5"))
+# Máximo de eventos por página de GET /alertas/eventos
+ALERT_EVENTS_PAGE_SIZE_MAX = int(os.getenv("ALERT_EVENTS_PAGE_SIZE_MAX", "500"))
+
+ALERT_TYPE_REQUESTED = "USER_RECOGNIZED_REQUESTED"
+
+
+def crear_evento(user_id, user_name, email, telefono, confidence, distance=None, alert_type=ALERT_TYPE_REQUESTED):
+    """Evento de alerta con el formato de siempre de alerts.log."""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_id": str(user_id),
+        "user_name": user_name,
+        "email": email,
+        "telefono": telefono,
+        "confidence": confidence,
+        "distance": distance,
+        "alert_type": alert_type,
+    }
+
+
+class SumideroArchivo:
+    """
+    Añade los eventos como líneas JSON a un archivo, con una sola escritura
+    por lote. Al superar `max_bytes` lo rota como logging.RotatingFileHandler
+    (alerts.log -> alerts.log.1 -> ... -> alerts.log.N).
+    """
+
+    nombre = "archivo"
+
+    def __init__(self, ruta=ALERT_LOG_FILE, max_bytes=ALERT_LOG_MAX_BYTES, copias=ALERT_LOG_BACKUPS):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.copias = copias
+
+    def escribir(self, eventos):
+        with open(self.ruta, "a") as f:
+            f.write("".join(json.dumps(evento) + "\n" for evento in eventos))
+            tamaño = f.tell()
+        if self.max_bytes > 0 and tamaño >= self.max_bytes:
+            self._rotar()
+
+    def _rotar(self):
+        if self.copias <= 0:
+            os.remove(self.ruta)
+            return
+        for i in range(self.copias - 1, 0, -1):
+            origen = f"{self.ruta}.{i}"
+            if os.path.exists(origen):
+                os.replace(origen, f"{self.ruta}.{i + 1}")
+        os.replace(self.ruta, f"{self.ruta}.1")
+
+
+class SumideroBD:
+    """Inserta cada lote en la tabla 'alert_events' con una sola transacción."""
+
+    nombre = "bd"
+
+    def escribir(self, eventos):
+        from database import SessionLocal, AlertEvent
+
+        filas = [
+            {
+                "user_id": uuid.UUID(evento["user_id"]),
+                "user_name": evento["user_name"],
+                "email": evento["email"],
+                "telefono": evento["telefono"],
+                "confidence": evento["confidence"],
+                "distance": evento["distance"],
+                "alert_type": evento["alert_type"],
+                "created_at": datetime.fromisoformat(evento["timestamp"]),
+            }
+            for evento in eventos
+        ]
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(AlertEvent, filas)
+            db.commit()
+        finally:
+            db.close()
+
+
+class SumideroWebhook:
+    """Envía cada lote como {"alerts": [...]} en un POST JSON a `url`."""
+
+    nombre = "webhook"
+
+    def __init__(self, url=ALERT_WEBHOOK_URL, timeout=ALERT_WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def escribir(self, eventos):
+        peticion = urllib.request.Request(
+            self.url,
+            data=json.dumps({"alerts": eventos}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            respuesta.read()
+
+
+def crear_sumideros(nombres=ALERT_SINKS):
+    """
+    Sumideros a partir de la lista separada por comas de ALERT_SINKS.
+    Los nombres desconocidos (y 'webhook' sin ALERT_WEBHOOK_URL) se ignoran
+    con una advertencia.
+    """
+    sumideros = []
+    for nombre in (n.strip().lower() for n in nombres.split(",") if n.strip()):
+        if nombre == "archivo":
+            sumideros.append(SumideroArchivo())
+        elif nombre == "bd":
+            sumideros.append(SumideroBD())
+        elif nombre == "webhook" and ALERT_WEBHOOK_URL:
+            sumideros.append(SumideroWebhook())
+        elif nombre == "webhook":
+            logger.warning("Sumidero de alertas 'webhook' ignorado: falta ALERT_WEBHOOK_URL")
+        else:
+            logger.warning("Sumidero de alertas desconocido ignorado: '%s'", nombre)
+    return sumideros
+
+
+# Marca de fin que el escritor procesa después de los eventos ya encolados
+_FIN = object()
+
+
+class ColaAlertas:
+    """
+    Cola acotada de eventos de alerta con un hilo escritor que los entrega
+    por lotes a los sumideros. El hilo se arranca con el primer evento (o con
+    iniciar()) y detener() entrega lo pendiente antes de terminar.
+
+    Args:
+        sumideros (list): Objetos con un atributo `nombre` y un método
+                          escribir(eventos); el fallo de uno no afecta a los demás.
+        capacidad (int): Eventos en cola antes de descartar los nuevos.
+        max_lote (int): Eventos por lote.
+        intervalo_ms (float): Espera máxima desde el primer evento de un lote.
+    """
+
+    def __init__(self, sumideros, capacidad=ALERT_QUEUE_SIZE, max_lote=ALERT_BATCH_SIZE,
+                 intervalo_ms=ALERT_FLUSH_INTERVAL_MS):
+        self.sumideros = list(sumideros)
+        self.capacidad = max(1, capacidad)
+        self.max_lote = max(1, max_lote)
+        self.intervalo = max(0.0, intervalo_ms) / 1000.0
+        self._cola = queue.Queue(maxsize=self.capacidad)
+        self._hilo = None
+        self._lock = threading.Lock()
+        # Estadísticas de la cola (contrapresión) y de la entrega
+        self.publicadas = 0
+        self.descartadas = 0
+        self.escritas = 0
+        self.lotes = 0
+        self.max_pendientes = 0
+        self.ultimo_vaciado_ms = None
+        self.fallos = {sumidero.nombre: 0 for sumidero in self.sumideros}
+
+    @property
+    def pendientes(self):
+        return self._cola.qsize()
+
+    def iniciar(self):
+        if not self.sumideros:
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="escritor-alertas", daemon=True)
+                self._hilo.start()
+
+    def publicar(self, evento):
+        """
+        Encola un evento sin bloquear.
+
+        Returns:
+            bool: False si la cola estaba llena y el evento se descartó.
+        """
+        if not self.sumideros:
+            return True
+        self.iniciar()
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            self.descartadas += 1
+            # Una advertencia por cada tanda de descartes, no por evento
+            if self.descartadas == 1 or self.descartadas % 1000 == 0:
+                logger.warning("Cola de alertas llena (%d eventos): %d alertas descartadas", self.capacidad, self.descartadas)
+            return False
+        self.publicadas += 1
+        self.max_pendientes = max(self.max_pendientes, self._cola.qsize())
+        return True
+
+    def detener(self, timeout=10):
+        """Entrega los eventos pendientes y detiene el hilo escritor."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is None or not hilo.is_alive():
+            return
+        # El escritor sigue vaciando la cola, así que la marca siempre entra
+        self._cola.put(_FIN)
+        hilo.join(timeout)
+
+    def estadisticas(self):
+        return {
+            "sinks": [sumidero.nombre for sumidero in self.sumideros],
+            "pending": self.pendientes,
+            "capacity": self.capacidad,
+            "max_pending": self.max_pendientes,
+            "published": self.publicadas,
+            "dropped": self.descartadas,
+            "written": self.escritas,
+            "batches": self.lotes,
+            "avg_batch_size": self.escritas / self.lotes if self.lotes else 0.0,
+            "last_flush_ms": self.ultimo_vaciado_ms,
+            "sink_errors": dict(self.fallos),
+        }
+
+    def _bucle(self):
+        terminar = False
+        while not terminar:
+            evento = self._cola.get()
+            if evento is _FIN:
+                break
+            lote = [evento]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                try:
+                    evento = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if evento is _FIN:
+                    terminar = True
+                    break
+                lote.append(evento)
+            self._entregar(lote)
+
+    def _entregar(self, lote):
+        inicio = time.perf_counter()
+        for sumidero in self.sumideros:
+            try:
+                sumidero.escribir(lote)
+            except Exception as e:
+                self.fallos[sumidero.nombre] += 1
+                logger.error("Error entregando %d alertas al sumidero '%s': %s", len(lote), sumidero.nombre, e)
+        self.ultimo_vaciado_ms = (time.perf_counter() - inicio) * 1000
+        self.escritas += len(lote)
+        self.lotes += 1
+
+
+def codificar_cursor_evento(evento_id):
+    """Cursor opaco que apunta al evento anterior a `evento_id`."""
+    return base64.urlsafe_b64encode(str(evento_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor_evento(cursor):
+    """
+    Raises:
+        CursorInvalidoError: Si el cursor no fue generado por codificar_cursor_evento.
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalidoError("Cursor de paginación inválido")
+
+
+def serializar_evento(evento):
+    return {
+        "id": evento.id,
+        "timestamp": evento.created_at.isoformat() if evento.created_at else None,
+        "user_id": str(evento.user_id),
+        "user_name": evento.user_name,
+        "email": evento.email,
+        "telefono": evento.telefono,
+        "confidence": evento.confidence,
+        "distance": evento.distance,
+        "alert_type": evento.alert_type,
+    }
+
+
+def paginar_eventos(db, cursor=None, limite=100, user_id=None, desde=None, hasta=None):
+    """
+    Eventos de alerta del más reciente al más antiguo, paginados por clave
+    sobre su ID (como los listados de usuarios, sin OFFSET).
+
+    Args:
+        db: Sesión síncrona.
+        cursor (str): Cursor devuelto por la página anterior, o None.
+        limite (int): Eventos por página.
+        user_id (uuid.UUID): Solo los eventos de este usuario.
+        desde, hasta (datetime): Rango de fechas de los eventos.
+
+    Returns:
+        tuple: (eventos serializados, cursor de la página siguiente o None).
+
+    Raises:
+        CursorInvalidoError: Si el cursor no es válido.
+    """
+    from database import AlertEvent
+
+    consulta = db.query(AlertEvent)
+    if cursor is not None:
+        consulta = consulta.filter(AlertEvent.id < decodificar_cursor_evento(cursor))
+    if user_id is not None:
+        consulta = consulta.filter(AlertEvent.user_id == user_id)
+    if desde is not None:
+        consulta = consulta.filter(AlertEvent.created_at >= desde)
+    if hasta is not None:
+        consulta = consulta.filter(AlertEvent.created_at < hasta)
+    # Una fila de más indica si hay otra página sin hacer un COUNT
+    eventos = consulta.order_by(AlertEvent.id.desc()).limit(limite + 1).all()
+    siguiente = None
+    if len(eventos) > limite:
+        eventos = eventos[:limite]
+        siguiente = codificar_cursor_evento(eventos[-1].id)
+    return [serializar_evento(evento) for evento in eventos], siguiente
+
+
+# Instancia compartida por la API
+cola_alertas = ColaAlertas(crear_sumideros())
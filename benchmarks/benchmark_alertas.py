@@ -0,0 +1,91 @@
+# benchmarks/benchmark_alertas.py
+# --------------------------------
+# Compara el registro de alertas durante una ráfaga: la versión anterior
+# (abrir alerts.log, añadir una línea JSON y cerrarlo por cada alerta, desde
+# varios hilos a la vez, como las BackgroundTasks del threadpool) frente a
+# la cola de alertas.py (publicar sin E/S y un escritor que entrega por
+# lotes). Mide el coste por alerta para quien la registra y el tiempo hasta
+# que todas están escritas.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_alertas.py --alertas 20000 --hilos 16
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def log_alert_anterior(ruta, i):
+    """Réplica de log_alert antes de la cola: una apertura del archivo por alerta."""
+    alert_data = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_id": f"usuario-{i}",
+        "user_name": "Nombre Apellido",
+        "email": "usuario@benchmark.test",
+        "telefono": "600000000",
+        "confidence": 0.5,
+        "alert_type": "USER_RECOGNIZED_REQUESTED"
+    }
+    with open(ruta, "a") as f:
+        f.write(json.dumps(alert_data) + "\n")
+
+
+def rafaga(funcion, alertas, hilos):
+    """Lanza `alertas` llamadas a funcion(i) desde `hilos` hilos; devuelve segundos."""
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(hilos) as ejecutor:
+        list(ejecutor.map(funcion, range(alertas)))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del registro de alertas")
+    parser.add_argument("--alertas", type=int, default=20000)
+    parser.add_argument("--hilos", type=int, default=16)
+    args = parser.parse_args()
+
+    from alertas import ColaAlertas, SumideroArchivo, crear_evento
+
+    temporal = tempfile.mkdtemp(prefix="benchmark_alertas_")
+    try:
+        ruta_anterior = os.path.join(temporal, "anterior.log")
+        anterior = rafaga(lambda i: log_alert_anterior(ruta_anterior, i), args.alertas, args.hilos)
+
+        ruta_cola = os.path.join(temporal, "cola.log")
+        cola = ColaAlertas([SumideroArchivo(ruta_cola, max_bytes=0)], capacidad=args.alertas)
+        cola.iniciar()
+        inicio = time.perf_counter()
+        publicar = rafaga(
+            lambda i: cola.publicar(crear_evento(f"usuario-{i}", "Nombre Apellido", "usuario@benchmark.test", "600000000", 0.5)),
+            args.alertas, args.hilos,
+        )
+        cola.detener()
+        total = time.perf_counter() - inicio
+
+        with open(ruta_anterior) as f:
+            lineas_anterior = sum(1 for _ in f)
+        with open(ruta_cola) as f:
+            lineas_cola = sum(1 for _ in f)
+        estadisticas = cola.estadisticas()
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    assert lineas_anterior == lineas_cola == args.alertas
+    print(f"\nAlertas: {args.alertas} desde {args.hilos} hilos")
+    print(f"Anterior (append por alerta): {anterior * 1000:9.1f} ms  ({anterior / args.alertas * 1e6:6.1f} us/alerta)")
+    print(f"Cola, publicar:               {publicar * 1000:9.1f} ms  ({publicar / args.alertas * 1e6:6.1f} us/alerta)")
+    print(f"Cola, hasta escribir todas:   {total * 1000:9.1f} ms  "
+          f"({estadisticas['batches']} lotes, {estadisticas['avg_batch_size']:.0f} alertas/lote)")
+
+
+if __name__ == "__main__":
+    main()
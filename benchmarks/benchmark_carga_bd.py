@@ -0,0 +1,138 @@
+# benchmarks/benchmark_carga_bd.py
+# --------------------------------
+# Prueba de carga de los endpoints que consultan la base de datos contra una
+# API en ejecución: N clientes concurrentes repiten una mezcla de
+# GET /usuarios/{id}, GET /usuarios/?limite=50 y POST /recognize/ (siempre
+# la misma imagen: tras la primera petición el embedding sale de la caché,
+# así que se mide la búsqueda y la lectura de la BD, no la detección).
+# Reporta el throughput (peticiones/s) y la latencia p50/p99 por endpoint,
+# para comparar sesiones asíncronas (DB_ASYNC=true) con síncronas o con una
+# versión anterior de la API.
+#
+# --sembrar N inserta antes N usuarios sintéticos directamente en la BD de
+# DATABASE_URL (con la dimensión del modelo publicado).
+#
+# Uso (desde la raíz del repositorio, con la API ya arrancada):
+#   python benchmarks/benchmark_carga_bd.py --url http://localhost:8000 --clientes 32 --segundos 20
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def sembrar(usuarios):
+    """Inserta usuarios sintéticos, con su muestra de inscripción, en DATABASE_URL."""
+    from database import create_db_tables, SessionLocal, User, FaceEmbedding, get_pca_dimensions
+    from modelos import registro_modelos
+
+    create_db_tables()
+    dimension, version = get_pca_dimensions(), registro_modelos.version_pca()
+    rng = np.random.default_rng(0)
+    db = SessionLocal()
+    try:
+        for inicio in range(0, usuarios, 1000):
+            filas = []
+            for i in range(inicio, min(inicio + 1000, usuarios)):
+                embedding = (rng.normal(size=dimension) * 1000).tolist()
+                filas.append({
+                    "id": uuid.uuid4(), "name": f"Carga{i} Prueba", "email": f"carga{i}@benchmark.test",
+                    "telefono": "600000000", "requested": False, "embedding": embedding, "model_version": version,
+                })
+            db.bulk_insert_mappings(User, filas)
+            db.bulk_insert_mappings(FaceEmbedding, [
+                {"id": uuid.uuid4(), "user_id": f["id"], "embedding": f["embedding"],
+                 "model_version": version, "source": "enrollment"}
+                for f in filas
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+async def cliente(http, ids, imagen, fin, latencias, errores, rng):
+    while time.perf_counter() < fin:
+        tipo = ("usuario", "listado", "reconocer")[rng.integers(0, 3)]
+        inicio = time.perf_counter()
+        try:
+            if tipo == "usuario":
+                r = await http.get(f"/usuarios/{ids[rng.integers(0, len(ids))]}")
+            elif tipo == "listado":
+                r = await http.get("/usuarios/", params={"limite": 50})
+            else:
+                r = await http.post("/recognize/", files={"face_image": ("rostro.jpg", imagen, "image/jpeg")})
+            if r.status_code != 200:
+                errores[tipo] = errores.get(tipo, 0) + 1
+                continue
+        except httpx.HTTPError:
+            errores[tipo] = errores.get(tipo, 0) + 1
+            continue
+        latencias.setdefault(tipo, []).append((time.perf_counter() - inicio) * 1000)
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else float('nan')
+
+
+async def medir(args):
+    with open(args.imagen, 'rb') as f:
+        imagen = f.read()
+    limites = httpx.Limits(max_connections=args.clientes, max_keepalive_connections=args.clientes)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limites) as http:
+        r = await http.get("/usuarios/", params={"campos": "id", "limite": 1000})
+        r.raise_for_status()
+        ids = [u["id"] for u in r.json()]
+        if not ids:
+            raise SystemExit("La API no tiene usuarios: usa --sembrar")
+        # Calentamiento: conexiones del pool, caché de embeddings y del índice
+        await http.post("/recognize/", files={"face_image": ("rostro.jpg", imagen, "image/jpeg")})
+
+        latencias, errores = {}, {}
+        inicio = time.perf_counter()
+        fin = inicio + args.segundos
+        await asyncio.gather(*(
+            cliente(http, ids, imagen, fin, latencias, errores, np.random.default_rng(i))
+            for i in range(args.clientes)
+        ))
+        duracion = time.perf_counter() - inicio
+
+    total = sum(len(v) for v in latencias.values())
+    print(f"\n{args.url}: {args.clientes} clientes, {duracion:.1f} s")
+    print(f"Throughput: {total / duracion:8.1f} peticiones/s ({total} correctas, {sum(errores.values())} con error)")
+    for tipo in ("usuario", "listado", "reconocer"):
+        valores = latencias.get(tipo, [])
+        print(f"  {tipo:10s} n={len(valores):6d}  p50={percentil(valores, 50):8.1f} ms  "
+              f"p99={percentil(valores, 99):8.1f} ms  media={statistics.fmean(valores) if valores else float('nan'):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los endpoints con base de datos")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--imagen", default=None, help="imagen para /recognize/ (por defecto, la primera de data/initial_enrollment)")
+    parser.add_argument("--sembrar", type=int, default=0, help="usuarios sintéticos a insertar antes de medir")
+    args = parser.parse_args()
+
+    if args.imagen is None:
+        directorio = os.path.join(RAIZ, "data", "initial_enrollment")
+        args.imagen = os.path.join(directorio, sorted(
+            n for n in os.listdir(directorio) if n.lower().endswith(('.png', '.jpg', '.jpeg'))
+        )[0])
+    if args.sembrar:
+        os.chdir(RAIZ)
+        sembrar(args.sembrar)
+    asyncio.run(medir(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/benchmark_detectores.py
+# ----------------------------------
+# Compara los backends de detección de rostros (detectores.py) sobre las
+# imágenes de data/initial_enrollment: tiempo de carga, memoria (RSS máxima),
+# latencia por imagen y tasa de detección. Cada backend se mide en un
+# proceso nuevo para que la memoria y la carga de uno no afecten al otro.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_detectores.py --detectores mtcnn haar
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _rss_max_mb():
+    # En Linux ru_maxrss está en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def medir_detector(nombre, directorio):
+    """Se ejecuta en un proceso aparte: carga el detector y recorre las imágenes."""
+    import cv2
+    import numpy as np
+
+    rss_inicial = _rss_max_mb()
+    inicio = time.perf_counter()
+    from detectores import crear_detector
+    detector = crear_detector(nombre)
+    carga_s = time.perf_counter() - inicio
+    # Memoria atribuible al detector (antes de cargar las imágenes de prueba)
+    rss_detector = _rss_max_mb() - rss_inicial
+    if detector is None:
+        return {"detector": nombre, "error": "no se pudo inicializar"}
+
+    imagenes = []
+    for archivo in sorted(os.listdir(directorio)):
+        if archivo.lower().endswith(('.png', '.jpg', '.jpeg')):
+            img = cv2.imread(os.path.join(directorio, archivo))
+            if img is not None:
+                imagenes.append(img)
+
+    # Calentamiento (la primera inferencia de TensorFlow incluye compilación)
+    detector.detectar(imagenes[0])
+
+    latencias = []
+    detectadas = 0
+    for img in imagenes:
+        t = time.perf_counter()
+        cajas = detector.detectar(img)
+        latencias.append((time.perf_counter() - t) * 1000.0)
+        detectadas += bool(cajas)
+
+    latencias = np.array(latencias)
+    return {
+        "detector": nombre,
+        "imagenes": len(imagenes),
+        "carga_s": round(carga_s, 3),
+        "rss_mb": round(rss_detector, 1),
+        "media_ms": round(float(latencias.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 2),
+        "tasa_deteccion": round(detectadas / len(imagenes), 3),
+    }
+
+
+def main(args):
+    directorio = os.path.join(RAIZ, args.directorio)
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    for nombre in args.detectores:
+        with contexto.Pool(1) as pool:
+            resultados.append(pool.apply(medir_detector, (nombre, directorio)))
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    print(f"\n--- Detectores sobre {directorio} ---")
+    print(f"{'detector':<10}{'carga (s)':>11}{'RSS (MB)':>10}{'media (ms)':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'detección':>11}")
+    for r in resultados:
+        if "error" in r:
+            print(f"{r['detector']:<10}  {r['error']}")
+            continue
+        print(f"{r['detector']:<10}{r['carga_s']:>11.2f}{r['rss_mb']:>10.1f}{r['media_ms']:>12.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['tasa_deteccion']:>11.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de backends de detección de rostros")
+    parser.add_argument("--directorio", default="data/initial_enrollment")
+    parser.add_argument("--detectores", nargs="+", default=["mtcnn", "haar"])
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    main(parser.parse_args())
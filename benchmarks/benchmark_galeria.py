@@ -0,0 +1,123 @@
+# benchmarks/benchmark_galeria.py
+# -------------------------------
+# Compara la búsqueda del vecino más cercano de IndiceGaleria con la versión
+# anterior, que restaba la consulta a toda la galería (matriz - q) y sumaba
+# los cuadrados fila a fila, frente a la actual: normas al cuadrado
+# precalculadas y un único producto matriz-vector por consulta.
+# Comprueba además que el candidato elegido coincide con el de la búsqueda
+# exacta en float64 (o, si difiere, que su distancia empata dentro de la
+# tolerancia), igual que el de la versión anterior, y que la distancia
+# devuelta es la misma. También mide los k mejores usuarios con selección
+# parcial (buscar_top_k) frente a ordenar la galería completa, y el coste de
+# inscribir un usuario en una galería ya cargada.
+#
+# Los embeddings son sintéticos, con la escala de las proyecciones PCA
+# (varianza decreciente por componente). Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_galeria.py --filas 50000 --dimension 33
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from galeria import IndiceGaleria
+
+
+def buscar_anterior(matriz, consulta):
+    """Réplica de la búsqueda del mejor candidato antes de precalcular las normas."""
+    diferencias = matriz - consulta
+    distancias = np.sqrt(np.einsum('ij,ij->i', diferencias, diferencias))
+    mejor = int(np.argmin(distancias))
+    return mejor, float(distancias[mejor])
+
+
+def medir(funcion, consultas, repeticiones):
+    """Mejor tiempo medio por consulta (µs) de varias pasadas."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for consulta in consultas:
+            funcion(consulta)
+        mejor = min(mejor, (time.perf_counter() - inicio) / len(consultas))
+    return mejor * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la búsqueda en la galería")
+    parser.add_argument("--filas", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=33)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--tolerancia", type=float, default=1e-3,
+                        help="diferencia relativa de distancia admitida entre candidatos empatados")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    escala = 3000.0 / np.sqrt(np.arange(1, args.dimension + 1))
+    galeria = (rng.normal(size=(args.filas, args.dimension)) * escala).astype(np.float32)
+    # La mitad de las consultas son muestras de la galería con ruido (coincidencias), la otra mitad rostros nuevos
+    mitad = args.consultas // 2
+    consultas = np.vstack([
+        galeria[rng.integers(0, args.filas, mitad)] + rng.normal(size=(mitad, args.dimension)) * escala * 0.05,
+        rng.normal(size=(args.consultas - mitad, args.dimension)) * escala,
+    ]).astype(np.float32)
+
+    indice = IndiceGaleria("min")
+    indice.cargar((i, fila) for i, fila in enumerate(galeria))
+
+    anterior_us = medir(lambda q: buscar_anterior(galeria, q), consultas, args.repeticiones)
+    mejor = lambda q: indice.buscar_top_k(q, 1)[0]
+    actual_us = medir(mejor, consultas, args.repeticiones)
+    top_k_us = medir(lambda q: indice.buscar_top_k(q, args.k), consultas, args.repeticiones)
+    # Misma forma de distancia, pero ordenando todas las filas en lugar de la selección parcial
+    normas = np.einsum('ij,ij->i', galeria, galeria)
+    orden_us = medir(lambda q: np.argsort(normas - 2.0 * (galeria @ q))[:args.k], consultas, args.repeticiones)
+    inicio = time.perf_counter()
+    lote = [candidatos[0] for candidatos in indice.buscar_top_k_lote(consultas, 1)]
+    lote_us = (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+    # Referencia exacta en float64
+    exacta = galeria.astype(np.float64)
+    iguales = empates = iguales_anterior = 0
+    error_distancia = 0.0
+    for consulta, (user_id, distancia), (id_lote, distancia_lote) in zip(consultas, map(mejor, consultas), lote):
+        distancias = np.sqrt(((exacta - consulta.astype(np.float64)) ** 2).sum(axis=1))
+        referencia = int(np.argmin(distancias))
+        error_distancia = max(error_distancia, abs(distancia - distancias[referencia]) / max(distancias[referencia], 1.0))
+        assert user_id == id_lote and distancia == distancia_lote
+        top_k = indice.buscar_top_k(consulta, args.k)
+        assert top_k[0] == (user_id, distancia)
+        assert [int(u) for u, _ in top_k] == list(np.argsort(distancias)[:args.k]) or \
+            np.allclose([d for _, d in top_k], np.sort(distancias)[:args.k], rtol=args.tolerancia)
+        iguales_anterior += int(user_id) == buscar_anterior(galeria, consulta)[0]
+        if int(user_id) == referencia:
+            iguales += 1
+        elif abs(distancias[int(user_id)] - distancias[referencia]) <= args.tolerancia * distancias[referencia]:
+            empates += 1
+        else:
+            raise AssertionError(f"Candidato distinto: {user_id} frente a {referencia}")
+
+    # Inscripciones sobre la galería cargada: se añaden filas al búfer, sin reconstruir la matriz
+    inicio = time.perf_counter()
+    for i in range(args.consultas):
+        indice.establecer(f"nuevo-{i}", [consultas[i]])
+    inscripcion_us = (time.perf_counter() - inicio) / args.consultas * 1e6
+    print(f"\nGalería: {args.filas} filas x {args.dimension} dimensiones, {args.consultas} consultas")
+    print(f"Anterior (matriz - q):       {anterior_us:9.1f} µs/consulta")
+    print(f"Actual (normas + GEMV):      {actual_us:9.1f} µs/consulta  ({anterior_us / actual_us:.1f}x)")
+    print(f"Actual, en lote:             {lote_us:9.1f} µs/consulta")
+    print(f"Top-{args.k} (argpartition):      {top_k_us:9.1f} µs/consulta")
+    print(f"Top-{args.k} ordenando todo:      {orden_us:9.1f} µs/consulta")
+    print(f"Inscribir un usuario:        {inscripcion_us:9.1f} µs")
+    print(f"Mismo candidato que antes:   {iguales_anterior}/{args.consultas}")
+    print(f"Mismo candidato que float64: {iguales}/{args.consultas} (+{empates} empates dentro de la tolerancia)")
+    print(f"Error relativo de distancia: {error_distancia:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/benchmark_inscripcion.py
+# -----------------------------------
+# Compara la inscripción fila por fila (lo que hace POST /usuarios/: consulta
+# de email, extracción individual, commit, refresh y copia de la foto) con la
+# inscripción masiva de inscripcion_masiva.py sobre un manifiesto sintético
+# de N usuarios (las fotos de data/initial_enrollment repetidas con emails
+# distintos). La ruta fila por fila se mide sobre una muestra y se extrapola.
+# Después repite la importación masiva completa para medir la reanudación
+# (todas las filas ya existen y se omiten).
+#
+# Usa una base SQLite y un directorio de fotos temporales salvo que se defina
+# DATABASE_URL. Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_inscripcion.py --usuarios 10000 --muestra 200
+
+import argparse
+import asyncio
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def crear_manifiesto(directorio, origen, usuarios):
+    """Escribe manifest.csv y copia las fotos de origen en `directorio`."""
+    fotos = sorted(n for n in os.listdir(origen) if n.lower().endswith(('.png', '.jpg', '.jpeg')))
+    for nombre in fotos:
+        shutil.copy(os.path.join(origen, nombre), os.path.join(directorio, nombre))
+    ruta = os.path.join(directorio, "manifest.csv")
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["nombre", "apellido", "email", "telefono", "foto"])
+        for i in range(usuarios):
+            escritor.writerow([f"Usuario{i}", "Benchmark", f"usuario{i}@benchmark.test",
+                               f"600{i:06d}", fotos[i % len(fotos)]])
+    return ruta
+
+
+def inscribir_fila_por_fila(filas, leer_foto, directorio_fotos):
+    """Réplica de la ruta de POST /usuarios/ (sin la capa HTTP)."""
+    from database import SessionLocal, User, FaceEmbedding
+    from face_embedding_extractor import extraer_embedding_pca
+
+    db = SessionLocal()
+    try:
+        for fila in filas:
+            if db.query(User).filter(User.email == fila["email"]).first():
+                continue
+            contenido = leer_foto(fila["foto"])
+            embedding = extraer_embedding_pca(contenido)
+            if embedding is None:
+                continue
+            user = User(name=f"{fila['nombre']} {fila['apellido']}", email=fila["email"],
+                        telefono=fila["telefono"], embedding=embedding.tolist())
+            user.muestras.append(FaceEmbedding(embedding=embedding.tolist(), source="enrollment"))
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            with open(os.path.join(directorio_fotos, f"{user.id}.jpg"), "wb") as f:
+                f.write(contenido)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inscripción masiva")
+    parser.add_argument("--usuarios", type=int, default=10000)
+    parser.add_argument("--muestra", type=int, default=200,
+                        help="filas medidas con la ruta fila por fila (se extrapola al total)")
+    parser.add_argument("--directorio", default=os.path.join(RAIZ, "data", "initial_enrollment"))
+    args = parser.parse_args()
+
+    temporal = tempfile.mkdtemp(prefix="benchmark_inscripcion_")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(temporal, 'benchmark.db')}")
+    os.chdir(RAIZ)
+
+    from database import create_db_tables, SessionLocal, User
+    from inscripcion_masiva import InscripcionMasiva, fuente_directorio
+    from modelos import registro_modelos
+    from pool_embeddings import pool_embeddings
+
+    try:
+        create_db_tables()
+        registro_modelos.calentar()
+        manifiesto = crear_manifiesto(temporal, args.directorio, args.usuarios)
+        filas, leer_foto = fuente_directorio(manifiesto)
+        fotos_individual = os.path.join(temporal, "fotos_individual")
+        fotos_masivo = os.path.join(temporal, "fotos_masivo")
+        os.makedirs(fotos_individual)
+
+        # 1. Fila por fila, sobre una muestra con emails propios
+        muestra = [dict(f, email="individual." + f["email"]) for f in filas[:args.muestra]]
+        inicio = time.perf_counter()
+        inscribir_fila_por_fila(muestra, leer_foto, fotos_individual)
+        individual_s = time.perf_counter() - inicio
+        por_fila_ms = individual_s / max(1, len(muestra)) * 1000
+
+        # 2. Inscripción masiva completa (el pool arranca antes de medir)
+        pool_embeddings.iniciar()
+        inscripcion = InscripcionMasiva(directorio_fotos=fotos_masivo)
+        resumen = asyncio.run(inscripcion.inscribir(filas, leer_foto))
+
+        # 3. Reanudación: todas las filas ya existen
+        reanudacion = asyncio.run(inscripcion.inscribir(filas, leer_foto))
+
+        db = SessionLocal()
+        try:
+            total_bd = db.query(User).count()
+        finally:
+            db.close()
+    finally:
+        pool_embeddings.detener()
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    masivo_s = resumen["elapsed_seconds"]
+    print(f"\nUsuarios: {args.usuarios} (workers del pool: {pool_embeddings.workers}, modo: {pool_embeddings.modo})")
+    print(f"Fila por fila:  {por_fila_ms:8.2f} ms/usuario en {len(muestra)} filas "
+          f"-> {por_fila_ms * args.usuarios / 1000:8.1f} s estimados para {args.usuarios}")
+    print(f"Masiva:         {masivo_s / max(1, args.usuarios) * 1000:8.2f} ms/usuario "
+          f"-> {masivo_s:8.1f} s ({resumen['created']} creados, {resumen['failed']} con error)")
+    print(f"Reanudación:    {reanudacion['elapsed_seconds']:8.1f} s ({reanudacion['skipped']} omitidos)")
+    print(f"Aceleración:    {por_fila_ms * args.usuarios / 1000 / max(masivo_s, 1e-9):8.1f}x")
+    print(f"Usuarios en BD: {total_bd}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/benchmark_listados.py
+# ---------------------------------
+# Compara la latencia de los listados de usuarios antes y después de la
+# selección de columnas: la versión anterior de GET /usuarios/ (objetos User
+# completos, con el embedding, y name.split() hasta tres veces por fila)
+# frente a la actual (solo las columnas de la respuesta, serializador
+# compartido), sobre N usuarios sintéticos. También mide una página de la
+# paginación por clave al final del listado y la selección de campos.
+#
+# Usa una base SQLite temporal salvo que se defina DATABASE_URL. Uso (desde
+# la raíz del repositorio):
+#   python benchmarks/benchmark_listados.py --usuarios 20000
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def listado_anterior(db):
+    """Réplica de GET /usuarios/ antes de la selección de columnas."""
+    from database import User
+
+    users = db.query(User).all()
+    return [
+        {
+            "id": str(user.id),
+            "nombre": user.name.split()[0] if user.name else "",
+            "apellido": " ".join(user.name.split()[1:]) if user.name and len(user.name.split()) > 1 else "",
+            "email": user.email,
+            "telefono": user.telefono,
+            "requisitoriado": user.requested,
+            "url_foto": f"/static/fotos_perfil/{user.id}.jpg",
+            "created_at": user.created_at.isoformat() if user.created_at else None
+        }
+        for user in users
+    ]
+
+
+def medir(funcion, repeticiones):
+    """Mediana en milisegundos, con una sesión nueva por repetición."""
+    from database import SessionLocal
+
+    tiempos = []
+    for _ in range(repeticiones):
+        db = SessionLocal()
+        try:
+            inicio = time.perf_counter()
+            resultado = funcion(db)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            db.close()
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los listados de usuarios")
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--pagina", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    temporal = tempfile.mkdtemp(prefix="benchmark_listados_")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(temporal, 'benchmark.db')}")
+    os.chdir(RAIZ)
+
+    from database import create_db_tables, SessionLocal, User, get_pca_dimensions
+    from serializadores import SerializadorUsuario, paginar, codificar_cursor, CAMPOS_LISTADO
+
+    try:
+        create_db_tables()
+        dimension = get_pca_dimensions()
+        rng = np.random.default_rng(0)
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(User, [
+                {
+                    "id": uuid.uuid4(), "name": f"Usuario{i} Apellido De Prueba", "email": f"usuario{i}@benchmark.test",
+                    "telefono": f"600{i:06d}", "requested": i % 10 == 0, "model_version": 0,
+                    "embedding": rng.normal(size=dimension).tolist(),
+                }
+                for i in range(args.usuarios)
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+        completo = SerializadorUsuario(CAMPOS_LISTADO)
+        reducido = SerializadorUsuario(("id", "nombre"))
+
+        def listado_actual(db):
+            filas, _ = paginar(completo.consulta(db))
+            return [completo(fila) for fila in filas]
+
+        def listado_campos(db):
+            filas, _ = paginar(reducido.consulta(db))
+            return [reducido(fila) for fila in filas]
+
+        # Cursor de la última página completa: la paginación por clave no recorre las anteriores
+        db = SessionLocal()
+        try:
+            ids = [fila.id for fila in db.query(User.id).order_by(User.id)]
+        finally:
+            db.close()
+        cursor = codificar_cursor(ids[-args.pagina - 1])
+
+        def ultima_pagina(db):
+            filas, _ = paginar(completo.consulta(db), cursor, args.pagina)
+            return [completo(fila) for fila in filas]
+
+        anterior_ms, anterior = medir(listado_anterior, args.repeticiones)
+        actual_ms, actual = medir(listado_actual, args.repeticiones)
+        campos_ms, _ = medir(listado_campos, args.repeticiones)
+        pagina_ms, pagina = medir(ultima_pagina, args.repeticiones)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    assert sorted(anterior, key=lambda u: u["id"]) == sorted(actual, key=lambda u: u["id"])
+    print(f"\nUsuarios: {args.usuarios} (embeddings de {dimension} dimensiones)")
+    print(f"Anterior (User completo):  {anterior_ms:9.1f} ms")
+    print(f"Actual (solo columnas):    {actual_ms:9.1f} ms  ({anterior_ms / actual_ms:.1f}x)")
+    print(f"Actual, campos=id,nombre:  {campos_ms:9.1f} ms  ({anterior_ms / campos_ms:.1f}x)")
+    print(f"Última página de {len(pagina)}:    {pagina_ms:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/benchmark_micro_batch.py
+# -----------------------------------
+# Compara la extracción de embeddings petición por petición contra el
+# micro-batching de AgrupadorLotes bajo carga concurrente. Reporta el
+# throughput (peticiones/s) y la latencia p50/p99 de cada modo, para ver
+# cuánto se gana en throughput y cuánta latencia de cola añade la espera.
+#
+# La detección solo comparte inferencia MTCNN entre imágenes del mismo
+# tamaño. Las fotos de data/initial_enrollment tienen tamaños distintos, así
+# que con ellas la ganancia medida es sobre todo del PCA conjunto y del paso
+# por el pool; --mismo-tamano las reescala a un tamaño común para medir el
+# caso favorable (fotogramas de una misma cámara). La ganancia de uno no
+# vale como estimación del otro.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_micro_batch.py --clientes 16 --peticiones 64
+#   python benchmarks/benchmark_micro_batch.py --mismo-tamano 480
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agrupador_lotes import AgrupadorLotes
+from face_embedding_extractor import extraer_embedding_pca, extraer_embeddings_pca_lote
+from pool_embeddings import PoolEmbeddings
+
+
+def cargar_imagenes(directorio, limite):
+    imagenes = []
+    for nombre in sorted(os.listdir(directorio)):
+        if nombre.lower().endswith(('.png', '.jpg', '.jpeg')):
+            with open(os.path.join(directorio, nombre), 'rb') as f:
+                imagenes.append(f.read())
+        if len(imagenes) >= limite:
+            break
+    return imagenes
+
+
+def tamaños_distintos(imagenes):
+    """Número de dimensiones distintas entre las imágenes codificadas."""
+    formas = set()
+    for img in imagenes:
+        decodificada = cv2.imdecode(np.frombuffer(img, np.uint8), cv2.IMREAD_COLOR)
+        if decodificada is not None:
+            formas.add(decodificada.shape)
+    return len(formas)
+
+
+def reescalar(imagenes, lado):
+    """Reescala todas las imágenes a lado x lado y las recodifica en JPEG."""
+    reescaladas = []
+    for img in imagenes:
+        decodificada = cv2.imdecode(np.frombuffer(img, np.uint8), cv2.IMREAD_COLOR)
+        if decodificada is None:
+            continue
+        ok, buffer = cv2.imencode(".jpg", cv2.resize(decodificada, (lado, lado)))
+        if ok:
+            reescaladas.append(buffer.tobytes())
+    return reescaladas
+
+
+async def ejecutar_carga(enviar, imagenes, clientes, peticiones):
+    """Lanza `clientes` tareas concurrentes que reparten `peticiones` en total."""
+    latencias = []
+
+    async def cliente(indice):
+        for i in range(indice, peticiones, clientes):
+            inicio = time.perf_counter()
+            await enviar(imagenes[i % len(imagenes)])
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(c) for c in range(clientes)))
+    total = time.perf_counter() - inicio
+    latencias_ms = np.array(latencias) * 1000.0
+    return {
+        "throughput": peticiones / total,
+        "p50_ms": float(np.percentile(latencias_ms, 50)),
+        "p99_ms": float(np.percentile(latencias_ms, 99)),
+    }
+
+
+async def main(args):
+    imagenes = cargar_imagenes(args.directorio, args.imagenes)
+    if not imagenes:
+        print(f"No se encontraron imágenes en {args.directorio}")
+        return
+    if args.mismo_tamano:
+        imagenes = reescalar(imagenes, args.mismo_tamano)
+    tamaños = tamaños_distintos(imagenes)
+
+    pool = PoolEmbeddings(modo=args.modo, workers=args.workers, max_cola=args.peticiones)
+    pool.iniciar()
+    try:
+        # Calentamiento para no medir la primera inferencia de TensorFlow
+        await pool.ejecutar(extraer_embedding_pca, imagenes[0])
+
+        individual = await ejecutar_carga(
+            lambda img: pool.ejecutar(extraer_embedding_pca, img),
+            imagenes, args.clientes, args.peticiones
+        )
+
+        agrupador = AgrupadorLotes(
+            extraer_embeddings_pca_lote, pool.ejecutar,
+            max_lote=args.max_lote, max_espera_ms=args.max_espera_ms,
+            max_pendientes=args.peticiones
+        )
+        agrupado = await ejecutar_carga(agrupador.enviar, imagenes, args.clientes, args.peticiones)
+        agrupado["tamaño_medio_lote"] = agrupador.tamaño_medio_lote
+        await agrupador.detener()
+    finally:
+        pool.detener()
+
+    print(f"\n--- Micro-batching: {args.peticiones} peticiones, {args.clientes} clientes, "
+          f"{len(imagenes)} imágenes de {tamaños} tamaño(s) distinto(s) ---")
+    print(f"{'modo':<12}{'req/s':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for nombre, r in (("individual", individual), ("agrupado", agrupado)):
+        print(f"{nombre:<12}{r['throughput']:>10.2f}{r['p50_ms']:>12.1f}{r['p99_ms']:>12.1f}")
+    print(f"Tamaño medio de lote: {agrupado['tamaño_medio_lote']:.2f}")
+    print(f"Ganancia de throughput: x{agrupado['throughput'] / individual['throughput']:.2f}")
+    print(f"Latencia p99 añadida: {agrupado['p99_ms'] - individual['p99_ms']:+.1f} ms")
+    if tamaños > 1:
+        print("Nota: la detección MTCNN solo se agrupa entre imágenes del mismo tamaño; "
+              "con tamaños mezclados la ganancia no representa la de fotogramas de una "
+              "misma cámara (ver --mismo-tamano).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del micro-batching de reconocimiento")
+    parser.add_argument("--directorio", default="data/initial_enrollment")
+    parser.add_argument("--imagenes", type=int, default=16)
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--peticiones", type=int, default=64)
+    parser.add_argument("--modo", default="hilo", choices=["hilo", "proceso"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-lote", type=int, default=8)
+    parser.add_argument("--max-espera-ms", type=float, default=10.0)
+    parser.add_argument("--mismo-tamano", type=int, default=0,
+                        help="Reescalar todas las imágenes a NxN píxeles (0 = tamaño original)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+# benchmarks/benchmark_video.py
+# ------------------------------
+# Compara el coste de CPU por fotograma al reconocer un video: tratar cada
+# fotograma muestreado como una foto (detección + recorte + PCA en todos,
+# como si se llamara a /recognize/ por fotograma) frente a SesionVideo
+# (detección cada VIDEO_DETECT_EVERY fotogramas, seguimiento entre medias y
+# reconocimiento por pista cada VIDEO_RECOGNIZE_INTERVAL_S segundos).
+#
+# El video es sintético: las fotos de data/initial_enrollment sobre un
+# lienzo, desplazándose unos píxeles por fotograma. La búsqueda en la galería
+# no se incluye (es la misma por embedding en ambos casos); se cuentan los
+# embeddings que la necesitarían.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/benchmark_video.py --fotogramas 150 --personas 2
+
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def video_sintetico(fotos, fotogramas, lado=240, paso=2):
+    """Fotogramas BGR con cada foto (reducida a `lado` px) moviéndose en horizontal."""
+    caras = [cv2.resize(cv2.imread(ruta), (lado, lado)) for ruta in fotos]
+    alto, ancho = lado + 40, (lado + 20) * len(caras) + 80
+    for i in range(fotogramas):
+        fotograma = np.full((alto, ancho, 3), 40, np.uint8)
+        desplazamiento = (i * paso) % 60
+        for j, cara in enumerate(caras):
+            x = 20 + j * (lado + 20) + desplazamiento
+            fotograma[20:20 + lado, x:x + lado] = cara
+        yield fotograma
+
+
+def por_fotograma(fotogramas):
+    """Cada fotograma como una foto independiente; devuelve embeddings calculados."""
+    from facial_preprocesador import detectar_rostros, estandarizar_cara
+    from face_embedding_extractor import proyectar_caras
+
+    embeddings = 0
+    for fotograma in fotogramas:
+        caras = [estandarizar_cara(fotograma, caja) for caja in detectar_rostros(fotograma)]
+        caras = [cara for cara in caras if cara is not None]
+        if caras:
+            embeddings += len(proyectar_caras(caras))
+    return embeddings
+
+
+def con_seguimiento(fotogramas, fps):
+    """SesionVideo con detección y seguimiento en el mismo hilo; devuelve (embeddings, resumen)."""
+    from facial_preprocesador import detectar_rostros
+    from seguimiento_video import SesionVideo
+
+    async def detectar(fotograma):
+        return detectar_rostros(fotograma)
+
+    async def reconocer(embeddings):
+        return [{"success": False} for _ in embeddings]
+
+    async def ejecutor(funcion, *args):
+        return funcion(*args)
+
+    async def correr():
+        sesion = SesionVideo(detectar, reconocer, ejecutor)
+        for i, fotograma in enumerate(fotogramas):
+            await sesion.procesar(fotograma, i / fps, i)
+        sesion.finalizar()
+        return sesion.resumen()
+
+    resumen = asyncio.run(correr())
+    return resumen["recognitions"], resumen
+
+
+def medir(funcion, *args):
+    inicio_cpu, inicio = time.process_time(), time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.process_time() - inicio_cpu, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del reconocimiento en video")
+    parser.add_argument("--fotogramas", type=int, default=150, help="Fotogramas muestreados del video")
+    parser.add_argument("--fps", type=float, default=5.0, help="Fotogramas muestreados por segundo")
+    parser.add_argument("--personas", type=int, default=2)
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    from modelos import registro_modelos
+    registro_modelos.calentar()
+
+    fotos = sorted(glob.glob(os.path.join("data", "initial_enrollment", "*")))[:args.personas]
+    fotogramas = list(video_sintetico(fotos, args.fotogramas))
+
+    # Calentamiento del detector y del PCA
+    por_fotograma(fotogramas[:2])
+
+    embeddings_foto, cpu_foto, total_foto = medir(por_fotograma, fotogramas)
+    (embeddings_video, resumen), cpu_video, total_video = medir(con_seguimiento, fotogramas, args.fps)
+
+    n = len(fotogramas)
+    print(f"\nVideo: {n} fotogramas ({n / args.fps:.0f} s a {args.fps:g} fps), {len(fotos)} personas")
+    print(f"Foto por fotograma: {cpu_foto / n * 1000:7.2f} ms CPU/fotograma  "
+          f"{total_foto * 1000:8.1f} ms total  {embeddings_foto} embeddings a buscar")
+    print(f"Con seguimiento:    {cpu_video / n * 1000:7.2f} ms CPU/fotograma  "
+          f"{total_video * 1000:8.1f} ms total  {embeddings_video} embeddings a buscar")
+    print(f"  {resumen['detections']} detecciones, {resumen['tracked_frames']} fotogramas seguidos, "
+          f"{resumen['tracks']} pistas")
+    if cpu_video:
+        print(f"Reducción de CPU: x{cpu_foto / cpu_video:.1f}")
+
+
+if __name__ == "__main__":
+    main()
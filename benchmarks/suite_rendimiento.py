@@ -0,0 +1,306 @@
+# benchmarks/suite_rendimiento.py
+# --------------------------------
+# Suite de rendimiento offline de los caminos críticos, sin servidor ni BD:
+#
+#   - preprocesar_cara:      detección + recorte/ecualización/redimensión de
+#                            las imágenes de data/initial_enrollment (en bytes,
+#                            como llegan en una subida).
+#   - extraer_embedding_pca: lo anterior más la proyección PCA.
+#   - reconocimiento_<N>:    la búsqueda de /recognize/ (los max(k, 2) usuarios
+#                            más cercanos en IndiceGaleria, de donde salen el
+#                            mejor candidato y el margen) sobre una galería
+#                            sintética de N embeddings con la dimensión del
+#                            modelo publicado.
+#
+# Cada caso se ejecuta en un proceso nuevo (la memoria de uno no afecta al
+# siguiente) con datos fijos: las imágenes en orden, semillas fijas para la
+# galería y las consultas y una ronda de calentamiento que no se mide. Por
+# caso se reporta el throughput (llamadas/s), la latencia p50/p99/media y la
+# RSS máxima del proceso, en JSON junto con el entorno de la medición.
+#
+# Con --comparar, cada caso se contrasta con una línea base guardada
+# (benchmarks/linea_base.json): una latencia o una RSS mayor, o un
+# throughput menor, que la tolerancia se marca como regresión y el script
+# termina con código 1 (útil en CI). Una línea base de otra máquina
+# (plataforma o número de CPUs distintos) no se compara en absoluto; con
+# otro detector o modelo PCA (dimensión o versión) solo se comparan los
+# casos de búsqueda.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/suite_rendimiento.py --salida resultados.json --comparar benchmarks/linea_base.json
+#   python benchmarks/suite_rendimiento.py --galerias 1000 10000 --guardar-linea-base benchmarks/linea_base.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+LINEA_BASE = os.path.join(RAIZ, "benchmarks", "linea_base.json")
+GALERIAS = (1000, 10000, 100000, 1000000)
+
+# Métricas comparadas con la línea base: (clave, True si más alto es mejor)
+METRICAS_COMPARADAS = (
+    ("throughput_per_s", True),
+    ("p50_ms", False),
+    ("p99_ms", False),
+    ("peak_rss_mb", False),
+)
+# Claves del entorno que deben coincidir con la línea base para comparar
+# cualquier caso (máquina) o los que pasan por el detector y el PCA (modelo)
+MAQUINA = ("platform", "cpus")
+MODELO = ("detector", "pca_dimension", "pca_version")
+
+
+def _rss_max_mb():
+    # En Linux ru_maxrss está en KB (en macOS, en bytes)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _resumir(latencias_s, duracion_s, **parametros):
+    import numpy as np
+
+    latencias = np.asarray(latencias_s) * 1000.0
+    return {
+        "calls": len(latencias),
+        "throughput_per_s": round(len(latencias) / duracion_s, 3),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 4),
+        "mean_ms": round(float(latencias.mean()), 4),
+        "peak_rss_mb": round(_rss_max_mb(), 1),
+        "params": parametros,
+    }
+
+
+def _medir(funcion, entradas, rondas):
+    """Latencia de cada llamada y duración total de `rondas` pasadas por las entradas."""
+    for entrada in entradas:
+        funcion(entrada)  # calentamiento (carga de modelos, cachés de OpenCV/BLAS)
+    latencias = []
+    inicio = time.perf_counter()
+    for _ in range(rondas):
+        for entrada in entradas:
+            t = time.perf_counter()
+            funcion(entrada)
+            latencias.append(time.perf_counter() - t)
+    return latencias, time.perf_counter() - inicio
+
+
+def _imagenes(directorio):
+    nombres = sorted(n for n in os.listdir(directorio) if n.lower().endswith(('.png', '.jpg', '.jpeg')))
+    contenidos = []
+    for nombre in nombres:
+        with open(os.path.join(directorio, nombre), 'rb') as f:
+            contenidos.append(f.read())
+    return contenidos
+
+
+def caso_preprocesar(directorio, rondas):
+    from facial_preprocesador import preprocesar_cara
+
+    imagenes = _imagenes(directorio)
+    latencias, duracion = _medir(preprocesar_cara, imagenes, rondas)
+    caras = sum(preprocesar_cara(img) is not None for img in imagenes)
+    return _resumir(latencias, duracion, images=len(imagenes), rounds=rondas, faces_found=caras)
+
+
+def caso_extraer(directorio, rondas):
+    from face_embedding_extractor import extraer_embedding_pca
+
+    imagenes = _imagenes(directorio)
+    latencias, duracion = _medir(extraer_embedding_pca, imagenes, rondas)
+    return _resumir(latencias, duracion, images=len(imagenes), rounds=rondas)
+
+
+def caso_reconocimiento(tamaño, dimension, consultas, k):
+    """
+    Galería sintética de `tamaño` usuarios (una muestra cada uno) con la
+    escala de las proyecciones PCA; la mitad de las consultas son muestras
+    de la galería con ruido y la otra mitad, rostros nuevos.
+    """
+    import numpy as np
+    from galeria import IndiceGaleria
+
+    rng = np.random.default_rng(0)
+    escala = 3000.0 / np.sqrt(np.arange(1, dimension + 1))
+    galeria = (rng.normal(size=(tamaño, dimension)) * escala).astype(np.float32)
+    mitad = consultas // 2
+    entradas = np.vstack([
+        galeria[rng.integers(0, tamaño, mitad)] + rng.normal(size=(mitad, dimension)) * escala * 0.05,
+        rng.normal(size=(consultas - mitad, dimension)) * escala,
+    ]).astype(np.float32)
+
+    indice = IndiceGaleria("min")
+    indice.cargar((i, fila) for i, fila in enumerate(galeria))
+    del galeria
+
+    latencias, duracion = _medir(lambda q: indice.buscar_top_k(q, max(k, 2)), entradas, 1)
+    return _resumir(latencias, duracion, gallery_size=tamaño, dimension=dimension, queries=consultas, k=k)
+
+
+def entorno():
+    """Datos del entorno que condicionan los resultados."""
+    import cv2
+    import numpy as np
+    from detectores import FACE_DETECTOR
+    from modelos import registro_modelos
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "detector": FACE_DETECTOR,
+        "pca_dimension": registro_modelos.dimension(),
+        "pca_version": registro_modelos.version_pca(),
+        "threads": {v: os.getenv(v) for v in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")},
+    }
+
+
+def ejecutar_casos(args):
+    """Ejecuta cada caso en un proceso nuevo y devuelve {nombre: resultado}."""
+    directorio = os.path.join(RAIZ, args.directorio)
+    casos = {}
+    if "preprocesar" in args.casos:
+        casos["preprocesar_cara"] = (caso_preprocesar, (directorio, args.rondas))
+    if "extraer" in args.casos:
+        casos["extraer_embedding_pca"] = (caso_extraer, (directorio, args.rondas))
+    if "reconocimiento" in args.casos:
+        for tamaño in args.galerias:
+            casos[f"reconocimiento_{tamaño}"] = (caso_reconocimiento, (tamaño, args.dimension, args.consultas, args.k))
+
+    contexto = multiprocessing.get_context("spawn")
+    resultados = {}
+    for nombre, (funcion, parametros) in casos.items():
+        print(f"  {nombre}...", file=sys.stderr, flush=True)
+        with contexto.Pool(1) as pool:
+            resultados[nombre] = pool.apply(funcion, parametros)
+    return resultados
+
+
+def comparar(resultado, linea_base, tolerancia, tolerancia_rss):
+    """
+    Compara cada caso con el de la línea base.
+
+    Solo se compara si la línea base se midió en la misma máquina (MAQUINA);
+    con otro detector o modelo (MODELO) solo se comparan los casos de
+    búsqueda, que usan una galería sintética.
+
+    Returns:
+        list: Regresiones como dicts (case, metric, baseline, current, change).
+    """
+    regresiones = []
+    actual_env, base_env = resultado["environment"], linea_base["environment"]
+    # Los tiempos de otra máquina no son comparables con ningún margen
+    maquina = [c for c in MAQUINA if actual_env.get(c) != base_env.get(c)]
+    if maquina:
+        print(f"Advertencia: la línea base se midió con otro {', '.join(maquina)} "
+              f"({', '.join(f'{c}={base_env.get(c)}' for c in maquina)}); no se compara ningún caso. "
+              "Regenerarla en esta máquina con --guardar-linea-base", file=sys.stderr)
+        return regresiones
+    distintos = [c for c in MODELO if actual_env.get(c) != base_env.get(c)]
+    if distintos:
+        print(f"Advertencia: la línea base se midió con otro {', '.join(distintos)}; "
+              "solo se comparan los casos que no dependen de ello", file=sys.stderr)
+    for nombre, actual in resultado["cases"].items():
+        base = linea_base["cases"].get(nombre)
+        if base is None:
+            continue
+        if distintos and not nombre.startswith("reconocimiento_"):
+            continue
+        if nombre.startswith("reconocimiento_") and base["params"].get("dimension") != actual["params"].get("dimension"):
+            continue
+        for metrica, mas_es_mejor in METRICAS_COMPARADAS:
+            margen = tolerancia_rss if metrica == "peak_rss_mb" else tolerancia
+            valor, referencia = actual[metrica], base[metrica]
+            if referencia <= 0:
+                continue
+            cambio = valor / referencia - 1.0
+            peor = cambio < -margen / (1.0 + margen) if mas_es_mejor else cambio > margen
+            if peor:
+                regresiones.append({
+                    "case": nombre, "metric": metrica, "baseline": referencia,
+                    "current": valor, "change": round(cambio, 4),
+                })
+    return regresiones
+
+
+def imprimir(resultado, regresiones):
+    print(f"\n{'caso':<26}{'llamadas/s':>12}{'p50 (ms)':>11}{'p99 (ms)':>11}{'media (ms)':>12}{'RSS (MB)':>10}")
+    for nombre, r in resultado["cases"].items():
+        print(f"{nombre:<26}{r['throughput_per_s']:>12.1f}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}"
+              f"{r['mean_ms']:>12.3f}{r['peak_rss_mb']:>10.1f}")
+    if regresiones:
+        print("\nREGRESIONES:")
+        for r in regresiones:
+            print(f"  {r['case']}: {r['metric']} {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de rendimiento de preprocesado, embeddings y búsqueda")
+    parser.add_argument("--casos", nargs="+", default=["preprocesar", "extraer", "reconocimiento"],
+                        choices=["preprocesar", "extraer", "reconocimiento"])
+    parser.add_argument("--directorio", default="data/initial_enrollment")
+    parser.add_argument("--rondas", type=int, default=3, help="pasadas medidas por las imágenes")
+    parser.add_argument("--galerias", nargs="+", type=int, default=list(GALERIAS))
+    parser.add_argument("--dimension", type=int, default=None,
+                        help="dimensión de la galería sintética (por defecto, la del modelo publicado)")
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--k", type=int, default=int(os.getenv("RECOGNITION_TOP_K", "3")))
+    parser.add_argument("--salida", help="archivo JSON con los resultados (por defecto, solo se imprimen)")
+    parser.add_argument("--comparar", nargs="?", const=LINEA_BASE, help="línea base con la que comparar")
+    parser.add_argument("--guardar-linea-base", nargs="?", const=LINEA_BASE,
+                        help="guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="empeoramiento relativo admitido en latencia y throughput")
+    parser.add_argument("--tolerancia-rss", type=float, default=0.15,
+                        help="aumento relativo admitido en la RSS máxima")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    info = entorno()
+    if args.dimension is None:
+        args.dimension = info["pca_dimension"]
+
+    resultado = {"environment": info, "cases": ejecutar_casos(args)}
+
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar) as f:
+            linea_base = json.load(f)
+        regresiones = comparar(resultado, linea_base, args.tolerancia, args.tolerancia_rss)
+        resultado["baseline"] = {"path": os.path.relpath(args.comparar, RAIZ), "commit": linea_base["environment"].get("commit")}
+        resultado["regressions"] = regresiones
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(resultado, f, indent=2)
+    if args.guardar_linea_base:
+        with open(args.guardar_linea_base, "w") as f:
+            json.dump({"environment": info, "cases": resultado["cases"]}, f, indent=2)
+            f.write("\n")
+
+    imprimir(resultado, regresiones)
+    sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
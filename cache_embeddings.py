@@ -0,0 +1,137 @@
+# cache_embeddings.py
+# -------------------
+# Caché LRU (con TTL opcional) de resultados de extracción de embeddings,
+# indexada por un hash del contenido de la imagen subida. Evita repetir
+# MTCNN + PCA cuando los clientes reenvían la misma foto (reintentos,
+# inscripciones duplicadas, la app móvil en redes inestables).
+# También guarda el resultado "no se detectó rostro" (None).
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuración de la Caché ---
+# Número máximo de entradas (0 desactiva la caché)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+# Tiempo de vida de cada entrada en segundos (0 = sin expiración)
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "0"))
+
+
+class CacheEmbeddings:
+    """
+    Caché LRU acotada de embeddings por hash de contenido.
+
+    Se invalida por completo automáticamente cuando cambia el pickle o la
+    cabecera publicada del modelo PCA (tamaño o fecha), porque los embeddings
+    guardados dejan de corresponder al modelo en uso. Quien extrae tras un
+    fallo toma antes la huella del modelo (huella_modelo) y la pasa a
+    guardar: si el modelo cambió entretanto, el embedding se descarta.
+    """
+
+    def __init__(self, max_entradas=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL,
+                 rutas_modelo=('models/pca_model.pkl', 'models/pca_model.json')):
+        self.max_entradas = max(0, max_entradas)
+        self.ttl = max(0.0, ttl)
+        self.rutas_modelo = rutas_modelo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._huella_modelo = self._huella_actual()
+        # Contadores para monitoreo
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    @property
+    def habilitada(self):
+        return self.max_entradas > 0
+
+    @staticmethod
+    def clave(contenido):
+        """Hash del contenido de la imagen (BLAKE2b es más rápido que SHA-256)."""
+        return hashlib.blake2b(contenido, digest_size=20).hexdigest()
+
+    def _huella_actual(self):
+        huella = []
+        for ruta in self.rutas_modelo:
+            try:
+                estado = os.stat(ruta)
+                huella.append((estado.st_mtime_ns, estado.st_size))
+            except OSError:
+                huella.append(None)
+        return tuple(huella)
+
+    def huella_modelo(self):
+        """Huella del modelo en uso, para pasarla a guardar() tras extraer."""
+        return self._huella_actual()
+
+    def _verificar_modelo(self):
+        # Debe llamarse con el lock tomado
+        huella = self._huella_actual()
+        if huella != self._huella_modelo:
+            self._entradas.clear()
+            self._huella_modelo = huella
+            self.invalidaciones += 1
+
+    def obtener(self, clave):
+        """
+        Returns:
+            tuple: (encontrado, embedding). `embedding` puede ser None si la
+                   imagen guardada no tenía rostro.
+        """
+        if not self.habilitada:
+            return False, None
+        with self._lock:
+            self._verificar_modelo()
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                embedding, expira = entrada
+                if expira is None or expira > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, embedding
+                del self._entradas[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, embedding, huella=None):
+        """
+        Args:
+            huella (tuple): huella_modelo() tomada antes de extraer el embedding.
+                            Si ya no es la del modelo en uso, no se guarda.
+        """
+        if not self.habilitada:
+            return
+        expira = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._verificar_modelo()
+            if huella is not None and huella != self._huella_modelo:
+                # Calculado con el modelo anterior: no debe sobrevivir a la invalidación
+                return
+            self._entradas[clave] = (embedding, expira)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        return {
+            "enabled": self.habilitada,
+            "size": len(self._entradas),
+            "max_size": self.max_entradas,
+            "ttl_seconds": self.ttl,
+            "hits": self.aciertos,
+            "misses": self.fallos,
+            "evictions": self.desalojos,
+            "invalidations": self.invalidaciones,
+        }
+
+
+# Instancia única compartida por todos los endpoints del proceso
+cache_embeddings = CacheEmbeddings()
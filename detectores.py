@@ -0,0 +1,135 @@
+# detectores.py
+# -------------
+# Backends intercambiables de detección de rostros para facial_preprocesador.
+# Todos implementan la misma interfaz: reciben imágenes BGR y devuelven, por
+# imagen, una lista de cajas (x, y, ancho, alto) ordenadas de la más
+# prominente a la menos prominente.
+#
+# - 'mtcnn': el detector original (TensorFlow/Keras). Más preciso, pero tarda
+#   segundos en cargar, ocupa cientos de MB y es lento por imagen en CPU.
+# - 'haar': cascada Haar de OpenCV. Solo depende de OpenCV, carga al instante
+#   y es muy barata en CPU, a costa de una tasa de detección algo menor.
+
+import logging
+import os
+import threading
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración del Detector ---
+# Backend de detección: 'mtcnn' o 'haar'
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "mtcnn").lower()
+# Lado máximo (px) al que se reduce la imagen antes de la cascada Haar (0 = sin reducir)
+HAAR_MAX_SIDE = int(os.getenv("HAAR_MAX_SIDE", "640"))
+
+
+class DetectorRostros:
+    """Interfaz común de los detectores de rostros."""
+
+    nombre = "base"
+
+    def detectar(self, img_bgr):
+        """Devuelve la lista de cajas [x, y, ancho, alto] de una imagen BGR."""
+        raise NotImplementedError
+
+    def detectar_lote(self, imagenes_bgr):
+        """Devuelve una lista de cajas por imagen. Por defecto, una a una."""
+        return [self.detectar(img) for img in imagenes_bgr]
+
+
+class DetectorMTCNN(DetectorRostros):
+    """Detector MTCNN; admite lotes de imágenes del mismo tamaño en una sola inferencia."""
+
+    nombre = "mtcnn"
+
+    def __init__(self):
+        # Importación diferida: solo este backend arrastra TensorFlow/Keras
+        from mtcnn.mtcnn import MTCNN
+        self._mtcnn = MTCNN()
+
+    @staticmethod
+    def _cajas(resultados):
+        # MTCNN ya ordena por confianza; se conserva ese orden
+        return [r['box'] for r in resultados]
+
+    def detectar(self, img_bgr):
+        # MTCNN espera imágenes RGB para la detección
+        img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+        return self._cajas(self._mtcnn.detect_faces(img_rgb))
+
+    def detectar_lote(self, imagenes_bgr):
+        # Las cajas pueden diferir en unos píxeles de las de detectar(): la
+        # inferencia por lotes no es idéntica bit a bit a la individual
+        lote_rgb = [cv2.cvtColor(img, cv2.COLOR_BGR2RGB) for img in imagenes_bgr]
+        # Con una lista de entrada, MTCNN devuelve una lista de resultados por imagen
+        return [self._cajas(r) for r in self._mtcnn.detect_faces(lote_rgb)]
+
+
+class DetectorHaar(DetectorRostros):
+    """
+    Detector basado en la cascada Haar frontal incluida con OpenCV.
+    CascadeClassifier no es thread-safe: cada hilo (pool en modo 'hilo') usa
+    su propia copia, que carga en milisegundos.
+    """
+
+    nombre = "haar"
+
+    def __init__(self, max_lado=HAAR_MAX_SIDE,
+                 archivo='haarcascade_frontalface_default.xml'):
+        self._ruta = os.path.join(cv2.data.haarcascades, archivo)
+        self._local = threading.local()
+        # Se carga ya una vez para fallar al crear el detector si falta el archivo
+        self._cascada()
+        self.max_lado = max_lado
+
+    def _cascada(self):
+        cascada = getattr(self._local, "cascada", None)
+        if cascada is None:
+            cascada = cv2.CascadeClassifier(self._ruta)
+            if cascada.empty():
+                raise RuntimeError(f"No se pudo cargar la cascada Haar: {self._ruta}")
+            self._local.cascada = cascada
+        return cascada
+
+    def detectar(self, img_bgr):
+        gris = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+
+        # Reducir fotos grandes acelera mucho la cascada; las cajas se reescalan luego
+        escala = 1.0
+        lado = max(gris.shape[:2])
+        if self.max_lado and lado > self.max_lado:
+            escala = self.max_lado / lado
+            gris = cv2.resize(gris, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+        cajas = self._cascada().detectMultiScale(
+            gris, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+        )
+        # La cascada no da una confianza útil: el rostro más grande se considera el principal
+        cajas = sorted((tuple(c) for c in cajas), key=lambda c: c[2] * c[3], reverse=True)
+        return [[int(round(v / escala)) for v in caja] for caja in cajas]
+
+
+DETECTORES = {
+    DetectorMTCNN.nombre: DetectorMTCNN,
+    DetectorHaar.nombre: DetectorHaar,
+}
+
+
+def crear_detector(nombre=FACE_DETECTOR):
+    """
+    Instancia el backend de detección configurado.
+
+    Returns:
+        DetectorRostros: El detector, o None si no se pudo inicializar.
+    """
+    clase = DETECTORES.get(nombre)
+    if clase is None:
+        logger.error("Detector de rostros desconocido '%s'. Opciones: %s", nombre, ", ".join(DETECTORES))
+        return None
+    try:
+        return clase()
+    except Exception as e:
+        logger.error("Error grave: no se pudo inicializar el detector %s. Error: %s", nombre, e)
+        return None
@@ -5,49 +5,197 @@
 # características faciales más importantes (Eigenfaces) y guarda el
 # modelo resultante para que nuestra API pueda usarlo en producción.
 
+import hashlib
+import multiprocessing
 import os
 import numpy as np
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.decomposition import PCA
+from proyeccion_pca import desde_sklearn, publicar_proyeccion
 # Importamos la función de pre-procesamiento de nuestro módulo
 from facial_preprocesador import preprocesar_cara 
 
-def entrenar_modelo_pca(directorio_datos, ruta_modelo_salida, n_componentes=33):
+# --- Configuración del Entrenamiento ---
+# Procesos que detectan y recortan rostros en paralelo (1 = sin pool)
+PCA_TRAINING_WORKERS = int(os.getenv("PCA_TRAINING_WORKERS", "2"))
+# Imágenes que se envían juntas a cada worker
+PCA_TRAINING_CHUNK_SIZE = int(os.getenv("PCA_TRAINING_CHUNK_SIZE", "8"))
+# Caché en disco de los rostros ya recortados ('' la desactiva)
+PCA_CROP_CACHE_DIR = os.getenv("PCA_CROP_CACHE_DIR", "data/cache_rostros")
+
+# Tamaño estándar de los rostros (100x100 -> vectores de 10000 píxeles)
+TAMAÑO_ROSTRO = (100, 100)
+# Se incrementa si cambia el pre-procesamiento, para no reutilizar recortes viejos
+VERSION_PREPROCESADO = 1
+
+
+def _clave_recorte(ruta):
+    """
+    Clave de caché de un recorte: contenido de la imagen, detector y tamaño.
+    Así la caché sigue siendo válida si la imagen se mueve o renombra, y se
+    ignora si cambia el archivo o el backend de detección.
+    """
+    from detectores import FACE_DETECTOR
+    h = hashlib.blake2b(digest_size=20)
+    with open(ruta, 'rb') as f:
+        h.update(f.read())
+    h.update(f"{FACE_DETECTOR}|{TAMAÑO_ROSTRO}|{VERSION_PREPROCESADO}".encode())
+    return h.hexdigest()
+
+
+def _leer_recorte(directorio_cache, clave):
+    """
+    Returns:
+        tuple: (encontrado, cara). `cara` es None si la imagen no tenía rostro.
+    """
+    ruta = os.path.join(directorio_cache, clave + '.npy')
+    if not os.path.exists(ruta):
+        return False, None
+    cara = np.load(ruta)
+    # Un arreglo vacío marca "no se detectó rostro" para no volver a intentarlo
+    return True, (cara if cara.size else None)
+
+
+def _guardar_recorte(directorio_cache, clave, cara):
+    ruta = os.path.join(directorio_cache, clave + '.npy')
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        np.save(f, cara if cara is not None else np.empty(0, dtype=np.uint8))
+    os.replace(temporal, ruta)
+
+
+def _preprocesar_bloque(rutas):
+    """Tarea de cada worker: pre-procesa un bloque de imágenes, una a una."""
+    return [preprocesar_cara(ruta, tamaño_requerido=TAMAÑO_ROSTRO) for ruta in rutas]
+
+
+def _inicializar_worker():
+    """Carga el detector una sola vez por worker."""
+    from registro import configurar_logging
+    configurar_logging()
+    from modelos import registro_modelos
+    registro_modelos.detector()
+
+
+def _listar_imagenes(directorio_datos):
+    # Orden estable: el modelo resultante no depende del orden de os.listdir
+    return sorted(
+        os.path.join(directorio_datos, nombre)
+        for nombre in os.listdir(directorio_datos)
+        if nombre.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+
+
+def preparar_caras(rutas, workers=PCA_TRAINING_WORKERS, directorio_cache=PCA_CROP_CACHE_DIR,
+                   tamaño_bloque=PCA_TRAINING_CHUNK_SIZE, destino=None):
+    """
+    Pre-procesa las imágenes y escribe cada rostro aplanado directamente en una
+    matriz preasignada (n_imagenes, 10000) float64, sin listas intermedias.
+    Los recortes en caché se leen de disco; el resto se reparte en bloques
+    entre un pool de procesos.
+
+    Args:
+        rutas (list): Rutas de las imágenes.
+        workers (int): Procesos de pre-procesamiento (1 = en este proceso).
+        directorio_cache (str): Carpeta de la caché de recortes ('' o None = sin caché).
+        tamaño_bloque (int): Imágenes por tarea enviada a un worker.
+        destino (numpy.ndarray): Matriz donde escribir (p. ej. un np.memmap);
+                                 si es None se reserva en memoria.
+
+    Returns:
+        numpy.ndarray: Vista con las filas de los rostros válidos, en el orden de `rutas`.
+    """
+    n_pixeles = TAMAÑO_ROSTRO[0] * TAMAÑO_ROSTRO[1]
+    if destino is None:
+        destino = np.empty((len(rutas), n_pixeles), dtype=np.float64)
+
+    if directorio_cache:
+        os.makedirs(directorio_cache, exist_ok=True)
+
+    # 1. Resolver desde la caché; las imágenes restantes quedan pendientes
+    caras = [None] * len(rutas)
+    claves = [None] * len(rutas)
+    pendientes = []
+    for i, ruta in enumerate(rutas):
+        if directorio_cache:
+            claves[i] = _clave_recorte(ruta)
+            encontrado, caras[i] = _leer_recorte(directorio_cache, claves[i])
+            if encontrado:
+                continue
+        pendientes.append(i)
+    print(f"Rostros en caché: {len(rutas) - len(pendientes)}, por procesar: {len(pendientes)}")
+
+    # 2. Detectar y recortar las pendientes (en paralelo si hay varios workers)
+    bloques = [pendientes[i:i + tamaño_bloque] for i in range(0, len(pendientes), tamaño_bloque)]
+    if workers > 1 and len(bloques) > 1:
+        # 'spawn' evita heredar el estado de TensorFlow del proceso padre vía fork
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_worker,
+        ) as executor:
+            resultados = executor.map(_preprocesar_bloque, [[rutas[i] for i in b] for b in bloques])
+            for bloque, recortes in zip(bloques, resultados):
+                for i, cara in zip(bloque, recortes):
+                    caras[i] = cara
+                    if directorio_cache:
+                        _guardar_recorte(directorio_cache, claves[i], cara)
+    else:
+        for bloque in bloques:
+            for i, cara in zip(bloque, _preprocesar_bloque([rutas[i] for i in bloque])):
+                caras[i] = cara
+                if directorio_cache:
+                    _guardar_recorte(directorio_cache, claves[i], cara)
+
+    # 3. Copiar los rostros válidos a filas consecutivas de la matriz
+    n_validas = 0
+    for cara in caras:
+        if cara is not None:
+            destino[n_validas] = cara.ravel()
+            n_validas += 1
+    return destino[:n_validas]
+
+
+def entrenar_modelo_pca(directorio_datos, ruta_modelo_salida, n_componentes=33,
+                        workers=PCA_TRAINING_WORKERS, directorio_cache=PCA_CROP_CACHE_DIR,
+                        ruta_memmap=None):
     """
     Entrena un modelo PCA a partir de las imágenes en un directorio y lo guarda.
 
     Args:
         directorio_datos (str): Ruta a la carpeta con las imágenes de entrenamiento (ej: 'data/initial_enrollment/').
         ruta_modelo_salida (str): Ruta completa donde se guardará el modelo entrenado
-                                  (ej: 'models/pca_model.pkl').
+                                  (ej: 'models/pca_model.pkl'). Junto a él se exporta
+                                  el artefacto compacto .npy (+ cabecera .json) que
+                                  usa la API en producción.
         n_componentes (int): El número de "Eigenfaces" a generar. Este será
                               la longitud de nuestros vectores de embedding.
+        workers (int): Procesos para detectar y recortar rostros en paralelo.
+        directorio_cache (str): Caché de recortes en disco ('' para desactivarla).
+        ruta_memmap (str): Si se indica, la matriz de rostros se crea como archivo
+                           .npy mapeado en memoria en esa ruta (conjuntos grandes).
+
+    Returns:
+        bool: True si el modelo se entrenó y guardó correctamente.
     """
-    caras_preparadas = []
-    
     print("--- Iniciando Fase de Entrenamiento del Modelo PCA ---")
     print(f"Leyendo imágenes del directorio: {directorio_datos}")
 
     # 1. Leer y pre-procesar todas las imágenes de entrenamiento
-    for nombre_archivo in os.listdir(directorio_datos):
-        ruta_completa = os.path.join(directorio_datos, nombre_archivo)
-        
-        # Solo procesar archivos de imagen
-        if not nombre_archivo.lower().endswith(('.png', '.jpg', '.jpeg')):
-            continue
-
-        # Usamos nuestra función de pre-procesamiento
-        cara = preprocesar_cara(ruta_completa)
-        
-        if cara is not None:
-            # Aplanamos la matriz de la imagen (100x100 -> 10000) y la añadimos a la lista
-            caras_preparadas.append(cara.flatten())
-        # Los mensajes de advertencia ya los muestra la función preprocesar_cara
+    rutas = _listar_imagenes(directorio_datos)
+    destino = None
+    if ruta_memmap:
+        n_pixeles = TAMAÑO_ROSTRO[0] * TAMAÑO_ROSTRO[1]
+        destino = np.lib.format.open_memmap(ruta_memmap, mode='w+', dtype=np.float64,
+                                            shape=(len(rutas), n_pixeles))
+    caras_preparadas = preparar_caras(rutas, workers=workers, directorio_cache=directorio_cache,
+                                      destino=destino)
             
     if len(caras_preparadas) == 0:
         print(f"\nError Crítico: No se encontraron imágenes válidas en el directorio '{directorio_datos}'.")
         print("Asegúrate de que la carpeta exista y contenga imágenes de rostros.")
-        return
+        return False
 
     if len(caras_preparadas) < n_componentes:
         print(f"\nError Crítico: Se necesitan al menos {n_componentes} imágenes válidas para entrenar el modelo,")
@@ -59,14 +207,15 @@ def entrenar_modelo_pca(directorio_datos, ruta_modelo_salida, n_componentes=33):
             n_componentes = len(caras_preparadas) - 1
             if n_componentes <= 0:
                 print("No hay suficientes muestras para PCA. Abortando.")
-                return
+                return False
 
     print(f"\nSe han procesado {len(caras_preparadas)} imágenes válidas.")
     print(f"Iniciando entrenamiento de PCA con {n_componentes} componentes...")
     
     # 2. Crear y entrenar el modelo PCA
-    pca = PCA(n_components=n_componentes)
-    pca.fit(np.array(caras_preparadas))
+    # copy=False: se centra la matriz preasignada en su lugar en vez de duplicarla
+    pca = PCA(n_components=n_componentes, copy=False)
+    pca.fit(caras_preparadas)
     
     print("¡Entrenamiento completado!")
     
@@ -78,11 +227,28 @@ def entrenar_modelo_pca(directorio_datos, ruta_modelo_salida, n_componentes=33):
         with open(ruta_modelo_salida, 'wb') as f:
             pickle.dump(pca, f)
         print(f"\n--- Modelo PCA guardado exitosamente en: {ruta_modelo_salida} ---")
+
+        # Exportar la media y las componentes en formato compacto (mmap),
+        # como una nueva versión publicada del modelo
+        ruta_npy = os.path.splitext(ruta_modelo_salida)[0] + '.npy'
+        metadatos = publicar_proyeccion(desde_sklearn(pca), ruta_npy, origen=os.path.basename(ruta_modelo_salida))
+        print(f"--- Proyección PCA publicada (versión {metadatos['version']}): {metadatos['data_file']} ---")
+        return True
     except Exception as e:
         print(f"\nError Crítico: No se pudo guardar el modelo. Error: {e}")
+        return False
 
 # Este bloque solo se ejecuta cuando corres 'python entrenador_pca.py' directamente
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Entrena el modelo PCA (Eigenfaces)")
+    parser.add_argument("--workers", type=int, default=PCA_TRAINING_WORKERS,
+                        help="procesos de pre-procesamiento en paralelo")
+    parser.add_argument("--sin-cache", action="store_true", help="no usar la caché de recortes")
+    parser.add_argument("--memmap", default=None,
+                        help="archivo .npy donde mapear la matriz de rostros (conjuntos grandes)")
+    args = parser.parse_args()
+
     # Definir las rutas de entrada y salida
     # !IMPORTANTE: Crea esta carpeta y coloca las 30 imágenes de alumnos aquí!
     directorio_datos_entrenamiento = 'data/initial_enrollment/' 
@@ -95,4 +261,9 @@ if __name__ == '__main__':
         print("Por favor, coloca las imágenes de perfil de los 30 alumnos aquí para entrenar el PCA.")
     else:
         # Llamar a la función principal
-        entrenar_modelo_pca(directorio_datos_entrenamiento, ruta_modelo_salida)
+        entrenar_modelo_pca(
+            directorio_datos_entrenamiento, ruta_modelo_salida,
+            workers=args.workers,
+            directorio_cache='' if args.sin_cache else PCA_CROP_CACHE_DIR,
+            ruta_memmap=args.memmap
+        )
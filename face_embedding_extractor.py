@@ -4,31 +4,25 @@
 # y usarlo para extraer el vector de características (embedding) de un rostro.
 # Este embedding será utilizado para las comparaciones en la base de datos.
 
+import logging
 import numpy as np
-import pickle
 import os
 
 # Importamos la función de pre-procesamiento de nuestro módulo
 # Asegúrate de que facial_preprocesador.py esté en el mismo directorio
 # o en una ruta accesible por Python.
-from facial_preprocesador import preprocesar_cara
-
-# --- Inicialización Global del Modelo PCA ---
-# Cargamos el modelo PCA entrenado una única vez al inicio del script/servidor.
-# Esto es crucial para la eficiencia.
-model_pca = None
-ruta_modelo_pca = 'models/pca_model.pkl' # Ruta donde se guardará/cargará el modelo PCA
-
-try:
-    if os.path.exists(ruta_modelo_pca):
-        with open(ruta_modelo_pca, 'rb') as f:
-            model_pca = pickle.load(f)
-        print(f"Modelo PCA cargado exitosamente desde: {ruta_modelo_pca}")
-    else:
-        print(f"Advertencia: Modelo PCA no encontrado en {ruta_modelo_pca}. Por favor, entrena el modelo primero ejecutando entrenador_pca.py.")
-except Exception as e:
-    print(f"Error grave: no se pudo cargar el modelo PCA. Error: {e}")
-    model_pca = None
+from facial_preprocesador import preprocesar_cara, preprocesar_caras_lote
+from modelos import registro_modelos, RUTA_MODELO_PCA
+from metricas import reloj, registrar_etapa
+
+logger = logging.getLogger(__name__)
+
+# --- Modelo PCA ---
+# El modelo se obtiene del registro compartido (modelos.py), que lo carga una
+# única vez por proceso en el primer uso o durante el calentamiento. Con el
+# artefacto compacto (proyeccion_pca.py) es una proyección sobre un arreglo en
+# memoria mapeada, compartido por todos los workers; `transform` es idéntico.
+ruta_modelo_pca = RUTA_MODELO_PCA # Ruta donde se guardará/cargará el modelo PCA
 
 def extraer_embedding_pca(ruta_imagen):
     """
@@ -42,14 +36,18 @@ def extraer_embedding_pca(ruta_imagen):
     3. Pasar el vector aplanado al modelo PCA para obtener su embedding (vector de características reducido).
 
     Args:
-        ruta_imagen (str): La ruta completa al archivo de imagen.
+        ruta_imagen (str | bytes | numpy.ndarray): La ruta completa al archivo de imagen,
+                                                   los bytes de la imagen subida o la imagen
+                                                   ya decodificada (BGR). Con bytes o arreglos
+                                                   no se realiza ninguna E/S de disco.
 
     Returns:
-        numpy.ndarray: El vector de características (embedding) del rostro,
+        numpy.ndarray: El vector de características (embedding, float32) del rostro,
                        o None si ocurre algún error (ej. no se detecta cara, modelo PCA no cargado).
     """
+    model_pca = registro_modelos.pca()
     if model_pca is None:
-        print("Error: El modelo PCA no está inicializado. No se puede extraer el embedding.")
+        logger.error("El modelo PCA no está inicializado. No se puede extraer el embedding.")
         return None
 
     # 1. Pre-procesar la imagen del rostro
@@ -57,7 +55,10 @@ def extraer_embedding_pca(ruta_imagen):
     cara_estandarizada = preprocesar_cara(ruta_imagen, tamaño_requerido=(100, 100))
     
     if cara_estandarizada is None:
-        print(f"No se pudo obtener una cara estandarizada de {os.path.basename(ruta_imagen)}. Skipping embedding extraction.")
+        logger.info(
+            "No se pudo obtener una cara estandarizada de %s. Skipping embedding extraction.",
+            os.path.basename(ruta_imagen) if isinstance(ruta_imagen, str) else "la imagen en memoria"
+        )
         return None
     
     # 2. Aplanar la imagen pre-procesada a un vector 1D
@@ -66,10 +67,74 @@ def extraer_embedding_pca(ruta_imagen):
 
     # PCA.transform() espera un batch de muestras, incluso si es solo una.
     # np.expand_dims añade una dimensión extra al inicio para simular un "batch" de 1 muestra.
-    embedding = model_pca.transform(np.expand_dims(cara_aplanada, axis=0))[0]
+    # Se devuelve en float32, la precisión de la columna vector de pgvector y
+    # del índice en memoria: lo que se compara es exactamente lo que se guarda
+    inicio = reloj()
+    embedding = model_pca.transform(np.expand_dims(cara_aplanada, axis=0))[0].astype(np.float32)
+    registrar_etapa("proyeccion_pca", inicio)
     
     return embedding
 
+def extraer_embeddings_pca(imagenes):
+    """
+    Extrae los embeddings de varias imágenes una a una, con el mismo resultado
+    que extraer_embedding_pca (a diferencia de la detección por lotes). Pensada
+    como tarea del pool para trabajos de fondo sobre fotos de perfil, que
+    suelen ser grandes: una detección MTCNN conjunta multiplicaría la memoria.
+
+    Returns:
+        list: Un embedding (o None) por imagen, en el mismo orden.
+    """
+    return [extraer_embedding_pca(imagen) for imagen in imagenes]
+
+def extraer_embeddings_pca_lote(imagenes):
+    """
+    Extrae los embeddings de un lote de imágenes con una única detección MTCNN
+    y una única llamada a model_pca.transform para todos los rostros válidos.
+
+    Args:
+        imagenes (list): Rutas de archivo, bytes de imagen o imágenes BGR ya cargadas.
+
+    Returns:
+        list: Un elemento por imagen, en el mismo orden: el embedding
+              (numpy.ndarray) o None si no se pudo obtener un rostro.
+    """
+    model_pca = registro_modelos.pca()
+    if model_pca is None:
+        logger.error("El modelo PCA no está inicializado. No se puede extraer el embedding.")
+        return [None] * len(imagenes)
+
+    caras = preprocesar_caras_lote(imagenes, tamaño_requerido=(100, 100))
+    validas = [i for i, cara in enumerate(caras) if cara is not None]
+
+    embeddings = [None] * len(imagenes)
+    if not validas:
+        return embeddings
+
+    # Apilamos todos los rostros aplanados en una matriz (n_caras, 10000)
+    matriz = np.stack([caras[i].flatten() for i in validas])
+    inicio = reloj()
+    proyecciones = model_pca.transform(matriz).astype(np.float32)
+    registrar_etapa("proyeccion_pca", inicio)
+    for i, embedding in zip(validas, proyecciones):
+        embeddings[i] = embedding
+    return embeddings
+
+def proyectar_caras(caras):
+    """
+    Proyecta con el PCA rostros ya estandarizados (100x100, escala de grises),
+    p. ej. los de las pistas del seguimiento de video, en una sola llamada.
+
+    Returns:
+        numpy.ndarray: Matriz (n_caras, n_componentes) en float32, o None si
+                       el modelo PCA no está inicializado.
+    """
+    model_pca = registro_modelos.pca()
+    if model_pca is None:
+        logger.error("El modelo PCA no está inicializado. No se puede extraer el embedding.")
+        return None
+    return model_pca.transform(np.stack([cara.flatten() for cara in caras])).astype(np.float32)
+
 # --- Bloque de Prueba ---
 if __name__ == "__main__":
     # Para probar esta función, asegúrate de haber:
@@ -6,19 +6,81 @@
 # listo para el análisis PCA.
 
 import cv2
+import logging
 import numpy as np
 import os
-from mtcnn.mtcnn import MTCNN
-
-# --- Inicialización del Modelo de Detección ---
-# Creamos la instancia del detector MTCNN aquí, a nivel de módulo.
-# Esto es una optimización clave para que el modelo pesado se cargue
-# en memoria solo una vez cuando la aplicación se inicia.
-try:
-    detector_mtcnn = MTCNN()
-except Exception as e:
-    print(f"Error grave: no se pudo inicializar el detector MTCNN. Error: {e}")
-    detector_mtcnn = None
+
+from modelos import registro_modelos
+from metricas import reloj, registrar_etapa
+
+logger = logging.getLogger(__name__)
+
+# --- Modelo de Detección ---
+# El detector se obtiene del registro compartido (modelos.py), que lo crea
+# una sola vez por proceso en el primer uso o durante el calentamiento, en
+# lugar de cargarlo (con TensorFlow) al importar este módulo.
+# El backend (MTCNN u OpenCV Haar) se elige con la variable FACE_DETECTOR.
+
+def decodificar_imagen(contenido):
+    """
+    Decodifica los bytes de una imagen (JPEG, PNG, ...) directamente en memoria.
+
+    Returns:
+        numpy.ndarray: La imagen en formato BGR, o None si los bytes no son una imagen válida.
+    """
+    if not contenido:
+        return None
+    buffer = np.frombuffer(contenido, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+def _cargar_imagen(origen):
+    """
+    Obtiene la imagen BGR a partir de una ruta de archivo, de los bytes de la
+    imagen (decodificados en memoria, sin pasar por disco) o de un arreglo ya cargado.
+    Devuelve una tupla (imagen, nombre) donde 'nombre' solo se usa en los mensajes.
+    """
+    if origen is None:
+        return None, "<imagen inválida>"
+    if isinstance(origen, np.ndarray):
+        return origen, "<imagen en memoria>"
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        return decodificar_imagen(origen), "<imagen en memoria>"
+    return cv2.imread(origen), os.path.basename(origen)
+
+def _recortar_cara(img, cajas, nombre, tamaño_requerido):
+    """
+    Pasos 3 a 6 del pipeline: recorta el primer rostro detectado, lo convierte
+    a escala de grises, ecualiza su histograma y lo redimensiona.
+    """
+    if not cajas:
+        # Si la lista de cajas está vacía, no se encontraron caras
+        logger.warning("No se detectó ningún rostro en la imagen %s.", nombre)
+        return None
+
+    # Tomamos el primer rostro detectado (generalmente el más prominente)
+    x, y, ancho, alto = cajas[0]
+    
+    # Corregir coordenadas negativas (un bug común de MTCNN en los bordes)
+    x, y = abs(x), abs(y)
+    
+    # 3. Recortar la cara de la imagen original
+    # Asegurarse de que el recorte no se salga de los límites de la imagen
+    x2, y2 = x + ancho, y + alto
+    cara = img[max(0, y):min(img.shape[0], y2), 
+               max(0, x):min(img.shape[1], x2)]
+
+    if cara.size == 0:
+        logger.warning("Recorte de cara inválido (tamaño cero) para %s. Skipping.", nombre)
+        return None
+
+    # 4. Convertir la cara a escala de grises
+    cara_gris = cv2.cvtColor(cara, cv2.COLOR_BGR2GRAY)
+
+    # 5. Ecualización del Histograma para normalizar la iluminación
+    cara_ecualizada = cv2.equalizeHist(cara_gris)
+
+    # 6. Redimensionar la cara al tamaño estándar
+    return cv2.resize(cara_ecualizada, tamaño_requerido)
 
 def preprocesar_cara(ruta_imagen, tamaño_requerido=(100, 100)):
     """
@@ -27,14 +89,16 @@ def preprocesar_cara(ruta_imagen, tamaño_requerido=(100, 100)):
 
     Pasos:
     1. Lee la imagen.
-    2. Usa MTCNN para detectar la cara principal.
+    2. Usa el detector configurado (MTCNN por defecto) para detectar la cara principal.
     3. Recorta la cara.
     4. La convierte a escala de grises.
     5. Normaliza la iluminación con Ecualización del Histograma.
     6. La redimensiona a un tamaño estándar (100x100 píxeles).
 
     Args:
-        ruta_imagen (str): La ruta completa al archivo de imagen.
+        ruta_imagen (str | bytes | numpy.ndarray): La ruta completa al archivo de imagen,
+                                                   los bytes de la imagen codificada (JPEG, PNG, ...)
+                                                   o la imagen ya cargada en formato BGR.
         tamaño_requerido (tuple): El tamaño final de la imagen (ancho, alto).
                                  Por defecto, 100x100 píxeles para PCA.
 
@@ -42,53 +106,114 @@ def preprocesar_cara(ruta_imagen, tamaño_requerido=(100, 100)):
         numpy.ndarray: La imagen del rostro procesada y estandarizada (escala de grises),
                        o None si ocurre algún error o no se detecta una cara.
     """
-    if detector_mtcnn is None:
-        print("Error: El detector MTCNN no está inicializado.")
+    detector = registro_modelos.detector()
+    if detector is None:
+        logger.error("El detector de rostros no está inicializado.")
         return None
 
     # 1. Leer la imagen desde la ruta proporcionada
-    img = cv2.imread(ruta_imagen)
+    inicio = reloj()
+    img, nombre = _cargar_imagen(ruta_imagen)
+    registrar_etapa("decodificacion", inicio)
     if img is None:
-        print(f"Advertencia: No se pudo leer la imagen en la ruta: {ruta_imagen}")
+        logger.warning("No se pudo leer la imagen %s.", nombre)
         return None
 
-    # MTCNN espera imágenes RGB para la detección
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) 
-    
-    # 2. Detectar rostros en la imagen usando MTCNN
-    resultados = detector_mtcnn.detect_faces(img_rgb)
-
-    if resultados:
-        # Tomamos el primer rostro detectado (generalmente el más prominente)
-        x, y, ancho, alto = resultados[0]['box']
-        
-        # Corregir coordenadas negativas (un bug común de MTCNN en los bordes)
-        x, y = abs(x), abs(y)
-        
-        # 3. Recortar la cara de la imagen original
-        # Asegurarse de que el recorte no se salga de los límites de la imagen
-        x2, y2 = x + ancho, y + alto
-        cara = img[max(0, y):min(img.shape[0], y2), 
-                   max(0, x):min(img.shape[1], x2)]
-
-        if cara.size == 0:
-            print(f"Advertencia: Recorte de cara inválido (tamaño cero) para {os.path.basename(ruta_imagen)}. Skipping.")
-            return None
-
-        # 4. Convertir la cara a escala de grises
-        cara_gris = cv2.cvtColor(cara, cv2.COLOR_BGR2GRAY)
-
-        # 5. Ecualización del Histograma para normalizar la iluminación
-        cara_ecualizada = cv2.equalizeHist(cara_gris)
-
-        # 6. Redimensionar la cara al tamaño estándar
-        cara_estandarizada = cv2.resize(cara_ecualizada, tamaño_requerido)
-        
-        return cara_estandarizada
-    else:
-        # Si la lista de resultados está vacía, no se encontraron caras
-        print(f"Advertencia: No se detectó ningún rostro en la imagen {os.path.basename(ruta_imagen)}.")
-        return None
+    # 2. Detectar rostros en la imagen
+    inicio = reloj()
+    cajas = detector.detectar(img)
+    registrar_etapa("deteccion", inicio)
+
+    inicio = reloj()
+    cara = _recortar_cara(img, cajas, nombre, tamaño_requerido)
+    registrar_etapa("preprocesado", inicio)
+    return cara
+
+def detectar_rostros(imagen):
+    """
+    Solo la detección (paso 2 del pipeline), para el seguimiento de rostros
+    en video: las cajas se siguen entre fotogramas y cada rostro se
+    estandariza después con estandarizar_cara.
+
+    Args:
+        imagen (str | bytes | numpy.ndarray): Ruta, bytes o imagen BGR.
+
+    Returns:
+        list: Cajas [x, y, ancho, alto] de la más a la menos prominente
+              (vacía si no hay rostros o la imagen no se pudo leer).
+    """
+    detector = registro_modelos.detector()
+    if detector is None:
+        logger.error("El detector de rostros no está inicializado.")
+        return []
+    img, nombre = _cargar_imagen(imagen)
+    if img is None:
+        logger.warning("No se pudo leer la imagen %s.", nombre)
+        return []
+    inicio = reloj()
+    cajas = detector.detectar(img)
+    registrar_etapa("deteccion", inicio)
+    return [[int(v) for v in caja] for caja in cajas]
+
+def estandarizar_cara(img, caja, tamaño_requerido=(100, 100)):
+    """
+    Pasos 3 a 6 del pipeline sobre una caja ya conocida (detectada o
+    seguida), sin volver a detectar.
+
+    Returns:
+        numpy.ndarray: El rostro estandarizado, o None si la caja queda fuera de la imagen.
+    """
+    return _recortar_cara(img, [caja], "<fotograma>", tamaño_requerido)
+
+def preprocesar_caras_lote(imagenes, tamaño_requerido=(100, 100)):
+    """
+    Versión por lotes de preprocesar_cara: con MTCNN ejecuta una única inferencia
+    sobre todas las imágenes y luego recorta/estandariza cada rostro.
+
+    Args:
+        imagenes (list): Rutas de archivo, bytes de imagen o imágenes BGR ya cargadas
+                         (los elementos None se tratan como imágenes ilegibles).
+        tamaño_requerido (tuple): El tamaño final de cada rostro (ancho, alto).
+
+    Returns:
+        list: Un elemento por imagen, en el mismo orden: el rostro estandarizado
+              (numpy.ndarray) o None si la imagen no pudo leerse o no tenía rostro.
+    """
+    detector = registro_modelos.detector()
+    if detector is None:
+        logger.error("El detector de rostros no está inicializado.")
+        return [None] * len(imagenes)
+
+    caras = [None] * len(imagenes)
+    cargadas = []
+    inicio = reloj()
+    for i, origen in enumerate(imagenes):
+        img, nombre = _cargar_imagen(origen)
+        if img is None:
+            logger.warning("No se pudo leer la imagen %d del lote.", i)
+            continue
+        cargadas.append((i, img, nombre))
+    registrar_etapa("decodificacion", inicio)
+
+    if not cargadas:
+        return caras
+
+    # Agrupamos por tamaño: MTCNN rellena (padding) las imágenes de un lote hasta
+    # el tamaño de la mayor, lo que altera la pirámide de escalas y las detecciones.
+    # Los frames de una misma cámara comparten tamaño y van en una sola llamada.
+    grupos = {}
+    for elemento in cargadas:
+        grupos.setdefault(elemento[1].shape, []).append(elemento)
+
+    for grupo in grupos.values():
+        inicio = reloj()
+        cajas_lote = detector.detectar_lote([img for _, img, _ in grupo])
+        registrar_etapa("deteccion", inicio)
+        inicio = reloj()
+        for (i, img, nombre), cajas in zip(grupo, cajas_lote):
+            caras[i] = _recortar_cara(img, cajas, nombre, tamaño_requerido)
+        registrar_etapa("preprocesado", inicio)
+    return caras
 
 # --- Bloque de Prueba (para verificar la función) ---
 if __name__ == "__main__":
@@ -0,0 +1,374 @@
+# galeria.py
+# ----------
+# Este módulo mantiene en memoria un índice de la galería de rostros:
+# una matriz contigua float32 con todos los embeddings (varias muestras por
+# usuario) y un arreglo paralelo con los IDs de usuario. Así el endpoint
+# /recognize/ no necesita leer toda la tabla de embeddings ni calcular
+# distancias usuario por usuario en Python.
+
+import os
+import threading
+import numpy as np
+
+# --- Configuración de la Galería ---
+# Cómo se combinan las distancias a las varias muestras de un mismo usuario:
+# 'min' (la muestra más cercana decide) o 'centroide' (distancia al promedio
+# de sus muestras; una fila por usuario, más rápido con muchas muestras)
+GALLERY_AGGREGATION = os.getenv("GALLERY_AGGREGATION", "min").lower()
+
+
+class IndiceGaleria:
+    """
+    Índice vectorizado de embeddings residente en el proceso.
+
+    Cada usuario puede tener varias muestras (fotos de inscripción y muestras
+    añadidas después). Las búsquedas calculan las distancias a todas las filas
+    con una sola operación matricial y reducen por usuario según la
+    agregación: con 'min' cada muestra es una fila (el argmin global es la
+    mejor muestra del mejor usuario); con 'centroide' cada usuario es una fila.
+
+    Las filas se guardan en float32 junto con sus normas al cuadrado, que se
+    calculan una sola vez al publicar: así la distancia a toda la galería es
+    ||q||² - 2·q·x + ||x||², es decir, un único producto matriz-vector (GEMV)
+    por consulta, sin restar la consulta fila a fila.
+
+    Las lecturas trabajan sobre una "instantánea" inmutable (IDs + matriz +
+    normas) que se reemplaza de una sola vez, de modo que una búsqueda en
+    curso nunca ve un estado a medio actualizar. La matriz es una vista de un
+    búfer con capacidad de sobra: las escrituras de pocos usuarios (inscribir,
+    actualizar, eliminar) añaden sus filas al final del búfer, fuera de las
+    instantáneas publicadas, y marcan las filas que reemplazan como "muertas"
+    (sin ID y con norma infinita) en copias de los IDs y las normas. Cuestan
+    O(N) en lugar de reconstruir la matriz completa (O(N·D)); cuando las
+    filas muertas son muchas, el índice se compacta reconstruyéndolo.
+    """
+
+    def __init__(self, agregacion=GALLERY_AGGREGATION):
+        if agregacion not in ("min", "centroide"):
+            raise ValueError(f"Agregación de galería inválida: {agregacion}")
+        self.agregacion = agregacion
+        self._lock = threading.Lock()
+        # user_id -> matriz float32 (n_muestras, d) con sus muestras
+        self._muestras = {}
+        self._num_muestras = 0
+        # Filas de búsqueda: una por muestra ('min') o por usuario ('centroide'),
+        # como tupla (ids, matriz float32, normas al cuadrado de cada fila,
+        # fila inicial de cada usuario). Las filas de un usuario son contiguas.
+        self._instantanea = (
+            np.empty(0, dtype=object), np.empty((0, 0), dtype=np.float32),
+            np.empty(0, dtype=np.float32), np.empty(0, dtype=np.intp)
+        )
+        # Búfer cuyas primeras filas son la matriz publicada, rango de filas
+        # vivas de cada usuario y filas muertas pendientes de compactar
+        self._bufer = np.empty((0, 0), dtype=np.float32)
+        self._rangos = {}
+        self._muertas = 0
+        # Versión del modelo PCA con la que se calcularon los embeddings cargados
+        self.version_modelo = None
+
+    def __len__(self):
+        """Número de usuarios en la galería."""
+        return len(self._muestras)
+
+    @property
+    def muestras(self):
+        """Número total de muestras (embeddings) de todos los usuarios."""
+        return self._num_muestras
+
+    def _filas_usuario(self, muestras):
+        """Filas de búsqueda de un usuario según la agregación."""
+        return muestras.mean(axis=0, keepdims=True) if self.agregacion == "centroide" else muestras
+
+    def _publicar(self, muestras):
+        """Reconstruye las filas de búsqueda y reemplaza la instantánea (con el lock tomado)."""
+        ids, filas, rangos, inicio = [], [], {}, 0
+        for user_id, matriz_usuario in muestras.items():
+            filas_usuario = self._filas_usuario(matriz_usuario)
+            ids.extend([user_id] * len(filas_usuario))
+            filas.append(filas_usuario)
+            rangos[user_id] = (inicio, inicio + len(filas_usuario))
+            inicio += len(filas_usuario)
+
+        if filas:
+            matriz = np.ascontiguousarray(np.vstack(filas), dtype=np.float32)
+        else:
+            matriz = np.empty((0, 0), dtype=np.float32)
+        self._muestras = muestras
+        self._num_muestras = sum(len(m) for m in muestras.values())
+        self._bufer, self._rangos, self._muertas = matriz, rangos, 0
+        self._instantanea = (
+            np.array(ids, dtype=object), matriz, np.einsum('ij,ij->i', matriz, matriz),
+            np.array([r[0] for r in rangos.values()], dtype=np.intp)
+        )
+
+    def _aplicar(self, cambios):
+        """
+        Reemplaza las filas de algunos usuarios (con el lock tomado).
+
+        Args:
+            cambios (dict): user_id -> matriz de sus muestras, o None para eliminarlo.
+        """
+        muestras = self._muestras
+        for user_id, matriz_usuario in cambios.items():
+            anterior = muestras.pop(user_id, None)
+            if anterior is not None:
+                self._num_muestras -= len(anterior)
+            if matriz_usuario is not None:
+                muestras[user_id] = matriz_usuario
+                self._num_muestras += len(matriz_usuario)
+
+        ids, matriz, normas, inicios = self._instantanea
+        retiradas = [self._rangos.pop(user_id) for user_id in cambios if user_id in self._rangos]
+        nuevas = [(user_id, self._filas_usuario(m)) for user_id, m in cambios.items() if m is not None]
+        n = len(ids)
+        total = n + sum(len(filas) for _, filas in nuevas)
+        muertas = self._muertas + sum(fin - inicio for inicio, fin in retiradas)
+        dimension = nuevas[-1][1].shape[1] if nuevas else matriz.shape[1]
+        if (n and dimension != matriz.shape[1]) or any(f.shape[1] != dimension for _, f in nuevas):
+            # Cambió la dimensión (muestras de otro modelo): las de la dimensión
+            # anterior ya no son comparables con las consultas, se descartan
+            # hasta que el índice se recargue para la versión nueva
+            self._publicar({u: m for u, m in muestras.items() if m.shape[1] == dimension})
+            return
+        if muertas > max(64, total // 4):
+            # Compactar: demasiadas filas muertas
+            self._publicar(muestras)
+            return
+
+        if total > len(self._bufer) or dimension != self._bufer.shape[1]:
+            # Crecimiento geométrico: las copias del búfer se amortizan
+            bufer = np.empty((max(total, 2 * len(self._bufer), 64), dimension), dtype=np.float32)
+            if n:
+                bufer[:n] = matriz
+            self._bufer = bufer
+        # Las filas nuevas van tras las publicadas: ninguna instantánea las ve aún
+        ids_nuevos, normas_nuevas, inicios_nuevos, fila = [], [], [], n
+        for user_id, filas in nuevas:
+            self._bufer[fila:fila + len(filas)] = filas
+            self._rangos[user_id] = (fila, fila + len(filas))
+            ids_nuevos.extend([user_id] * len(filas))
+            inicios_nuevos.append(fila)
+            fila += len(filas)
+        matriz = self._bufer[:total]
+        agregadas = matriz[n:]
+
+        ids = np.concatenate([ids, np.array(ids_nuevos, dtype=object)])
+        normas = np.concatenate([normas, np.einsum('ij,ij->i', agregadas, agregadas)])
+        for inicio, fin in retiradas:
+            # Filas muertas: nunca ganan y sus grupos se descartan al buscar
+            ids[inicio:fin] = None
+            normas[inicio:fin] = np.inf
+        self._muertas = muertas
+        self._instantanea = (ids, matriz, normas, np.append(inicios, np.array(inicios_nuevos, dtype=np.intp)))
+
+    def cargar(self, pares, version_modelo=None):
+        """
+        Reconstruye el índice completo a partir de pares (user_id, embedding).
+        Un mismo usuario puede aparecer varias veces (una por muestra).
+        Los pares sin embedding se ignoran.
+        """
+        agrupadas = {}
+        for user_id, embedding in pares:
+            if embedding is None:
+                continue
+            agrupadas.setdefault(str(user_id), []).append(np.asarray(embedding, dtype=np.float32))
+        muestras = {user_id: np.vstack(vectores) for user_id, vectores in agrupadas.items()}
+
+        with self._lock:
+            self._publicar(muestras)
+            self.version_modelo = version_modelo
+
+    def cargar_desde_db(self, db, version_modelo=None):
+        """
+        Construye el índice leyendo solo las columnas (user_id, embedding) de las
+        muestras. Con `version_modelo`, solo las calculadas con esa versión del
+        modelo (las demás no son comparables con las consultas).
+        """
+        # Importación local para no acoplar el índice al esquema al importar el módulo
+        from database import FaceEmbedding
+        filas = db.query(FaceEmbedding.user_id, FaceEmbedding.embedding).filter(
+            FaceEmbedding.embedding.isnot(None)
+        )
+        if version_modelo is not None:
+            filas = filas.filter(FaceEmbedding.model_version == version_modelo)
+        self.cargar(filas, version_modelo)
+
+    def establecer(self, user_id, embeddings):
+        """Reemplaza todas las muestras de un usuario (sin muestras, lo elimina)."""
+        self.establecer_varios({user_id: embeddings})
+
+    def establecer_varios(self, usuarios):
+        """
+        Reemplaza las muestras de varios usuarios publicando una sola
+        instantánea (p. ej. tras cada lote de la inscripción masiva).
+
+        Args:
+            usuarios (dict): user_id -> lista de embeddings (vacía para eliminarlo).
+        """
+        cambios = {}
+        for user_id, embeddings in usuarios.items():
+            embeddings = [e for e in embeddings if e is not None]
+            cambios[str(user_id)] = (
+                np.vstack([np.asarray(e, dtype=np.float32) for e in embeddings]) if embeddings else None
+            )
+        with self._lock:
+            self._aplicar(cambios)
+
+    def agregar(self, user_id, embedding):
+        """Añade una muestra a un usuario (lo crea si no estaba)."""
+        user_id = str(user_id)
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            actuales = self._muestras.get(user_id)
+            self._aplicar({user_id: vector if actuales is None else np.vstack([actuales, vector])})
+
+    def eliminar(self, user_id):
+        """Quita a un usuario y todas sus muestras del índice (no hace nada si no estaba)."""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._muestras:
+                self._aplicar({user_id: None})
+
+    def buscar_top_k(self, embedding, k):
+        """
+        Los k usuarios más cercanos (distintos) a un embedding.
+
+        Returns:
+            list: Pares (user_id, distancia) de menor a mayor distancia;
+                  menos de k si la galería tiene menos usuarios.
+        """
+        return self.buscar_top_k_lote([embedding], k)[0]
+
+    def buscar_top_k_lote(self, embeddings, k):
+        """
+        Los k usuarios más cercanos de cada embedding, con una sola operación
+        matricial. Las filas se reducen por usuario (np.minimum.reduceat sobre
+        sus filas contiguas) y los k mejores se eligen con una selección
+        parcial (argpartition, O(usuarios)); solo esos k se ordenan.
+
+        Returns:
+            list: Una lista de pares (user_id, distancia) por consulta, en el
+                  mismo orden, cada una de menor a mayor distancia.
+        """
+        # Tomamos una instantánea consistente sin bloquear durante el cálculo
+        ids, matriz, normas, inicios = self._instantanea
+        if len(embeddings) == 0:
+            return []
+        if len(ids) == 0 or k < 1:
+            return [[] for _ in embeddings]
+
+        consultas = np.asarray(embeddings, dtype=np.float32)
+        # Sin ||q||²: es constante por consulta y no cambia el orden
+        parciales = normas[None, :] - 2.0 * (consultas @ matriz.T)
+        if len(inicios) != len(ids):
+            parciales = np.minimum.reduceat(parciales, inicios, axis=1)
+        k = min(k, len(inicios))
+        if k < len(inicios):
+            seleccion = np.argpartition(parciales, k - 1, axis=1)[:, :k]
+        else:
+            seleccion = np.broadcast_to(np.arange(k), (len(consultas), k))
+
+        finales = np.append(inicios, len(ids))
+        resultados = []
+        for consulta, usuarios in zip(consultas, seleccion):
+            # Distancia exacta de cada candidato: la de su muestra más cercana.
+            # Los grupos de filas muertas (sin ID) solo se eligen si faltan usuarios
+            candidatos = [
+                (ids[finales[u]], min(_distancia(fila, consulta) for fila in matriz[finales[u]:finales[u + 1]]))
+                for u in usuarios if ids[finales[u]] is not None
+            ]
+            candidatos.sort(key=lambda par: par[1])
+            resultados.append(candidatos)
+        return resultados
+
+
+def _distancia(fila, consulta):
+    """
+    Distancia exacta entre el candidato elegido y la consulta. La forma
+    expandida basta para ordenar, pero en float32 pierde precisión cuando la
+    distancia es pequeña frente a las normas (la de un rostro consigo mismo
+    no daría 0); recalcularla para una sola fila cuesta O(d).
+    """
+    diferencia = fila - consulta
+    return float(np.sqrt(np.dot(diferencia, diferencia)))
+
+
+# --- Kernels de distancias por pares ---
+# Usados por /debug/distances para ajustar el umbral. Trabajan por bloques
+# para acotar la memoria temporal; impostores_cercanos aprovecha además que
+# la matriz es simétrica.
+
+def _distancias_bloque(a, normas_a, b, normas_b):
+    """Distancias euclidianas entre las filas de `a` y las de `b` (float32)."""
+    cuadrados = normas_a[:, None] - 2.0 * (a @ b.T) + normas_b[None, :]
+    np.maximum(cuadrados, 0.0, out=cuadrados)
+    return np.sqrt(cuadrados, out=cuadrados)
+
+
+def distancias_filas(matriz, inicio, fin):
+    """
+    Calcula las filas [inicio, fin) de la matriz de distancias de `matriz`
+    contra todos los embeddings (útil para paginar sin calcular N×N).
+    """
+    matriz = np.asarray(matriz, dtype=np.float32)
+    normas = np.einsum('ij,ij->i', matriz, matriz)
+    filas = _distancias_bloque(matriz[inicio:fin], normas[inicio:fin], matriz, normas)
+    # La distancia de cada embedding consigo mismo es exactamente cero
+    indices = np.arange(inicio, min(fin, len(matriz)))
+    filas[indices - inicio, indices] = 0.0
+    return filas
+
+
+def _fusionar_top_k(mejores_idx, mejores_dist, candidatos_idx, candidatos_dist, k):
+    """Combina el top-k actual de cada fila con nuevos candidatos (selección parcial)."""
+    idx = np.concatenate([mejores_idx, candidatos_idx], axis=1)
+    dist = np.concatenate([mejores_dist, candidatos_dist], axis=1)
+    seleccion = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    filas = np.arange(len(dist))[:, None]
+    return idx[filas, seleccion], dist[filas, seleccion]
+
+
+def impostores_cercanos(matriz, k=5, bloque=1024):
+    """
+    Para cada embedding, los k embeddings de OTROS usuarios más cercanos
+    ("impostores"), sin materializar la matriz N×N. Cada bloque del triángulo
+    superior actualiza el top-k de sus filas y, transpuesto, el de sus columnas.
+
+    Returns:
+        tuple: (indices, distancias), ambos de forma (N, k) y ordenados
+               de menor a mayor distancia.
+    """
+    matriz = np.asarray(matriz, dtype=np.float32)
+    n = len(matriz)
+    k = max(1, min(k, n - 1)) if n > 1 else 0
+    mejores_idx = np.full((n, k), -1, dtype=np.int64)
+    mejores_dist = np.full((n, k), np.inf, dtype=np.float32)
+    if k == 0:
+        return mejores_idx, mejores_dist
+
+    normas = np.einsum('ij,ij->i', matriz, matriz)
+    for i in range(0, n, bloque):
+        fi = min(i + bloque, n)
+        for j in range(i, n, bloque):
+            fj = min(j + bloque, n)
+            d = _distancias_bloque(matriz[i:fi], normas[i:fi], matriz[j:fj], normas[j:fj])
+            if j == i:
+                # Excluir la distancia de cada embedding consigo mismo
+                np.fill_diagonal(d, np.inf)
+            columnas = np.broadcast_to(np.arange(j, fj), d.shape)
+            mejores_idx[i:fi], mejores_dist[i:fi] = _fusionar_top_k(
+                mejores_idx[i:fi], mejores_dist[i:fi], columnas, d, k
+            )
+            if j != i:
+                filas = np.broadcast_to(np.arange(i, fi), d.T.shape)
+                mejores_idx[j:fj], mejores_dist[j:fj] = _fusionar_top_k(
+                    mejores_idx[j:fj], mejores_dist[j:fj], filas, d.T, k
+                )
+
+    orden = np.argsort(mejores_dist, axis=1)
+    filas = np.arange(n)[:, None]
+    return mejores_idx[filas, orden], mejores_dist[filas, orden]
+
+
+# Instancia única compartida por todos los endpoints del proceso
+indice_galeria = IndiceGaleria()
@@ -12,6 +12,15 @@ def init_model():
     
     if os.path.exists(model_path):
         print("✅ Modelo PCA ya existe")
+        # Modelos entrenados antes del formato compacto: exportarlo una vez
+        ruta_npy = os.path.splitext(model_path)[0] + '.npy'
+        if not os.path.exists(os.path.splitext(model_path)[0] + '.json'):
+            try:
+                from proyeccion_pca import exportar_desde_pickle
+                exportar_desde_pickle(model_path, ruta_npy)
+                print(f"✅ Proyección PCA exportada en {ruta_npy}")
+            except Exception as e:
+                print(f"⚠️  No se pudo exportar la proyección PCA: {e}")
         return True
     
     print("🔄 Modelo PCA no encontrado. Entrenando modelo...")
@@ -0,0 +1,427 @@
+# inscripcion_masiva.py
+# ---------------------
+# Inscripción masiva de usuarios a partir de un manifiesto CSV con una fila
+# por persona (nombre, apellido, email, telefono, foto[, requisitoriado]).
+# Las fotos vienen en un archivo ZIP junto al manifiesto, subidas junto a él
+# (endpoint POST /usuarios/masivo) o en el directorio del manifiesto (CLI).
+#
+# En lugar de repetir POST /usuarios/ por persona, las filas se procesan por
+# lotes: una sola consulta de emails existentes por lote, los embeddings se
+# extraen en paralelo en el pool de workers y los usuarios y sus muestras se
+# insertan en una única transacción por lote.
+# Cada fila se reporta como creada, omitida o con error.
+#
+# Es reanudable: los emails que ya existen (sin distinguir mayúsculas) se
+# omiten, así que tras una interrupción basta con volver a ejecutar la
+# importación con el mismo manifiesto. Cada lote se confirma completo o no
+# se confirma.
+#
+# Uso offline:  python inscripcion_masiva.py usuarios.csv|usuarios.zip [--reporte reporte.jsonl]
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import posixpath
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+from face_embedding_extractor import extraer_embeddings_pca
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración de la Inscripción Masiva ---
+# Filas que se validan e insertan en una misma transacción
+BULK_ENROLLMENT_BATCH_SIZE = int(os.getenv("BULK_ENROLLMENT_BATCH_SIZE", "500"))
+# Imágenes por tarea de extracción enviada al pool
+BULK_ENROLLMENT_CHUNK_SIZE = int(os.getenv("BULK_ENROLLMENT_CHUNK_SIZE", "8"))
+
+FOTOS_DIR = "static/fotos_perfil"
+
+COLUMNAS_OBLIGATORIAS = ("nombre", "apellido", "email", "telefono", "foto")
+NOMBRES_MANIFIESTO = ("manifest.csv", "manifiesto.csv")
+
+
+class ManifiestoInvalidoError(ValueError):
+    """El manifiesto o el archivo de la importación no tiene el formato esperado."""
+
+
+def leer_manifiesto(texto):
+    """
+    Lee las filas de un manifiesto CSV.
+
+    Returns:
+        list: Un dict por fila, con los valores sin espacios sobrantes y la
+              clave 'fila' (número de línea de datos, empezando en 1).
+
+    Raises:
+        ManifiestoInvalidoError: Si faltan columnas obligatorias.
+    """
+    lector = csv.DictReader(io.StringIO(texto.lstrip("﻿")))
+    columnas = {c.strip().lower() for c in (lector.fieldnames or []) if c}
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in columnas]
+    if faltantes:
+        raise ManifiestoInvalidoError(f"Faltan columnas en el manifiesto: {', '.join(faltantes)}")
+
+    filas = []
+    for numero, fila in enumerate(lector, start=1):
+        limpia = {(k or "").strip().lower(): (v or "").strip() for k, v in fila.items()}
+        limpia["fila"] = numero
+        filas.append(limpia)
+    return filas
+
+
+def _es_verdadero(valor):
+    return str(valor).strip().lower() in ("1", "true", "si", "sí", "yes", "x")
+
+
+def fuente_zip(archivo):
+    """
+    Abre un ZIP con el manifiesto (manifest.csv, o el único .csv de la raíz)
+    y las fotos, referenciadas por su ruta relativa dentro del archivo.
+
+    Args:
+        archivo: Ruta o archivo binario (con seek) del ZIP.
+
+    Returns:
+        tuple: (filas, leer_foto) donde leer_foto(nombre) devuelve los bytes o None.
+    """
+    try:
+        zf = zipfile.ZipFile(archivo)
+    except zipfile.BadZipFile as e:
+        raise ManifiestoInvalidoError(f"Archivo ZIP inválido: {e}")
+
+    nombres = set(zf.namelist())
+    candidatos = [n for n in NOMBRES_MANIFIESTO if n in nombres]
+    if not candidatos:
+        candidatos = [n for n in nombres if n.lower().endswith(".csv") and "/" not in n]
+    if len(candidatos) != 1:
+        raise ManifiestoInvalidoError("El ZIP debe contener un único manifiesto CSV en su raíz")
+    filas = leer_manifiesto(zf.read(candidatos[0]).decode("utf-8"))
+
+    def leer_foto(nombre):
+        nombre = posixpath.normpath(nombre.replace("\\", "/"))
+        return zf.read(nombre) if nombre in nombres else None
+
+    return filas, leer_foto
+
+
+def fuente_directorio(ruta_manifiesto):
+    """
+    Manifiesto CSV en disco; las fotos se buscan relativas a su directorio
+    (sin permitir salir de él).
+
+    Returns:
+        tuple: (filas, leer_foto)
+    """
+    with open(ruta_manifiesto, encoding="utf-8") as f:
+        filas = leer_manifiesto(f.read())
+    base = os.path.realpath(os.path.dirname(os.path.abspath(ruta_manifiesto)))
+
+    def leer_foto(nombre):
+        ruta = os.path.realpath(os.path.join(base, nombre))
+        if not ruta.startswith(base + os.sep) or not os.path.isfile(ruta):
+            return None
+        with open(ruta, "rb") as f:
+            return f.read()
+
+    return filas, leer_foto
+
+
+def fuente_archivos(texto_manifiesto, fotos):
+    """
+    Manifiesto subido junto con sus fotos, que se emparejan por nombre de archivo.
+
+    Args:
+        fotos (dict): nombre de archivo -> archivo binario abierto (con seek).
+    """
+    filas = leer_manifiesto(texto_manifiesto)
+
+    def leer_foto(nombre):
+        archivo = fotos.get(posixpath.basename(nombre.replace("\\", "/")))
+        if archivo is None:
+            return None
+        # Varias filas pueden referenciar la misma foto
+        archivo.seek(0)
+        return archivo.read()
+
+    return filas, leer_foto
+
+
+def _usuarios_por_email(emails):
+    """
+    IDs de los usuarios con alguno de los emails, sin distinguir mayúsculas.
+
+    Returns:
+        dict: email en minúsculas -> user_id
+    """
+    from sqlalchemy import func
+    from database import SessionLocal, User
+
+    db = SessionLocal()
+    try:
+        filas = db.query(User.email, User.id).filter(
+            func.lower(User.email).in_([email.lower() for email in emails])
+        ).all()
+    finally:
+        db.close()
+    return {email.lower(): user_id for email, user_id in filas}
+
+
+def _resultado(fila, estado, user_id=None, error=None):
+    return {
+        "row": fila["fila"],
+        "email": fila.get("email") or None,
+        "status": estado,
+        "id": str(user_id) if user_id else None,
+        "error": error,
+    }
+
+
+class InscripcionMasiva:
+    """
+    Procesa un manifiesto por lotes y reporta el resultado de cada fila.
+
+    Args:
+        ejecutar: Corrutina ejecutar(funcion, *args) que corre la extracción
+                  fuera del event loop (por defecto, el pool de embeddings,
+                  esperando si su cola está llena).
+        directorio_fotos (str): Dónde se guardan las fotos de perfil.
+    """
+
+    def __init__(self, ejecutar=None, directorio_fotos=FOTOS_DIR,
+                 tamaño_lote=BULK_ENROLLMENT_BATCH_SIZE, tamaño_bloque=BULK_ENROLLMENT_CHUNK_SIZE):
+        if ejecutar is None:
+            from pool_embeddings import pool_embeddings
+            ejecutar = pool_embeddings.ejecutar_en_espera
+        self.ejecutar = ejecutar
+        self.directorio_fotos = directorio_fotos
+        self.tamaño_lote = max(1, tamaño_lote)
+        self.tamaño_bloque = max(1, tamaño_bloque)
+
+    async def inscribir(self, filas, leer_foto, al_reportar=None):
+        """
+        Inscribe todas las filas del manifiesto.
+
+        Args:
+            filas (list): Filas devueltas por leer_manifiesto().
+            leer_foto: Función nombre -> bytes de la foto (o None si no existe).
+            al_reportar: Función opcional que recibe cada resultado en cuanto se
+                         conoce (p. ej. para escribir el reporte de la CLI).
+
+        Returns:
+            dict: Totales ('created', 'skipped', 'failed'), duración y 'results'
+                  con el resultado de cada fila en el orden del manifiesto.
+        """
+        from modelos import registro_modelos
+
+        loop = asyncio.get_running_loop()
+        os.makedirs(self.directorio_fotos, exist_ok=True)
+        inicio = time.perf_counter()
+        resultados = []
+        vistos = set()
+
+        for i in range(0, len(filas), self.tamaño_lote):
+            lote = filas[i:i + self.tamaño_lote]
+            validas, rechazadas = await loop.run_in_executor(None, self._preparar_lote, lote, leer_foto, vistos)
+
+            # Versión del modelo leída antes de extraer: si se publica otra
+            # durante la extracción, los embeddings no quedan etiquetados con ella
+            version = registro_modelos.version_pca()
+            # Extracción en paralelo: cada bloque es una tarea del pool
+            bloques = [validas[j:j + self.tamaño_bloque] for j in range(0, len(validas), self.tamaño_bloque)]
+            extraidos = await asyncio.gather(*(
+                self.ejecutar(extraer_embeddings_pca, [v["contenido"] for v in bloque]) for bloque in bloques
+            ))
+            con_rostro = []
+            for bloque, embeddings in zip(bloques, extraidos):
+                for valida, embedding in zip(bloque, embeddings):
+                    if embedding is None:
+                        rechazadas.append(_resultado(valida["fila"], "error", error="No se pudo detectar un rostro en la imagen"))
+                    else:
+                        valida["embedding"] = embedding
+                        con_rostro.append(valida)
+
+            lote_resultados = rechazadas
+            if con_rostro:
+                lote_resultados += await loop.run_in_executor(None, self._insertar_lote, con_rostro, version)
+
+            lote_resultados.sort(key=lambda r: r["row"])
+            for resultado in lote_resultados:
+                if al_reportar:
+                    al_reportar(resultado)
+            resultados.extend(lote_resultados)
+            logger.info("Inscripción masiva: %d/%d filas procesadas", min(i + len(lote), len(filas)), len(filas))
+
+        totales = {estado: sum(1 for r in resultados if r["status"] == estado) for estado in ("created", "skipped", "error")}
+        return {
+            "total": len(resultados),
+            "created": totales["created"],
+            "skipped": totales["skipped"],
+            "failed": totales["error"],
+            "elapsed_seconds": round(time.perf_counter() - inicio, 3),
+            "results": resultados,
+        }
+
+    def _preparar_lote(self, lote, leer_foto, vistos):
+        """
+        Valida las filas de un lote y lee sus fotos. Los emails ya inscritos
+        se resuelven con una sola consulta para todo el lote. Los emails se
+        comparan sin distinguir mayúsculas, en el manifiesto y con la BD.
+
+        Returns:
+            tuple: (filas válidas con su 'contenido', resultados de las rechazadas)
+        """
+        validas, rechazadas = [], []
+        for fila in lote:
+            faltantes = [c for c in COLUMNAS_OBLIGATORIAS if not fila.get(c)]
+            if faltantes:
+                rechazadas.append(_resultado(fila, "error", error=f"Faltan campos: {', '.join(faltantes)}"))
+            elif fila["email"].lower() in vistos:
+                rechazadas.append(_resultado(fila, "error", error="Email duplicado en el manifiesto"))
+            else:
+                vistos.add(fila["email"].lower())
+                validas.append({"fila": fila})
+
+        if validas:
+            existentes = _usuarios_por_email([v["fila"]["email"] for v in validas])
+            pendientes = []
+            for valida in validas:
+                user_id = existentes.get(valida["fila"]["email"].lower())
+                if user_id is not None:
+                    # Ya inscrito (p. ej. en una ejecución anterior interrumpida)
+                    rechazadas.append(_resultado(valida["fila"], "skipped", user_id, "El email ya existe"))
+                else:
+                    pendientes.append(valida)
+            validas = pendientes
+
+        con_foto = []
+        for valida in validas:
+            try:
+                contenido = leer_foto(valida["fila"]["foto"])
+            except Exception as e:
+                contenido, motivo = None, f"No se pudo leer la foto: {e}"
+            else:
+                motivo = f"Foto no encontrada: {valida['fila']['foto']}"
+            if not contenido:
+                rechazadas.append(_resultado(valida["fila"], "error", error=motivo))
+            else:
+                valida["contenido"] = contenido
+                con_foto.append(valida)
+        return con_foto, rechazadas
+
+    def _insertar_lote(self, validas, version):
+        """
+        Guarda las fotos y confirma los usuarios del lote (con su muestra de
+        inscripción) en una transacción. Si la transacción falla, se borran
+        las fotos escritas para no dejar archivos huérfanos.
+
+        Args:
+            version (int): Versión del modelo PCA leída antes de extraer los
+                           embeddings, con la que se etiquetan.
+        """
+        from database import SessionLocal, User, FaceEmbedding
+        from galeria import indice_galeria
+
+        ahora = datetime.utcnow()
+        for valida in validas:
+            valida["id"] = uuid.uuid4()
+            ruta = os.path.join(self.directorio_fotos, f"{valida['id']}.jpg")
+            with open(ruta, "wb") as f:
+                f.write(valida["contenido"])
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(User, [{
+                "id": v["id"],
+                "name": f"{v['fila']['nombre']} {v['fila']['apellido']}",
+                "email": v["fila"]["email"],
+                "telefono": v["fila"]["telefono"],
+                "requested": _es_verdadero(v["fila"].get("requisitoriado", "")),
+                "embedding": v["embedding"].tolist(),
+                "model_version": version,
+                "created_at": ahora,
+                "updated_at": ahora,
+            } for v in validas])
+            db.bulk_insert_mappings(FaceEmbedding, [{
+                "id": uuid.uuid4(),
+                "user_id": v["id"],
+                "embedding": v["embedding"].tolist(),
+                "model_version": version,
+                "source": "enrollment",
+                "created_at": ahora,
+            } for v in validas])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Error insertando un lote de %d usuarios: %s", len(validas), e)
+            for valida in validas:
+                try:
+                    os.remove(os.path.join(self.directorio_fotos, f"{valida['id']}.jpg"))
+                except OSError:
+                    pass
+            # Un email pudo inscribirse entre la verificación y el insert:
+            # el lote se reintenta por filas para aislar las que fallan
+            if len(validas) > 1:
+                return [r for valida in validas for r in self._insertar_lote([valida], version)]
+            # Perder esa carrera equivale a un email ya inscrito: se omite,
+            # igual que al reanudar la importación
+            user_id = _usuarios_por_email([validas[0]["fila"]["email"]]).get(validas[0]["fila"]["email"].lower())
+            if user_id is not None:
+                return [_resultado(validas[0]["fila"], "skipped", user_id, "El email ya existe")]
+            return [_resultado(validas[0]["fila"], "error", error=f"Error al guardar el usuario: {e}")]
+        finally:
+            db.close()
+
+        # El índice en memoria se reconstruye una sola vez por lote
+        indice_galeria.establecer_varios({v["id"]: [v["embedding"]] for v in validas})
+        return [_resultado(v["fila"], "created", v["id"]) for v in validas]
+
+
+# --- Ejecución offline ---
+if __name__ == "__main__":
+    import argparse
+    from registro import configurar_logging
+
+    configurar_logging()
+    parser = argparse.ArgumentParser(description="Inscribe usuarios en bloque desde un manifiesto CSV o un ZIP")
+    parser.add_argument("origen", help="manifiesto .csv (fotos relativas a su carpeta) o .zip con manifiesto y fotos")
+    parser.add_argument("--reporte", default=None,
+                        help="archivo JSONL donde añadir el resultado de cada fila")
+    parser.add_argument("--lote", type=int, default=BULK_ENROLLMENT_BATCH_SIZE,
+                        help="filas por transacción")
+    args = parser.parse_args()
+
+    from database import create_db_tables
+    create_db_tables()
+
+    if args.origen.lower().endswith(".zip"):
+        filas, leer_foto = fuente_zip(args.origen)
+    else:
+        filas, leer_foto = fuente_directorio(args.origen)
+
+    reporte = open(args.reporte, "a", encoding="utf-8") if args.reporte else None
+
+    def escribir(resultado):
+        if reporte:
+            reporte.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            reporte.flush()
+
+    try:
+        resumen = asyncio.run(InscripcionMasiva(tamaño_lote=args.lote).inscribir(filas, leer_foto, escribir))
+    finally:
+        if reporte:
+            reporte.close()
+        from pool_embeddings import pool_embeddings
+        pool_embeddings.detener()
+
+    print(f"Filas: {resumen['total']}, creadas: {resumen['created']}, "
+          f"omitidas: {resumen['skipped']}, con error: {resumen['failed']} "
+          f"({resumen['elapsed_seconds']} s)")
+    for resultado in resumen["results"]:
+        if resultado["status"] == "error":
+            print(f"  fila {resultado['row']} ({resultado['email']}): {resultado['error']}")
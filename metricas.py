@@ -0,0 +1,278 @@
+# metricas.py
+# -----------
+# Métricas de la API en el formato de texto de Prometheus (GET /metrics):
+# histogramas de latencia de cada etapa del reconocimiento, contadores de
+# peticiones HTTP y de resultados del reconocimiento, y medidores que se leen
+# en el momento de exponerlos (tamaño de la galería, versión del modelo,
+# colas).
+#
+# Las etapas que corren en el pool de extracción (decodificación, detección,
+# recorte/ecualización, proyección PCA) pueden ejecutarse en otro proceso:
+# el pool corre la tarea con ejecutar_midiendo, que acumula sus tiempos en
+# una lista y la devuelve junto al resultado, y el proceso de la API los
+# incorpora a sus histogramas. Fuera de una tarea medida (reentrenamiento,
+# scripts offline) esas etapas no registran nada.
+#
+# Registrar una observación es sumar en un bucket bajo un lock. Con
+# METRICS_ENABLED=false no se instala el middleware, el pool no envuelve las
+# tareas y las funciones de registro vuelven de inmediato.
+
+import bisect
+import os
+import threading
+import time
+
+# --- Configuración de las Métricas ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Límites (segundos) de los buckets de latencia: de 0.5 ms a 10 s
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIJO = "facerecon_"
+
+reloj = time.perf_counter
+
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra is not None:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monótono con etiquetas (una serie por combinación de valores)."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores, n=1):
+        with self._lock:
+            self._series[valores] = self._series.get(valores, 0) + n
+
+    def valor(self, *valores):
+        return self._series.get(valores, 0)
+
+    def muestras(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, valores)} {_numero(total)}" for valores, total in series]
+
+
+class Histograma:
+    """
+    Histograma acumulativo con etiquetas: por serie guarda el recuento de
+    cada bucket, la suma y el total de observaciones.
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores):
+        # El último índice es el bucket +Inf
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def total(self, *valores):
+        serie = self._series.get(valores)
+        return serie[2] if serie else 0
+
+    def muestras(self):
+        with self._lock:
+            series = sorted((valores, (list(c), s, n)) for valores, (c, s, n) in self._series.items())
+        lineas = []
+        for valores, (recuentos, suma, total) in series:
+            acumulado = 0
+            for limite, recuento in zip(self.buckets + (float("inf"),), recuentos):
+                acumulado += recuento
+                le = _formatear_etiquetas(self.etiquetas, valores, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {total}")
+        return lineas
+
+
+class Medidor:
+    """
+    Valor que se lee al exponer las métricas: `funcion` devuelve un número o
+    un dict {tupla de valores de etiquetas: número}.
+    """
+
+    def __init__(self, nombre, ayuda, funcion, etiquetas=(), tipo="gauge"):
+        self.nombre = PREFIJO + nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.etiquetas = tuple(etiquetas)
+        self.tipo = tipo
+
+    def muestras(self):
+        valor = self.funcion()
+        if valor is None:
+            return []
+        if not isinstance(valor, dict):
+            valor = {(): valor}
+        return [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, valores)} {_numero(numero)}"
+            for valores, numero in sorted(valor.items())
+        ]
+
+
+class RegistroMetricas:
+    """Conjunto de métricas de la API y su exposición en formato Prometheus."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def medidor(self, nombre, ayuda, funcion, etiquetas=(), tipo="gauge"):
+        return self.registrar(Medidor(nombre, ayuda, funcion, etiquetas, tipo))
+
+    def exponer(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+        lineas = []
+        for metrica in self._metricas:
+            try:
+                muestras = metrica.muestras()
+            except Exception:
+                # Un medidor que falla (p. ej. la BD caída) no tumba /metrics
+                continue
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(muestras)
+        return "\n".join(lineas) + "\n"
+
+
+registro_metricas = RegistroMetricas()
+
+etapas_reconocimiento = registro_metricas.registrar(Histograma(
+    "pipeline_stage_seconds",
+    "Latencia de cada etapa del pipeline de reconocimiento (también al inscribir rostros)",
+    ("stage",),
+))
+peticiones_http = registro_metricas.registrar(Contador(
+    "http_requests_total",
+    "Peticiones HTTP atendidas por método, ruta y código de estado",
+    ("method", "path", "status"),
+))
+duracion_http = registro_metricas.registrar(Histograma(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por método y ruta",
+    ("method", "path"),
+))
+resultados_reconocimiento = registro_metricas.registrar(Contador(
+    "recognitions_total",
+    "Rostros procesados por el reconocimiento según el resultado "
+    "(recognized, unrecognized, ambiguous, no_face)",
+    ("result",),
+))
+
+
+def observar_etapa(etapa, inicio):
+    """Registra la duración de una etapa del reconocimiento que empezó en `inicio` (reloj())."""
+    if METRICS_ENABLED:
+        etapas_reconocimiento.observar(reloj() - inicio, etapa)
+
+
+def contar_resultado(resultado, n=1):
+    if METRICS_ENABLED and n:
+        resultados_reconocimiento.incrementar(resultado, n=n)
+
+
+# --- Etapas medidas dentro de las tareas del pool de extracción ---
+_local = threading.local()
+
+
+def registrar_etapa(etapa, inicio):
+    """
+    Como observar_etapa, para el código que corre en el pool de extracción:
+    el tiempo se acumula en la tarea en curso (ejecutar_midiendo) y no hace
+    nada fuera de ella.
+    """
+    muestras = getattr(_local, "muestras", None)
+    if muestras is not None:
+        muestras.append((etapa, reloj() - inicio))
+
+
+def ejecutar_midiendo(funcion, *args):
+    """
+    Tarea del pool: ejecuta funcion(*args) acumulando los tiempos de sus etapas.
+
+    Returns:
+        tuple: (resultado, lista de (etapa, segundos)).
+    """
+    _local.muestras = muestras = []
+    try:
+        return funcion(*args), muestras
+    finally:
+        _local.muestras = None
+
+
+def incorporar_etapas(muestras):
+    """Añade a los histogramas de este proceso los tiempos devueltos por ejecutar_midiendo."""
+    for etapa, segundos in muestras:
+        etapas_reconocimiento.observar(segundos, etapa)
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que cuenta las peticiones HTTP y mide su duración. La
+    ruta se etiqueta con su plantilla (/usuarios/{user_id}), no con la URL,
+    para acotar el número de series; las que no coinciden con ninguna ruta
+    se agrupan bajo 'sin_ruta'.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        inicio = reloj()
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            path = getattr(ruta, "path", None) or "sin_ruta"
+            duracion_http.observar(reloj() - inicio, scope["method"], path)
+            peticiones_http.incrementar(scope["method"], path, str(estado[0]))
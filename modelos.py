@@ -0,0 +1,166 @@
+# modelos.py
+# ----------
+# Registro único de los modelos de IA del proceso (detector de rostros y PCA).
+# Los modelos se cargan de forma diferida, en el primer uso o en una fase
+# explícita de calentamiento (calentar()), y se comparten entre todos los
+# módulos: así importar main.py o database.py no carga TensorFlow ni
+# deserializa el PCA, y el modelo se lee una sola vez por proceso.
+# El PCA se abre desde el artefacto compacto .npy (proyeccion_pca.py) si
+# existe; el pickle de scikit-learn queda como respaldo. Si se publica una
+# nueva versión del modelo (reentrenamiento), se recarga en el siguiente uso.
+
+import logging
+import os
+import pickle
+import threading
+
+from proyeccion_pca import RUTA_PROYECCION_PCA, ProyeccionPCA, cargar_proyeccion, leer_metadatos, ruta_metadatos
+
+logger = logging.getLogger(__name__)
+
+# Ruta del modelo PCA serializado con pickle (formato original, respaldo)
+RUTA_MODELO_PCA = 'models/pca_model.pkl'
+# Dimensión del embedding usada si no se puede leer el modelo
+DIMENSION_POR_DEFECTO = 33
+# Si se define, database.py la usa para la columna Vector sin cargar el PCA
+# (útil para procesos que solo hacen CRUD)
+EMBEDDING_DIMENSION = os.getenv("EMBEDDING_DIMENSION")
+
+
+class RegistroModelos:
+    """
+    Contenedor perezoso y thread-safe de los modelos. El detector se carga
+    como máximo una vez; el PCA, una vez por versión publicada (se compara la
+    fecha y el tamaño de su cabecera en cada uso, lo que cuesta un stat()).
+    Los fallos de carga se registran y devuelven None.
+    """
+
+    def __init__(self, ruta_pca=RUTA_MODELO_PCA, ruta_proyeccion=RUTA_PROYECCION_PCA):
+        self.ruta_pca = ruta_pca
+        self.ruta_proyeccion = ruta_proyeccion
+        self._lock = threading.RLock()
+        self._pca = None
+        self._pca_cargado = False
+        self._huella_pca = None
+        self._version = 0
+        self._huella_version = None
+        self._detector = None
+        self._detector_cargado = False
+
+    def _huella(self):
+        """Ruta, fecha y tamaño del archivo que define el modelo publicado."""
+        for ruta in (ruta_metadatos(self.ruta_proyeccion), self.ruta_pca):
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            return (ruta, estado.st_mtime_ns, estado.st_size)
+        return None
+
+    def pca(self):
+        """
+        Devuelve el modelo PCA, cargándolo en el primer uso (o None si no existe).
+        Si desde la última carga se publicó otra versión, la recarga.
+        """
+        huella = self._huella()
+        if not self._pca_cargado or huella != self._huella_pca:
+            with self._lock:
+                if not self._pca_cargado or huella != self._huella_pca:
+                    recarga = self._pca_cargado
+                    self._pca = self._cargar_pca()
+                    self._huella_pca = huella
+                    self._pca_cargado = True
+                    if recarga:
+                        logger.info("Modelo PCA recargado (versión %d)", self.version_pca())
+        return self._pca
+
+    def version_pca(self):
+        """
+        Versión del modelo PCA publicado (0 si solo existe el pickle).
+        Solo lee la cabecera, y únicamente cuando cambia.
+        """
+        huella = self._huella()
+        if huella != self._huella_version:
+            try:
+                metadatos = leer_metadatos(self.ruta_proyeccion) or {}
+            except (OSError, ValueError):
+                metadatos = {}
+            self._version = int(metadatos.get("version", 0))
+            self._huella_version = huella
+        return self._version
+
+    def detector(self):
+        """Devuelve el detector de rostros configurado, creándolo en el primer uso."""
+        if not self._detector_cargado:
+            with self._lock:
+                if not self._detector_cargado:
+                    # Importación diferida: el backend MTCNN arrastra TensorFlow
+                    from detectores import crear_detector
+                    self._detector = crear_detector()
+                    self._detector_cargado = True
+        return self._detector
+
+    def _cargar_pca(self):
+        # Preferimos el artefacto compacto (memoria mapeada, sin scikit-learn)
+        if os.path.exists(ruta_metadatos(self.ruta_proyeccion)):
+            try:
+                modelo = cargar_proyeccion(self.ruta_proyeccion)
+                logger.info("Proyección PCA mapeada desde: %s", self.ruta_proyeccion)
+                return modelo
+            except Exception as e:
+                logger.warning("No se pudo abrir %s (%s); se usa el pickle", self.ruta_proyeccion, e)
+        try:
+            if not os.path.exists(self.ruta_pca):
+                logger.warning(
+                    "Modelo PCA no encontrado en %s. Por favor, entrena el modelo primero ejecutando entrenador_pca.py.",
+                    self.ruta_pca
+                )
+                return None
+            with open(self.ruta_pca, 'rb') as f:
+                modelo = pickle.load(f)
+            logger.info("Modelo PCA cargado exitosamente desde: %s", self.ruta_pca)
+            return modelo
+        except Exception as e:
+            logger.error("Error grave: no se pudo cargar el modelo PCA. Error: %s", e)
+            return None
+
+    def dimension(self):
+        """Longitud de los embeddings (n_components_ del PCA)."""
+        if EMBEDDING_DIMENSION:
+            return int(EMBEDDING_DIMENSION)
+        # La cabecera del artefacto basta: no hace falta cargar el modelo
+        try:
+            metadatos = leer_metadatos(self.ruta_proyeccion)
+        except (OSError, ValueError):
+            metadatos = None
+        if metadatos and "n_components" in metadatos:
+            return int(metadatos["n_components"])
+        modelo = self.pca()
+        if modelo is None:
+            return DIMENSION_POR_DEFECTO
+        return int(modelo.n_components_)
+
+    def calentar(self):
+        """Carga todos los modelos ahora (fase explícita de calentamiento)."""
+        self.pca()
+        self.detector()
+        return self.listo
+
+    @property
+    def listo(self):
+        return self._pca is not None and self._detector is not None
+
+    def estado(self):
+        return {
+            "pca_loaded": self._pca is not None,
+            "pca_format": None if self._pca is None else (
+                "npy" if isinstance(self._pca, ProyeccionPCA) else "pickle"
+            ),
+            "pca_version": self.version_pca(),
+            "detector_loaded": self._detector is not None,
+            "detector": getattr(self._detector, "nombre", None),
+        }
+
+
+# Instancia única compartida por todo el proceso
+registro_modelos = RegistroModelos()
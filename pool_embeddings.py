@@ -0,0 +1,152 @@
+# pool_embeddings.py
+# ------------------
+# Este módulo saca del event loop de asyncio el trabajo pesado de CPU
+# (detección MTCNN + proyección PCA). Las extracciones se ejecutan en un
+# pool acotado de procesos (o hilos), cuyos workers cargan sus propias
+# copias de MTCNN y PCA una sola vez al arrancar. Si la cola de trabajos
+# pendientes está llena, se rechaza la petición de inmediato.
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metricas import METRICS_ENABLED, ejecutar_midiendo, incorporar_etapas
+
+# --- Configuración del Pool ---
+# EMBEDDING_POOL_MODE: 'proceso' (paralelismo real, una copia de los modelos por worker)
+# o 'hilo' (comparte los modelos del proceso principal, menos memoria)
+EMBEDDING_POOL_MODE = os.getenv("EMBEDDING_POOL_MODE", "proceso").lower()
+# Número de extracciones que se ejecutan en paralelo
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+# Trabajos que pueden esperar en cola además de los que están en ejecución
+EMBEDDING_QUEUE_SIZE = int(os.getenv("EMBEDDING_QUEUE_SIZE", "16"))
+
+
+class ColaLlenaError(Exception):
+    """Se lanza cuando el pool ya tiene el máximo de trabajos pendientes."""
+
+
+def _inicializar_worker():
+    """
+    Inicializador de cada worker: calienta el registro de modelos para que
+    el detector y el PCA se carguen una única vez para toda la vida del proceso.
+    """
+    from registro import configurar_logging
+    configurar_logging()
+    from modelos import registro_modelos
+    registro_modelos.calentar()
+
+
+def _calentar():
+    """Tarea vacía usada para forzar el arranque (y la carga de modelos) de los workers."""
+    return os.getpid()
+
+
+class PoolEmbeddings:
+    """
+    Pool acotado para ejecutar funciones de extracción de embeddings fuera
+    del event loop, con control de concurrencia y profundidad de cola.
+    """
+
+    def __init__(self, modo=EMBEDDING_POOL_MODE, workers=EMBEDDING_WORKERS,
+                 max_cola=EMBEDDING_QUEUE_SIZE):
+        self.modo = modo
+        self.workers = max(1, workers)
+        self.max_cola = max(0, max_cola)
+        self._executor = None
+        self._lock_inicio = threading.Lock()
+        # Solo se modifica desde el event loop, por lo que no necesita lock
+        self._pendientes = 0
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    @property
+    def capacidad(self):
+        """Trabajos admitidos a la vez: en ejecución + en cola."""
+        return self.workers + self.max_cola
+
+    def iniciar(self):
+        """
+        Crea el executor y arranca los workers para que carguen sus modelos.
+        Es bloqueante y seguro de llamar desde varios hilos a la vez.
+        """
+        with self._lock_inicio:
+            if self._executor is not None:
+                return
+            if self.modo == "hilo":
+                # Los hilos comparten los modelos del proceso principal
+                _inicializar_worker()
+                executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="embeddings"
+                )
+            else:
+                # 'spawn' evita heredar el estado de TensorFlow del proceso padre vía fork
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_inicializar_worker,
+                )
+                futuros = [executor.submit(_calentar) for _ in range(self.workers)]
+                for futuro in futuros:
+                    futuro.result()
+            self._executor = executor
+
+    @property
+    def iniciado(self):
+        return self._executor is not None
+
+    def detener(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def ejecutar(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) en el pool sin bloquear el event loop. Con
+        METRICS_ENABLED, los tiempos de sus etapas se incorporan a /metrics.
+
+        Raises:
+            ColaLlenaError: Si ya hay `capacidad` trabajos pendientes.
+        """
+        return await self._ejecutar(funcion, args, medir=METRICS_ENABLED)
+
+    async def _ejecutar(self, funcion, args, medir):
+        if self._pendientes >= self.capacidad:
+            raise ColaLlenaError(
+                f"Cola de extracción llena ({self._pendientes}/{self.capacidad} trabajos)"
+            )
+
+        self._pendientes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if self._executor is None:
+                # Arranque diferido fuera del event loop (carga de modelos incluida)
+                await loop.run_in_executor(None, self.iniciar)
+            if medir:
+                resultado, etapas = await loop.run_in_executor(self._executor, ejecutar_midiendo, funcion, *args)
+                incorporar_etapas(etapas)
+                return resultado
+            return await loop.run_in_executor(self._executor, funcion, *args)
+        finally:
+            self._pendientes -= 1
+
+    async def ejecutar_en_espera(self, funcion, *args, espera=0.5, medir=False):
+        """
+        Como `ejecutar`, para trabajos de fondo (reentrenamiento, inscripción
+        masiva) y flujos de video: si la cola está llena espera y reintenta en
+        lugar de fallar. Por defecto sus tiempos no se miden (/metrics
+        refleja las peticiones); `medir` los incluye.
+        """
+        while True:
+            try:
+                return await self._ejecutar(funcion, args, medir=medir and METRICS_ENABLED)
+            except ColaLlenaError:
+                await asyncio.sleep(espera)
+
+
+# Instancia única compartida por todos los endpoints del proceso
+pool_embeddings = PoolEmbeddings()
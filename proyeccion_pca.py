@@ -0,0 +1,229 @@
+# proyeccion_pca.py
+# -----------------
+# Formato compacto del modelo PCA para producción. En lugar del objeto
+# sklearn serializado con pickle, se guardan:
+#
+# - models/pca_model.npy: un vector float64 plano con el vector medio
+#   (n_pixeles valores) seguido de las componentes (Eigenfaces) en su orden de
+#   memoria original ('C' o 'F').
+# - models/pca_model.json: cabecera de metadatos (versión del formato,
+#   dimensiones, orden de memoria, huella del contenido...).
+#
+# La cabecera es además el punto de publicación: indica en `data_file` qué
+# archivo de datos usar y en `version` el número de versión del modelo. Los
+# reentrenamientos escriben un archivo de datos nuevo (pca_model.v<N>.npy) y
+# luego reemplazan la cabecera de forma atómica (publicar_proyeccion).
+#
+# El .npy se abre con memoria mapeada (mmap_mode='r'): la carga es casi
+# instantánea, no requiere scikit-learn y todos los workers que abren el mismo
+# archivo comparten las páginas en la caché del sistema operativo en lugar de
+# tener cada uno su propia copia. La proyección es (x - media) @ componentes.T,
+# calculada en el mismo orden y con la misma disposición de memoria que
+# PCA.transform: el resultado exacto de BLAS depende de ambas, y así los
+# embeddings son idénticos bit a bit a los del pickle.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Versión del formato; se incrementa si cambia la disposición del archivo
+VERSION_FORMATO = 1
+
+# Claves de la cabecera con el estado de entrenamiento, necesarias para
+# continuar el ajuste de forma incremental (reentrenamiento_pca.py)
+CLAVES_ESTADO = ("singular_values", "n_samples_seen", "trained_until")
+
+RUTA_PROYECCION_PCA = 'models/pca_model.npy'
+
+
+def ruta_metadatos(ruta_npy):
+    """Ruta de la cabecera JSON que acompaña a un artefacto .npy."""
+    return os.path.splitext(ruta_npy)[0] + '.json'
+
+
+class ProyeccionPCA:
+    """
+    Proyección PCA sin dependencias de scikit-learn. Expone `transform` y
+    `n_components_` para poder usarse donde antes se usaba el objeto PCA.
+    """
+
+    def __init__(self, media, componentes, metadatos=None):
+        self.media = media
+        self.componentes = componentes
+        self.metadatos = metadatos or {}
+        # media @ componentes.T no depende de la entrada: se calcula una vez
+        self._media_proyectada = media.reshape(1, -1) @ componentes.T
+
+    @property
+    def n_components_(self):
+        return self.componentes.shape[0]
+
+    @property
+    def n_features_in_(self):
+        return self.componentes.shape[1]
+
+    def transform(self, X):
+        """
+        Proyecta un lote de rostros aplanados.
+
+        Args:
+            X (numpy.ndarray): Matriz (n_muestras, n_pixeles).
+
+        Returns:
+            numpy.ndarray: Embeddings (n_muestras, n_componentes).
+        """
+        X = np.asarray(X, dtype=self.componentes.dtype)
+        # X @ C.T - media @ C.T: igual que sklearn, y evita restar la media
+        # sobre la matriz completa de píxeles
+        proyeccion = X @ self.componentes.T
+        proyeccion -= self._media_proyectada
+        return proyeccion
+
+
+def desde_sklearn(pca):
+    """
+    Convierte un PCA de scikit-learn ya entrenado en una ProyeccionPCA.
+    Si el modelo usa `whiten`, el escalado se integra en las componentes
+    (y el modelo ya no se puede seguir ajustando de forma incremental).
+    """
+    componentes = np.asarray(pca.components_, dtype=np.float64)
+    metadatos = {}
+    if getattr(pca, 'whiten', False):
+        componentes = componentes / np.sqrt(pca.explained_variance_)[:, np.newaxis]
+    else:
+        # PCA guarda n_samples_; IncrementalPCA, n_samples_seen_
+        n_muestras = getattr(pca, 'n_samples_seen_', getattr(pca, 'n_samples_', None))
+        if n_muestras is not None:
+            metadatos["singular_values"] = [float(v) for v in pca.singular_values_]
+            metadatos["n_samples_seen"] = int(n_muestras)
+    media = np.asarray(pca.mean_, dtype=np.float64)
+    return ProyeccionPCA(media, componentes, metadatos)
+
+
+def guardar_proyeccion(proyeccion, ruta_npy=RUTA_PROYECCION_PCA, origen=None,
+                       version=1, ruta_datos=None):
+    """
+    Escribe el artefacto .npy y su cabecera JSON. Ambos archivos se escriben
+    primero en temporales y luego se reemplazan, de modo que un lector nunca
+    ve un archivo a medio escribir; el JSON se publica al final.
+
+    Args:
+        ruta_npy (str): Ruta base del modelo; la cabecera va en su .json.
+        version (int): Número de versión del modelo que se publica.
+        ruta_datos (str): Archivo donde escribir los datos, si no es `ruta_npy`
+                          (p. ej. un archivo versionado).
+
+    Returns:
+        dict: Los metadatos escritos.
+    """
+    componentes = proyeccion.componentes
+    # Se conserva el orden de memoria de las componentes del entrenamiento
+    orden = 'F' if componentes.flags.f_contiguous and not componentes.flags.c_contiguous else 'C'
+    plano = np.concatenate([
+        np.asarray(proyeccion.media, dtype=np.float64).ravel(),
+        np.asarray(componentes, dtype=np.float64).ravel(order=orden),
+    ])
+    metadatos = {
+        "format_version": VERSION_FORMATO,
+        "n_components": int(componentes.shape[0]),
+        "n_features": int(componentes.shape[1]),
+        "dtype": str(plano.dtype),
+        "order": orden,
+        "layout": "mean (n_features) followed by components (n_components x n_features)",
+        "sha256": hashlib.sha256(plano.tobytes()).hexdigest(),
+        "version": int(version),
+        "data_file": os.path.basename(ruta_datos or ruta_npy),
+    }
+    for clave in CLAVES_ESTADO:
+        if clave in proyeccion.metadatos:
+            metadatos[clave] = proyeccion.metadatos[clave]
+    if origen:
+        metadatos["source"] = origen
+
+    directorio = os.path.dirname(ruta_npy)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+
+    ruta_datos = ruta_datos or ruta_npy
+    temporal = ruta_datos + '.tmp'
+    with open(temporal, 'wb') as f:
+        np.save(f, plano)
+    os.replace(temporal, ruta_datos)
+
+    ruta_json = ruta_metadatos(ruta_npy)
+    temporal = ruta_json + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(metadatos, f, indent=2)
+    os.replace(temporal, ruta_json)
+    return metadatos
+
+
+def publicar_proyeccion(proyeccion, ruta_npy=RUTA_PROYECCION_PCA, origen=None):
+    """
+    Publica una nueva versión del modelo: escribe sus datos en un archivo
+    versionado y reemplaza la cabecera de forma atómica. Los procesos que aún
+    tienen mapeada la versión anterior siguen usándola sin problemas.
+
+    Returns:
+        dict: Los metadatos publicados (incluida la nueva `version`).
+    """
+    anteriores = leer_metadatos(ruta_npy) or {}
+    version = int(anteriores.get("version", 0)) + 1
+    ruta_datos = f"{os.path.splitext(ruta_npy)[0]}.v{version}.npy"
+    return guardar_proyeccion(proyeccion, ruta_npy, origen=origen, version=version, ruta_datos=ruta_datos)
+
+
+def leer_metadatos(ruta_npy=RUTA_PROYECCION_PCA):
+    """Lee la cabecera JSON del artefacto, o None si no existe."""
+    ruta_json = ruta_metadatos(ruta_npy)
+    if not os.path.exists(ruta_json):
+        return None
+    with open(ruta_json) as f:
+        return json.load(f)
+
+
+def cargar_proyeccion(ruta_npy=RUTA_PROYECCION_PCA):
+    """
+    Abre el artefacto con memoria mapeada.
+
+    Raises:
+        ValueError: Si la versión del formato o las dimensiones no coinciden
+                    con la cabecera.
+    """
+    metadatos = leer_metadatos(ruta_npy)
+    if metadatos is None:
+        raise ValueError(f"Falta la cabecera {ruta_metadatos(ruta_npy)}")
+    version = metadatos.get("format_version")
+    if version != VERSION_FORMATO:
+        raise ValueError(f"Versión de formato PCA no soportada: {version}")
+
+    ruta_datos = os.path.join(os.path.dirname(ruta_npy), metadatos.get("data_file", os.path.basename(ruta_npy)))
+    plano = np.load(ruta_datos, mmap_mode='r')
+    n_componentes = metadatos["n_components"]
+    n_pixeles = metadatos["n_features"]
+    if plano.ndim != 1 or plano.shape[0] != n_pixeles * (n_componentes + 1):
+        raise ValueError(
+            f"Artefacto PCA inconsistente: {plano.shape[0]} valores para "
+            f"{n_componentes} componentes de {n_pixeles} píxeles"
+        )
+    # Vistas sobre el mapa de memoria, sin copias
+    media = plano[:n_pixeles]
+    componentes = plano[n_pixeles:].reshape((n_componentes, n_pixeles), order=metadatos.get("order", "C"))
+    return ProyeccionPCA(media, componentes, metadatos)
+
+
+def exportar_desde_pickle(ruta_pickle, ruta_npy=RUTA_PROYECCION_PCA):
+    """
+    Convierte un modelo PCA serializado con pickle al formato compacto.
+
+    Es el mismo modelo en otro formato: se publica con la versión 0, la que
+    tiene una instalación con solo el pickle (y con la que están etiquetados
+    sus embeddings), para que exportarlo no los deje fuera de la galería ni
+    obligue a re-extraerlos.
+    """
+    import pickle
+    with open(ruta_pickle, 'rb') as f:
+        pca = pickle.load(f)
+    return guardar_proyeccion(desde_sklearn(pca), ruta_npy, origen=os.path.basename(ruta_pickle), version=0)
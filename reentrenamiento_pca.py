@@ -0,0 +1,410 @@
+# reentrenamiento_pca.py
+# ----------------------
+# Reentrenamiento incremental del modelo PCA con los rostros inscritos en
+# producción, sin reconstruirlo desde cero ni detener la API.
+#
+# 1. Se parte del modelo publicado (media, componentes y valores singulares)
+#    y se continúa el ajuste con IncrementalPCA.partial_fit, alimentándolo
+#    por lotes con las fotos de perfil de los usuarios inscritos o
+#    actualizados desde el último entrenamiento.
+# 2. Las muestras guardadas se re-proyectan a la nueva base con una
+#    transformación lineal (sin volver a detectar rostros), leyéndolas por
+#    bloques, y con ellas se prepara el índice en memoria.
+# 3. Se publica la nueva versión (cambio atómico de la cabecera del modelo):
+#    los workers la recargan en su siguiente uso y el índice en memoria se
+#    reemplaza con las muestras ya re-proyectadas.
+# 4. La BD se pone al día por bloques, cada uno en su propia transacción,
+#    sin bloquear a los usuarios más que mientras se escribe su bloque; las
+#    inscripciones y muestras que llegaron durante el proceso se re-proyectan
+#    también y se incorporan al índice sin reemplazarlo. La BD nunca queda
+#    en una versión que no existe en disco: si el proceso cae, las filas
+#    pendientes siguen en la anterior y la re-extracción las pone al día.
+#
+# Uso offline:  python reentrenamiento_pca.py [--todos]
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import bindparam
+
+from proyeccion_pca import ProyeccionPCA, desde_sklearn, publicar_proyeccion
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración del Reentrenamiento ---
+# Rostros que se preprocesan y se pasan juntos a partial_fit
+PCA_RETRAIN_BATCH_SIZE = int(os.getenv("PCA_RETRAIN_BATCH_SIZE", "64"))
+# Filas por bloque al re-proyectar los embeddings guardados
+PCA_REPROJECT_CHUNK_SIZE = int(os.getenv("PCA_REPROJECT_CHUNK_SIZE", "1000"))
+
+
+def estimador_incremental(proyeccion, ruta_pickle=None):
+    """
+    Crea un IncrementalPCA que continúa desde el estado de un modelo publicado.
+
+    Args:
+        proyeccion (ProyeccionPCA): Modelo publicado actualmente.
+        ruta_pickle (str): Pickle de respaldo del que leer el estado si la
+                           cabecera del modelo publicado no lo incluye.
+
+    Raises:
+        ValueError: Si no hay estado de entrenamiento del que continuar.
+    """
+    from sklearn.decomposition import IncrementalPCA
+
+    metadatos = proyeccion.metadatos
+    if "singular_values" not in metadatos and ruta_pickle and os.path.exists(ruta_pickle):
+        import pickle
+        with open(ruta_pickle, 'rb') as f:
+            metadatos = desde_sklearn(pickle.load(f)).metadatos
+    if "singular_values" not in metadatos or not metadatos.get("n_samples_seen"):
+        raise ValueError(
+            "El modelo publicado no guarda su estado de entrenamiento; "
+            "vuelve a entrenarlo con entrenador_pca.py"
+        )
+
+    n_componentes, n_pixeles = proyeccion.componentes.shape
+    ipca = IncrementalPCA(n_components=n_componentes)
+    ipca.components_ = np.array(proyeccion.componentes, dtype=np.float64)
+    ipca.singular_values_ = np.asarray(metadatos["singular_values"], dtype=np.float64)
+    ipca.mean_ = np.array(proyeccion.media, dtype=np.float64)
+    # La varianza por píxel solo interviene en explained_variance_ratio_
+    ipca.var_ = np.zeros(n_pixeles)
+    ipca.n_samples_seen_ = int(metadatos["n_samples_seen"])
+    ipca.n_components_ = n_componentes
+    ipca.n_features_in_ = n_pixeles
+    return ipca
+
+
+def transformacion_reproyeccion(anterior, nueva):
+    """
+    Transformación lineal que lleva embeddings de la base anterior a la nueva:
+    el rostro se reconstruye con la base anterior (media + e·C) y se proyecta
+    con la nueva. Es exacta para la parte de cada rostro contenida en la base
+    anterior; lo que quedaba fuera ya no estaba en el embedding guardado.
+
+    Returns:
+        tuple: (R, b) tales que e_nuevo = e_anterior @ R + b.
+    """
+    R = np.asarray(anterior.componentes) @ np.asarray(nueva.componentes).T
+    b = (np.asarray(anterior.media) - np.asarray(nueva.media)) @ np.asarray(nueva.componentes).T
+    return R, b
+
+
+class ReentrenadorPCA:
+    """
+    Ejecuta un reentrenamiento a la vez y expone su progreso para /modelo/reentrenar.
+    """
+
+    def __init__(self, tamaño_lote=PCA_RETRAIN_BATCH_SIZE, tamaño_bloque=PCA_REPROJECT_CHUNK_SIZE):
+        self.tamaño_lote = max(1, tamaño_lote)
+        self.tamaño_bloque = max(1, tamaño_bloque)
+        self._tarea = None
+        self.estado = "inactivo"
+        self.error = None
+        self.rostros = 0
+        self.reproyectados = 0
+        self.version = None
+        self.inicio = None
+        self.fin = None
+
+    @property
+    def en_curso(self):
+        return self._tarea is not None and not self._tarea.done()
+
+    def resumen(self):
+        return {
+            "status": self.estado,
+            "faces_used": self.rostros,
+            "embeddings_reprojected": self.reproyectados,
+            "published_version": self.version,
+            "error": self.error,
+            "started_at": self.inicio.isoformat() if self.inicio else None,
+            "finished_at": self.fin.isoformat() if self.fin else None,
+        }
+
+    def iniciar(self, preprocesar, todos=False):
+        """
+        Lanza el reentrenamiento como tarea de fondo del event loop.
+
+        Raises:
+            RuntimeError: Si ya hay un reentrenamiento en curso.
+        """
+        if self.en_curso:
+            raise RuntimeError("Ya hay un reentrenamiento en curso")
+        self.estado, self.error = "pendiente", None
+        self._tarea = asyncio.get_running_loop().create_task(self.ejecutar(preprocesar, todos))
+        return self._tarea
+
+    async def ejecutar(self, preprocesar, todos=False):
+        """
+        Reentrena, re-proyecta la galería y publica la nueva versión.
+
+        Args:
+            preprocesar: Corrutina que recibe una lista de rutas de imagen y
+                         devuelve sus rostros preprocesados (o None), p. ej.
+                         preprocesar_caras_lote ejecutada en el pool.
+            todos (bool): Usar todas las fotos de perfil, no solo las nuevas.
+        """
+        from modelos import registro_modelos
+        from reextraccion_embeddings import indexar_fotos_perfil
+
+        self.estado, self.error = "entrenando", None
+        self.rostros = self.reproyectados = 0
+        self.version, self.inicio, self.fin = None, datetime.utcnow(), None
+        loop = asyncio.get_running_loop()
+        try:
+            anterior = registro_modelos.pca()
+            if not isinstance(anterior, ProyeccionPCA):
+                raise ValueError("No hay un modelo PCA publicado en formato compacto")
+            ipca = estimador_incremental(anterior, registro_modelos.ruta_pca)
+
+            desde = None if todos else anterior.metadatos.get("trained_until")
+            corte = datetime.utcnow()
+            ids = await loop.run_in_executor(None, _usuarios_a_entrenar, desde, corte)
+            fotos = await loop.run_in_executor(None, indexar_fotos_perfil)
+
+            for i in range(0, len(ids), self.tamaño_lote):
+                rutas = [fotos[str(user_id)] for user_id in ids[i:i + self.tamaño_lote] if str(user_id) in fotos]
+                if not rutas:
+                    continue
+                caras = [c for c in await preprocesar(rutas) if c is not None]
+                if not caras:
+                    continue
+                matriz = np.stack([c.ravel() for c in caras]).astype(np.float64)
+                await loop.run_in_executor(None, ipca.partial_fit, matriz)
+                self.rostros += len(caras)
+
+            if self.rostros == 0:
+                self.estado = "sin_cambios"
+            else:
+                nueva = desde_sklearn(ipca)
+                nueva.metadatos["trained_until"] = corte.isoformat()
+                self.estado = "reproyectando"
+                metadatos = await loop.run_in_executor(None, self._reproyectar_y_publicar, anterior, nueva)
+                self.version = metadatos["version"]
+                self.estado = "publicado"
+                logger.info(
+                    "Modelo PCA reentrenado con %d rostros y publicado como versión %d (%d embeddings re-proyectados)",
+                    self.rostros, self.version, self.reproyectados
+                )
+        except Exception as e:
+            self.estado, self.error = "error", str(e)
+            logger.exception("Error en el reentrenamiento del modelo PCA")
+        finally:
+            self.fin = datetime.utcnow()
+        return self.resumen()
+
+    def _reproyectar_y_publicar(self, anterior, nueva):
+        """
+        Publica el modelo nuevo con la galería ya re-proyectada y después
+        pone al día la BD por bloques, cada uno en su propia transacción.
+
+        1. Se leen por bloques las muestras del modelo anterior y se calcula
+           su proyección en la base nueva, sin escribir nada (sin bloqueos).
+        2. Se publica el modelo y el índice en memoria se reemplaza con esas
+           proyecciones: el reconocimiento nunca compara bases distintas.
+        3. Se re-proyectan en la BD las filas que siguen en la versión
+           anterior, un bloque por transacción: cada fila se bloquea solo
+           mientras se escribe su bloque, y una fila que otra petición ya
+           reescribió en la versión nueva no se toca. Las pasadas se repiten
+           hasta no dejar filas de la versión anterior (las inscritas antes
+           de publicar pudieron quedar detrás del cursor).
+        4. Los usuarios cuyas muestras cambiaron desde la lectura del paso 1
+           (inscritos, con muestras nuevas o eliminadas, o eliminados) se
+           recargan en el índice desde la BD, sin reemplazarlo.
+
+        Si el proceso cae tras publicar, las filas pendientes quedan en la
+        versión anterior y la re-extracción las pone al día.
+        """
+        from galeria import indice_galeria
+
+        R, b = transformacion_reproyeccion(anterior, nueva)
+        anterior_version = int(anterior.metadatos.get("version", 0))
+        version = anterior_version + 1
+
+        leidas = self._proyectar_muestras(anterior_version, R, b)
+        metadatos = publicar_proyeccion(nueva, origen="incremental")
+        if metadatos["version"] != version:
+            # Otro proceso publicó entre medias: las proyecciones no son de esta versión
+            raise RuntimeError(
+                f"Se publicó la versión {metadatos['version']} en lugar de la {version} esperada"
+            )
+        # Desde aquí la versión ya está publicada, aunque falle lo que sigue
+        self.version = version
+        indice_galeria.cargar(((user_id, vector) for user_id, vector in leidas.values()), version)
+
+        try:
+            cambiados = self._reproyectar_bd(anterior_version, version, R, b, leidas)
+            self._recargar_usuarios(cambiados, version)
+        except Exception:
+            logger.error(
+                "El modelo %d está publicado pero no se re-proyectaron todos sus embeddings; "
+                "la re-extracción (POST /modelo/reextraer o al reiniciar) los pondrá al día", version
+            )
+            raise
+        return metadatos
+
+    def _proyectar_muestras(self, anterior_version, R, b):
+        """
+        Proyecta a la base nueva las muestras del modelo anterior, leyéndolas
+        por bloques en transacciones de solo lectura.
+
+        Returns:
+            dict: id de la muestra -> (user_id, embedding en la base nueva).
+        """
+        from database import SessionLocal, FaceEmbedding
+
+        leidas, ultimo = {}, None
+        while True:
+            db = SessionLocal()
+            try:
+                # Solo los embeddings del modelo anterior: los de versiones previas
+                # (pendientes de re-extracción) no están en su base
+                consulta = db.query(FaceEmbedding.id, FaceEmbedding.user_id, FaceEmbedding.embedding).filter(
+                    FaceEmbedding.model_version == anterior_version
+                )
+                if ultimo is not None:
+                    consulta = consulta.filter(FaceEmbedding.id > ultimo)
+                filas = consulta.order_by(FaceEmbedding.id).limit(self.tamaño_bloque).all()
+            finally:
+                db.close()
+            if not filas:
+                return leidas
+            nuevos = np.asarray([fila.embedding for fila in filas], dtype=np.float64) @ R + b
+            for fila, vector in zip(filas, nuevos):
+                leidas[fila.id] = (fila.user_id, vector)
+            ultimo = filas[-1].id
+
+    def _reproyectar_bd(self, anterior_version, version, R, b, leidas, max_pasadas=5):
+        """
+        Re-proyecta en la BD las filas de 'face_embeddings' y 'users' que
+        siguen en la versión anterior, confirmando cada bloque por separado.
+
+        Returns:
+            set: user_id de los usuarios cuyas muestras ya no son las leídas
+                 al proyectar el índice.
+        """
+        from database import SessionLocal, FaceEmbedding, User
+
+        cambiados, vistas = set(), set()
+        for modelo in (FaceEmbedding, User):
+            tabla = modelo.__table__
+            # Solo si la fila sigue en la versión anterior: otra petición pudo
+            # reescribirla ya con el modelo nuevo
+            valores = {"embedding": bindparam("b_embedding"), "model_version": version}
+            if modelo is User:
+                # Se conserva updated_at: re-proyectar no es una actualización del usuario
+                valores["updated_at"] = tabla.c.updated_at
+            sentencia = tabla.update().where(
+                tabla.c.id == bindparam("b_id"), tabla.c.model_version == anterior_version
+            ).values(**valores)
+            columnas = [modelo.id, modelo.embedding]
+            if modelo is FaceEmbedding:
+                columnas.append(FaceEmbedding.user_id)
+
+            for _ in range(max_pasadas):
+                ultimo, escritas = None, 0
+                while True:
+                    db = SessionLocal()
+                    try:
+                        consulta = db.query(*columnas).filter(
+                            modelo.embedding.isnot(None), modelo.model_version == anterior_version
+                        )
+                        if ultimo is not None:
+                            consulta = consulta.filter(modelo.id > ultimo)
+                        filas = consulta.order_by(modelo.id).limit(self.tamaño_bloque).all()
+                        if not filas:
+                            break
+                        nuevos = np.asarray([fila.embedding for fila in filas], dtype=np.float64) @ R + b
+                        db.execute(sentencia, [
+                            {"b_id": fila.id, "b_embedding": vector.tolist()}
+                            for fila, vector in zip(filas, nuevos)
+                        ])
+                        db.commit()
+                    except Exception:
+                        db.rollback()
+                        raise
+                    finally:
+                        db.close()
+                    if modelo is FaceEmbedding:
+                        for fila, vector in zip(filas, nuevos):
+                            vistas.add(fila.id)
+                            leida = leidas.get(fila.id)
+                            if leida is None or not np.array_equal(leida[1], vector):
+                                cambiados.add(fila.user_id)
+                    escritas += len(filas)
+                    self.reproyectados += len(filas)
+                    ultimo = filas[-1].id
+                if not escritas:
+                    break
+            else:
+                logger.warning(
+                    "Siguen apareciendo filas de '%s' en la versión %d; la re-extracción las pondrá al día",
+                    tabla.name, anterior_version
+                )
+
+        # Muestras leídas que ya no estaban en la versión anterior: eliminadas
+        # o reescritas con el modelo nuevo por otra petición
+        cambiados.update(user_id for id_muestra, (user_id, _) in leidas.items() if id_muestra not in vistas)
+        return cambiados
+
+    def _recargar_usuarios(self, usuarios, version):
+        """Recarga en el índice las muestras vigentes de esos usuarios (sin muestras, los quita)."""
+        from database import SessionLocal, FaceEmbedding
+        from galeria import indice_galeria
+
+        usuarios = list(usuarios)
+        for i in range(0, len(usuarios), self.tamaño_bloque):
+            bloque = usuarios[i:i + self.tamaño_bloque]
+            db = SessionLocal()
+            try:
+                filas = db.query(FaceEmbedding.user_id, FaceEmbedding.embedding).filter(
+                    FaceEmbedding.user_id.in_(bloque), FaceEmbedding.model_version == version
+                ).all()
+            finally:
+                db.close()
+            muestras = {user_id: [] for user_id in bloque}
+            for user_id, embedding in filas:
+                muestras[user_id].append(embedding)
+            indice_galeria.establecer_varios(muestras)
+
+
+def _usuarios_a_entrenar(desde, hasta):
+    """IDs de los usuarios creados o actualizados en (desde, hasta]."""
+    from database import SessionLocal, User
+    db = SessionLocal()
+    try:
+        consulta = db.query(User.id).filter(User.updated_at <= hasta)
+        if desde:
+            consulta = consulta.filter(User.updated_at > datetime.fromisoformat(desde))
+        return [fila.id for fila in consulta.order_by(User.updated_at)]
+    finally:
+        db.close()
+
+
+# Instancia única compartida por la API
+reentrenador_pca = ReentrenadorPCA()
+
+
+# --- Ejecución offline ---
+if __name__ == "__main__":
+    import argparse
+    from registro import configurar_logging
+    from facial_preprocesador import preprocesar_caras_lote
+
+    configurar_logging()
+    parser = argparse.ArgumentParser(description="Reentrena el modelo PCA con los rostros inscritos")
+    parser.add_argument("--todos", action="store_true",
+                        help="usar todas las fotos de perfil, no solo las posteriores al último entrenamiento")
+    args = parser.parse_args()
+
+    async def preprocesar(rutas):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, preprocesar_caras_lote, rutas)
+
+    resultado = asyncio.run(reentrenador_pca.ejecutar(preprocesar, todos=args.todos))
+    print(resultado)
@@ -0,0 +1,363 @@
+# reextraccion_embeddings.py
+# --------------------------
+# Re-extracción de los embeddings guardados cuando se publica un modelo PCA
+# incompatible con ellos (p. ej. reentrenado desde cero con entrenador_pca.py,
+# quizá con otro número de componentes). A diferencia del reentrenamiento
+# incremental, aquí no hay una transformación lineal entre bases: hay que
+# volver a detectar y proyectar las fotos guardadas.
+#
+# Cada embedding lleva la versión del modelo con la que se calculó (columna
+# model_version) y el reconocimiento solo compara los de la versión publicada.
+# Este trabajo recorre por bloques los usuarios y muestras de versiones
+# anteriores, re-extrae sus fotos en paralelo en el pool de embeddings y los
+# actualiza por lotes. Cada bloque se confirma por separado: los usuarios
+# re-extraídos son reconocibles de inmediato y, si el trabajo se interrumpe,
+# la siguiente ejecución continúa con los que faltan.
+#
+# Si cambia la dimensión, la API debe reiniciarse para cargar el esquema con
+# la nueva dimensión; en PostgreSQL las columnas se liberan de su dimensión
+# mientras conviven vectores de ambas versiones y se vuelven a fijar al final.
+#
+# Uso offline:  python reextraccion_embeddings.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from face_embedding_extractor import extraer_embeddings_pca
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración de la Re-extracción ---
+# Usuarios (o muestras) que se leen y se confirman juntos
+REEMBED_CHUNK_SIZE = int(os.getenv("REEMBED_CHUNK_SIZE", "256"))
+# Fotos por tarea enviada al pool de embeddings
+REEMBED_TASK_SIZE = int(os.getenv("REEMBED_TASK_SIZE", "8"))
+# Lanzarla automáticamente al arrancar la API y al detectar una nueva versión del modelo
+REEMBED_AUTO = os.getenv("REEMBED_AUTO", "true").lower() == "true"
+
+FOTOS_DIR = "static/fotos_perfil"
+# Fotos de las muestras añadidas con POST /usuarios/{id}/muestras (no se sirven como estáticos)
+FOTOS_MUESTRAS_DIR = "data/fotos_muestras"
+
+
+def indexar_fotos_perfil(directorio=FOTOS_DIR):
+    """
+    Recorre una sola vez el directorio de fotos de perfil.
+
+    Returns:
+        dict: user_id (str) -> ruta de su foto más reciente ({id}.jpg, o la
+              extensión con la que se subió al actualizar el usuario).
+    """
+    fotos = {}
+    if not os.path.isdir(directorio):
+        return fotos
+    for entrada in os.scandir(directorio):
+        user_id, extension = os.path.splitext(entrada.name)
+        if not extension or not entrada.is_file():
+            continue
+        actual = fotos.get(user_id)
+        if actual is None or entrada.stat().st_mtime > actual[1]:
+            fotos[user_id] = (entrada.path, entrada.stat().st_mtime)
+    return {user_id: ruta for user_id, (ruta, _) in fotos.items()}
+
+
+def ruta_foto_muestra(muestra_id, directorio=FOTOS_MUESTRAS_DIR):
+    """Ruta donde se guarda la foto de una muestra de rostro."""
+    return os.path.join(directorio, f"{muestra_id}.jpg")
+
+
+def _desactualizado(modelo, version):
+    # Las versiones solo crecen: lo anterior a la publicada está pendiente
+    return (modelo.model_version < version) | modelo.model_version.is_(None)
+
+
+def contar_pendientes(db, version):
+    """Embeddings calculados con una versión del modelo anterior a `version`."""
+    from database import User, FaceEmbedding
+    return {
+        "users": db.query(User.id).filter(User.embedding.isnot(None), _desactualizado(User, version)).count(),
+        "face_embeddings": db.query(FaceEmbedding.id).filter(_desactualizado(FaceEmbedding, version)).count(),
+    }
+
+
+class ReextractorEmbeddings:
+    """
+    Ejecuta una re-extracción a la vez y expone su progreso para /modelo/reextraer.
+    """
+
+    def __init__(self, tamaño_bloque=REEMBED_CHUNK_SIZE, tamaño_tarea=REEMBED_TASK_SIZE):
+        self.tamaño_bloque = max(1, tamaño_bloque)
+        self.tamaño_tarea = max(1, tamaño_tarea)
+        self._tarea = None
+        self.estado = "inactivo"
+        self.error = None
+        self.version = None
+        self.pendientes = 0
+        self.actualizados = 0
+        self.sin_foto = 0
+        self.sin_rostro = 0
+        self.inicio = None
+        self.fin = None
+
+    @property
+    def en_curso(self):
+        return self._tarea is not None and not self._tarea.done()
+
+    def resumen(self):
+        return {
+            "status": self.estado,
+            "model_version": self.version,
+            "pending_at_start": self.pendientes,
+            "updated": self.actualizados,
+            "missing_photo": self.sin_foto,
+            "no_face": self.sin_rostro,
+            "error": self.error,
+            "started_at": self.inicio.isoformat() if self.inicio else None,
+            "finished_at": self.fin.isoformat() if self.fin else None,
+        }
+
+    def iniciar(self, ejecutar):
+        """
+        Lanza la re-extracción como tarea de fondo del event loop.
+
+        Args:
+            ejecutar: Corrutina ejecutar(funcion, *args) que corre la extracción
+                      en el pool (p. ej. pool_embeddings.ejecutar_en_espera).
+
+        Raises:
+            RuntimeError: Si ya hay una re-extracción en curso.
+        """
+        if self.en_curso:
+            raise RuntimeError("Ya hay una re-extracción de embeddings en curso")
+        self.estado, self.error = "pendiente", None
+        self._tarea = asyncio.get_running_loop().create_task(self.ejecutar(ejecutar))
+        return self._tarea
+
+    async def ejecutar(self, ejecutar):
+        """Re-extrae todos los embeddings de versiones anteriores a la publicada."""
+        from database import SessionLocal, User, TABLAS_EMBEDDINGS, dimension_columna_embedding, liberar_dimension_embeddings
+        from modelos import registro_modelos
+
+        self.estado, self.error = "re-extrayendo", None
+        self.actualizados = self.sin_foto = self.sin_rostro = 0
+        self.inicio, self.fin = datetime.utcnow(), None
+        loop = asyncio.get_running_loop()
+        try:
+            modelo = registro_modelos.pca()
+            if modelo is None:
+                raise ValueError("No hay un modelo PCA publicado")
+            self.version = registro_modelos.version_pca()
+            dimension = int(modelo.n_components_)
+            dimension_esquema = User.__table__.c.embedding.type.dim
+            if dimension_esquema is not None and dimension_esquema != dimension:
+                raise ValueError(
+                    f"El modelo publicado tiene {dimension} componentes y el esquema cargado "
+                    f"{dimension_esquema}: reinicia la API para re-extraer con la nueva dimensión"
+                )
+
+            def pendientes():
+                db = SessionLocal()
+                try:
+                    return contar_pendientes(db, self.version)
+                finally:
+                    db.close()
+
+            inicial = await loop.run_in_executor(None, pendientes)
+            self.pendientes = inicial["users"] + inicial["face_embeddings"]
+            if self.pendientes == 0:
+                self.estado = "sin_cambios"
+            else:
+                # Vectores de distinta dimensión no caben en una columna vector(n)
+                dimensiones = [await loop.run_in_executor(None, dimension_columna_embedding, t) for t in TABLAS_EMBEDDINGS]
+                if any(d is not None and d != dimension for d in dimensiones):
+                    await loop.run_in_executor(None, liberar_dimension_embeddings)
+
+                fotos = await loop.run_in_executor(None, indexar_fotos_perfil)
+                await self._recorrer(ejecutar, self._bloque_usuarios, self._guardar_usuarios,
+                                     lambda fila: fotos.get(str(fila.id)))
+                await self._recorrer(ejecutar, self._bloque_muestras, self._guardar_muestras,
+                                     lambda fila: _si_existe(ruta_foto_muestra(fila.id)))
+
+                restantes = await loop.run_in_executor(None, pendientes)
+                await loop.run_in_executor(None, self._fijar_dimension, dimension, restantes)
+                self.estado = "completado"
+                logger.info(
+                    "Re-extracción a la versión %d: %d embeddings actualizados, %d sin foto, %d sin rostro",
+                    self.version, self.actualizados, self.sin_foto, self.sin_rostro
+                )
+        except Exception as e:
+            self.estado, self.error = "error", str(e)
+            logger.exception("Error en la re-extracción de embeddings")
+        finally:
+            self.fin = datetime.utcnow()
+        return self.resumen()
+
+    async def _recorrer(self, ejecutar, bloque, guardar, ruta_de):
+        """
+        Recorre por clave los registros desactualizados que devuelve
+        `bloque(ultimo)`, re-extrae en paralelo las fotos que indica
+        `ruta_de(fila)` y guarda cada bloque con `guardar(pares)`.
+        """
+        loop = asyncio.get_running_loop()
+        ultimo = None
+        while True:
+            filas = await loop.run_in_executor(None, bloque, ultimo)
+            if not filas:
+                break
+            ultimo = filas[-1].id
+
+            con_foto = []
+            for fila in filas:
+                ruta = ruta_de(fila)
+                if ruta is None:
+                    self.sin_foto += 1
+                else:
+                    con_foto.append((fila, ruta))
+
+            tareas = [con_foto[i:i + self.tamaño_tarea] for i in range(0, len(con_foto), self.tamaño_tarea)]
+            resultados = await asyncio.gather(*(
+                ejecutar(extraer_embeddings_pca, [ruta for _, ruta in tarea]) for tarea in tareas
+            ))
+            nuevos = []
+            for tarea, embeddings in zip(tareas, resultados):
+                for (fila, _), embedding in zip(tarea, embeddings):
+                    if embedding is None:
+                        self.sin_rostro += 1
+                    else:
+                        nuevos.append((fila, embedding))
+            if nuevos:
+                await loop.run_in_executor(None, guardar, nuevos)
+
+    def _bloque_usuarios(self, ultimo):
+        from database import SessionLocal, User
+        db = SessionLocal()
+        try:
+            consulta = db.query(User.id, User.updated_at).filter(
+                User.embedding.isnot(None), _desactualizado(User, self.version)
+            )
+            if ultimo is not None:
+                consulta = consulta.filter(User.id > ultimo)
+            return consulta.order_by(User.id).limit(self.tamaño_bloque).all()
+        finally:
+            db.close()
+
+    def _bloque_muestras(self, ultimo):
+        # Las muestras de inscripción se actualizan junto con su usuario
+        from database import SessionLocal, FaceEmbedding
+        db = SessionLocal()
+        try:
+            consulta = db.query(FaceEmbedding.id, FaceEmbedding.user_id).filter(
+                FaceEmbedding.source != "enrollment", _desactualizado(FaceEmbedding, self.version)
+            )
+            if ultimo is not None:
+                consulta = consulta.filter(FaceEmbedding.id > ultimo)
+            return consulta.order_by(FaceEmbedding.id).limit(self.tamaño_bloque).all()
+        finally:
+            db.close()
+
+    def _guardar_usuarios(self, nuevos):
+        """
+        Escribe en una transacción los embeddings re-extraídos de un bloque de
+        usuarios y de sus muestras de inscripción (la misma foto de perfil).
+        """
+        from database import SessionLocal, User, FaceEmbedding
+        db = SessionLocal()
+        try:
+            # Se conserva updated_at: re-extraer no es una actualización del usuario
+            db.bulk_update_mappings(User, [
+                {"id": fila.id, "embedding": e.tolist(), "model_version": self.version, "updated_at": fila.updated_at}
+                for fila, e in nuevos
+            ])
+            por_usuario = {fila.id: e for fila, e in nuevos}
+            inscripcion = db.query(FaceEmbedding.id, FaceEmbedding.user_id).filter(
+                FaceEmbedding.user_id.in_(list(por_usuario)), FaceEmbedding.source == "enrollment"
+            ).all()
+            db.bulk_update_mappings(FaceEmbedding, [
+                {"id": m.id, "embedding": por_usuario[m.user_id].tolist(), "model_version": self.version}
+                for m in inscripcion
+            ])
+            db.commit()
+            self.actualizados += len(nuevos) + len(inscripcion)
+            self._actualizar_indice(db, list(por_usuario))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _guardar_muestras(self, nuevos):
+        """Escribe en una transacción los embeddings re-extraídos de un bloque de muestras."""
+        from database import SessionLocal, FaceEmbedding
+        db = SessionLocal()
+        try:
+            db.bulk_update_mappings(FaceEmbedding, [
+                {"id": fila.id, "embedding": e.tolist(), "model_version": self.version}
+                for fila, e in nuevos
+            ])
+            db.commit()
+            self.actualizados += len(nuevos)
+            self._actualizar_indice(db, list({fila.user_id for fila, _ in nuevos}))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _actualizar_indice(self, db, usuarios):
+        """
+        Recarga en el índice en memoria las muestras vigentes de esos usuarios.
+        Solo si el índice ya es de la versión re-extraída; si no, se recargará
+        completo al sincronizar la versión.
+        """
+        from database import FaceEmbedding
+        from galeria import indice_galeria
+
+        if indice_galeria.version_modelo != self.version:
+            return
+        filas = db.query(FaceEmbedding.user_id, FaceEmbedding.embedding).filter(
+            FaceEmbedding.user_id.in_(usuarios), FaceEmbedding.model_version == self.version
+        ).all()
+        muestras = {user_id: [] for user_id in usuarios}
+        for user_id, embedding in filas:
+            muestras[user_id].append(embedding)
+        indice_galeria.establecer_varios(muestras)
+
+    def _fijar_dimension(self, dimension, restantes):
+        from database import TABLAS_EMBEDDINGS, dimension_columna_embedding, engine, fijar_dimension_embeddings
+        if engine.dialect.name != "postgresql":
+            return
+        if all(dimension_columna_embedding(t) == dimension for t in TABLAS_EMBEDDINGS):
+            return
+        if restantes["users"] or restantes["face_embeddings"]:
+            logger.warning(
+                "Quedan %d usuarios y %d muestras sin re-extraer (sin foto o sin rostro): "
+                "las columnas siguen sin dimensión fija y sin índice ANN",
+                restantes["users"], restantes["face_embeddings"]
+            )
+            return
+        fijar_dimension_embeddings(dimension)
+
+
+def _si_existe(ruta):
+    return ruta if os.path.exists(ruta) else None
+
+
+# Instancia única compartida por la API
+reextractor_embeddings = ReextractorEmbeddings()
+
+
+# --- Ejecución offline ---
+if __name__ == "__main__":
+    from registro import configurar_logging
+    from pool_embeddings import pool_embeddings
+
+    configurar_logging()
+    from database import create_db_tables
+    create_db_tables()
+    try:
+        resultado = asyncio.run(reextractor_embeddings.ejecutar(pool_embeddings.ejecutar_en_espera))
+    finally:
+        pool_embeddings.detener()
+    print(resultado)
@@ -0,0 +1,83 @@
+# registro.py
+# -----------
+# Configuración centralizada del logging de la API. Reemplaza los
+# print("[DEBUG] ...") del camino de reconocimiento por registros con nivel,
+# formateados de forma diferida (no cuestan nada si el nivel está desactivado),
+# con salida opcional en JSON y un modo de traza muestreado por petición.
+
+import json
+import logging
+import os
+import random
+
+# --- Configuración del Logging ---
+# Nivel mínimo de los registros: DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Formato de salida: 'texto' o 'json' (una línea JSON por registro)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "texto").lower()
+# Fracción de peticiones de reconocimiento (0.0 a 1.0) que emiten una traza detallada
+LOG_TRACE_SAMPLE_RATE = float(os.getenv("LOG_TRACE_SAMPLE_RATE", "0"))
+
+# Librerías muy verbosas en DEBUG (p. ej. un registro por cada parte multipart)
+_LIBRERIAS_RUIDOSAS = ("multipart", "python_multipart", "httpx", "httpcore", "asyncio", "h5py", "tensorflow")
+
+# Atributos estándar de LogRecord; todo lo demás proviene de `extra=`
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def _extras(record):
+    return {k: v for k, v in record.__dict__.items() if k not in _ATRIBUTOS_ESTANDAR}
+
+
+class FormateadorJSON(logging.Formatter):
+    """Emite cada registro como un objeto JSON en una sola línea."""
+
+    def format(self, record):
+        datos = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        datos.update(_extras(record))
+        if record.exc_info:
+            datos["exception"] = self.formatException(record.exc_info)
+        return json.dumps(datos, default=str, ensure_ascii=False)
+
+
+class FormateadorTexto(logging.Formatter):
+    """Formato legible que además añade los campos de `extra=` como clave=valor."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        texto = super().format(record)
+        extras = _extras(record)
+        if extras:
+            texto += " | " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return texto
+
+
+def configurar_logging():
+    """
+    Configura el logger raíz una sola vez por proceso (idempotente), según
+    LOG_LEVEL y LOG_FORMAT.
+    """
+    raiz = logging.getLogger()
+    if any(getattr(h, "_facerecon", False) for h in raiz.handlers):
+        return
+
+    manejador = logging.StreamHandler()
+    manejador.setFormatter(FormateadorJSON() if LOG_FORMAT == "json" else FormateadorTexto())
+    manejador._facerecon = True
+    raiz.addHandler(manejador)
+    raiz.setLevel(LOG_LEVEL)
+    # LOG_LEVEL=DEBUG es para nuestro código, no para las dependencias
+    for nombre in _LIBRERIAS_RUIDOSAS:
+        logging.getLogger(nombre).setLevel(logging.WARNING)
+
+
+def debe_trazar():
+    """Decide (por muestreo) si la petición actual emite una traza detallada."""
+    return LOG_TRACE_SAMPLE_RATE > 0 and random.random() < LOG_TRACE_SAMPLE_RATE
@@ -0,0 +1,331 @@
+# seguimiento_video.py
+# --------------------
+# Reconocimiento sobre video (archivo subido o fotogramas por WebSocket) sin
+# tratar cada fotograma como una foto independiente:
+#
+#   1. Muestreo: solo se analizan VIDEO_SAMPLE_FPS fotogramas por segundo.
+#   2. Detección periódica: el detector (MTCNN/Haar) solo corre en uno de
+#      cada VIDEO_DETECT_EVERY fotogramas muestreados. Sus cajas se asocian
+#      por solapamiento (IoU) a las pistas abiertas o abren pistas nuevas.
+#   3. Seguimiento: en los demás fotogramas cada pista se desplaza buscando
+#      su rostro (cv2.matchTemplate) en una ventana alrededor de su última
+#      posición, a un coste muy inferior al de una detección.
+#   4. Reconocimiento por pista: el rostro de una pista se estandariza y se
+#      proyecta con el PCA al abrirse y, después, cada
+#      VIDEO_RECOGNIZE_INTERVAL_S segundos (0 = una sola vez), en lugar de
+#      en cada fotograma. Una persona que cruza la escena es un reconocimiento
+#      (y una alerta), no uno por fotograma.
+#
+# SesionVideo produce eventos por pista ('track' con el resultado de cada
+# reconocimiento, 'track_end' al cerrarse) que los endpoints envían al
+# cliente a medida que ocurren.
+
+import os
+
+import cv2
+
+from facial_preprocesador import estandarizar_cara
+from face_embedding_extractor import proyectar_caras
+
+# --- Configuración del Reconocimiento en Video ---
+# Fotogramas analizados por segundo de video (el resto se descarta sin procesar)
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "5"))
+# Se detecta en uno de cada N fotogramas muestreados; en los demás se sigue
+VIDEO_DETECT_EVERY = int(os.getenv("VIDEO_DETECT_EVERY", "5"))
+# Segundos entre reconocimientos de una misma pista (0 = solo al aparecer)
+VIDEO_RECOGNIZE_INTERVAL_S = float(os.getenv("VIDEO_RECOGNIZE_INTERVAL_S", "2"))
+# Solapamiento mínimo (IoU) para asociar una detección a una pista
+VIDEO_TRACK_IOU = float(os.getenv("VIDEO_TRACK_IOU", "0.3"))
+# Correlación mínima (TM_CCOEFF_NORMED) para dar por encontrado el rostro seguido
+VIDEO_TRACK_MIN_SCORE = float(os.getenv("VIDEO_TRACK_MIN_SCORE", "0.6"))
+# Fotogramas muestreados seguidos sin encontrar el rostro antes de cerrar la pista
+VIDEO_TRACK_MAX_MISSES = int(os.getenv("VIDEO_TRACK_MAX_MISSES", "3"))
+# Tamaño máximo de un video subido (MB) y fotogramas leídos como máximo
+VIDEO_MAX_MB = float(os.getenv("VIDEO_MAX_MB", "200"))
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", "100000"))
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos cajas [x, y, ancho, alto]."""
+    ancho = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    alto = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if ancho <= 0 or alto <= 0:
+        return 0.0
+    interseccion = ancho * alto
+    return interseccion / float(a[2] * a[3] + b[2] * b[3] - interseccion)
+
+
+def _recortar(gris, caja):
+    x, y, ancho, alto = caja
+    x, y = max(0, x), max(0, y)
+    return gris[y:y + alto, x:x + ancho]
+
+
+class Pista:
+    """Un rostro seguido entre fotogramas."""
+
+    def __init__(self, pista_id, caja, plantilla, t):
+        self.id = pista_id
+        self.caja = list(caja)
+        self.plantilla = plantilla
+        self.fallos = 0
+        self.inicio = t
+        self.ultima_vez = t
+        self.fotogramas = 1
+        self.ultimo_reconocimiento = None
+        self.reconocimientos = 0
+        self.usuario = None
+
+    def reconocer_ahora(self, t, intervalo):
+        if self.ultimo_reconocimiento is None:
+            return True
+        return intervalo > 0 and t - self.ultimo_reconocimiento >= intervalo
+
+
+class RastreadorCaras:
+    """
+    Mantiene las pistas abiertas: las asocia con las detecciones cuando las
+    hay y las sigue por correlación de plantillas entre detecciones.
+    """
+
+    def __init__(self, iou_minimo=VIDEO_TRACK_IOU, puntuacion_minima=VIDEO_TRACK_MIN_SCORE,
+                 max_fallos=VIDEO_TRACK_MAX_MISSES):
+        self.iou_minimo = iou_minimo
+        self.puntuacion_minima = puntuacion_minima
+        self.max_fallos = max_fallos
+        self.pistas = []
+        self._siguiente_id = 1
+
+    def asociar(self, gris, cajas, t):
+        """
+        Asocia las detecciones de un fotograma a las pistas (de mayor a menor
+        IoU); las detecciones sin pista abren una nueva.
+
+        Returns:
+            tuple: (pistas nuevas, pistas cerradas).
+        """
+        pares = sorted(
+            ((iou(pista.caja, caja), i, j) for i, pista in enumerate(self.pistas) for j, caja in enumerate(cajas)),
+            reverse=True,
+        )
+        asignadas, usadas = set(), set()
+        for solapamiento, i, j in pares:
+            if solapamiento < self.iou_minimo:
+                break
+            if i in asignadas or j in usadas:
+                continue
+            asignadas.add(i)
+            usadas.add(j)
+            self._actualizar(self.pistas[i], cajas[j], _recortar(gris, cajas[j]).copy(), t)
+
+        for i, pista in enumerate(self.pistas):
+            if i not in asignadas:
+                pista.fallos += 1
+
+        nuevas = []
+        for j, caja in enumerate(cajas):
+            plantilla = _recortar(gris, caja)
+            if j in usadas or plantilla.size == 0:
+                continue
+            pista = Pista(self._siguiente_id, caja, plantilla.copy(), t)
+            self._siguiente_id += 1
+            self.pistas.append(pista)
+            nuevas.append(pista)
+        return nuevas, self._cerrar_perdidas()
+
+    def seguir(self, gris, t):
+        """
+        Busca el rostro de cada pista en una ventana del doble de su tamaño
+        alrededor de su última posición.
+
+        Returns:
+            list: Pistas cerradas por perderse su rostro.
+        """
+        alto_img, ancho_img = gris.shape[:2]
+        for pista in self.pistas:
+            x, y, ancho, alto = pista.caja
+            alto_p, ancho_p = pista.plantilla.shape[:2]
+            x0, y0 = max(0, x - ancho // 2), max(0, y - alto // 2)
+            x1, y1 = min(ancho_img, x + ancho + ancho // 2), min(alto_img, y + alto + alto // 2)
+            ventana = gris[y0:y1, x0:x1]
+            if ventana.shape[0] < alto_p or ventana.shape[1] < ancho_p:
+                pista.fallos += 1
+                continue
+            resultado = cv2.matchTemplate(ventana, pista.plantilla, cv2.TM_CCOEFF_NORMED)
+            _, puntuacion, _, (dx, dy) = cv2.minMaxLoc(resultado)
+            if puntuacion < self.puntuacion_minima:
+                pista.fallos += 1
+                continue
+            # La plantilla es la de la última detección: seguir contra ella evita la deriva
+            self._actualizar(pista, [x0 + dx, y0 + dy, ancho_p, alto_p], None, t)
+        return self._cerrar_perdidas()
+
+    def cerrar_todas(self):
+        cerradas, self.pistas = self.pistas, []
+        return cerradas
+
+    @staticmethod
+    def _actualizar(pista, caja, plantilla, t):
+        pista.caja = [int(v) for v in caja]
+        if plantilla is not None and plantilla.size:
+            pista.plantilla = plantilla
+        pista.fallos = 0
+        pista.ultima_vez = t
+        pista.fotogramas += 1
+
+    def _cerrar_perdidas(self):
+        cerradas = [pista for pista in self.pistas if pista.fallos > self.max_fallos]
+        if cerradas:
+            self.pistas = [pista for pista in self.pistas if pista.fallos <= self.max_fallos]
+        return cerradas
+
+
+class SesionVideo:
+    """
+    Procesa los fotogramas de un video o de una cámara y devuelve los
+    eventos de cada pista.
+
+    Args:
+        detectar (callable): Corutina detectar(fotograma_bgr) -> cajas
+                             (p. ej. detectar_rostros en el pool de extracción).
+        reconocer (callable): Corutina reconocer(embeddings) -> un resultado
+                              de reconocimiento (dict) por embedding.
+        ejecutor (callable): Corutina ejecutor(funcion, *args) que corre el
+                             trabajo de CPU del seguimiento fuera del event loop.
+        detectar_cada (int): Se detecta en uno de cada N fotogramas analizados.
+        intervalo_reconocimiento (float): Segundos entre reconocimientos de una pista.
+    """
+
+    def __init__(self, detectar, reconocer, ejecutor, detectar_cada=VIDEO_DETECT_EVERY,
+                 intervalo_reconocimiento=VIDEO_RECOGNIZE_INTERVAL_S, rastreador=None):
+        self._detectar = detectar
+        self._reconocer = reconocer
+        self._ejecutor = ejecutor
+        self.detectar_cada = max(1, detectar_cada)
+        self.intervalo_reconocimiento = intervalo_reconocimiento
+        self.rastreador = rastreador or RastreadorCaras()
+        # Estadísticas de la sesión (evento 'summary')
+        self.analizados = 0
+        self.detecciones = 0
+        self.seguimientos = 0
+        self.reconocimientos = 0
+        self.pistas_totales = 0
+
+    async def procesar(self, fotograma, t, indice=None):
+        """
+        Analiza un fotograma (BGR) del instante `t` (segundos).
+
+        Returns:
+            list: Eventos generados ('track' y 'track_end').
+        """
+        detectar = self.analizados % self.detectar_cada == 0
+        self.analizados += 1
+        cajas = None
+        if detectar:
+            cajas = await self._detectar(fotograma)
+            self.detecciones += 1
+        else:
+            self.seguimientos += 1
+        pendientes, cerradas = await self._ejecutor(self._actualizar, fotograma, cajas, t)
+
+        eventos = [self._evento_fin(pista) for pista in cerradas]
+        if pendientes:
+            pistas, caras = zip(*pendientes)
+            embeddings = await self._ejecutor(proyectar_caras, list(caras))
+            if embeddings is not None:
+                resultados = await self._reconocer(list(embeddings))
+                for pista, resultado in zip(pistas, resultados):
+                    eventos.append(self._evento_reconocimiento(pista, resultado, t, indice))
+        return eventos
+
+    def finalizar(self):
+        """Cierra las pistas abiertas al terminar el video o la conexión."""
+        return [self._evento_fin(pista) for pista in self.rastreador.cerrar_todas()]
+
+    def resumen(self):
+        return {
+            "event": "summary",
+            "frames_analyzed": self.analizados,
+            "detections": self.detecciones,
+            "tracked_frames": self.seguimientos,
+            "recognitions": self.reconocimientos,
+            "tracks": self.pistas_totales,
+        }
+
+    def _actualizar(self, fotograma, cajas, t):
+        # Trabajo de CPU del fotograma: asociación o seguimiento y recorte de
+        # las pistas que toca reconocer
+        gris = cv2.cvtColor(fotograma, cv2.COLOR_BGR2GRAY)
+        if cajas is not None:
+            nuevas, cerradas = self.rastreador.asociar(gris, cajas, t)
+            self.pistas_totales += len(nuevas)
+        else:
+            cerradas = self.rastreador.seguir(gris, t)
+
+        pendientes = []
+        for pista in self.rastreador.pistas:
+            if pista.ultima_vez != t or not pista.reconocer_ahora(t, self.intervalo_reconocimiento):
+                continue
+            cara = estandarizar_cara(fotograma, pista.caja)
+            if cara is not None:
+                pendientes.append((pista, cara))
+        return pendientes, cerradas
+
+    def _evento_reconocimiento(self, pista, resultado, t, indice):
+        pista.ultimo_reconocimiento = t
+        pista.reconocimientos += 1
+        self.reconocimientos += 1
+        if resultado.get("success"):
+            pista.usuario = resultado["user"]
+        return {
+            "event": "track",
+            "track_id": pista.id,
+            "time": round(t, 3),
+            "frame": indice,
+            "box": pista.caja,
+            "result": resultado,
+        }
+
+    @staticmethod
+    def _evento_fin(pista):
+        return {
+            "event": "track_end",
+            "track_id": pista.id,
+            "first_seen": round(pista.inicio, 3),
+            "last_seen": round(pista.ultima_vez, 3),
+            "frames": pista.fotogramas,
+            "recognitions": pista.reconocimientos,
+            "user": pista.usuario,
+        }
+
+
+def leer_video(ruta, fps_muestreo=VIDEO_SAMPLE_FPS, max_fotogramas=VIDEO_MAX_FRAMES):
+    """
+    Generador de los fotogramas muestreados de un archivo de video.
+
+    Los fotogramas descartados solo se avanzan con grab() (sin convertirlos
+    a BGR). Si el contenedor no informa los FPS se asumen 25.
+
+    Yields:
+        tuple: (índice del fotograma, instante en segundos, imagen BGR).
+
+    Raises:
+        ValueError: Si OpenCV no puede abrir el video.
+    """
+    captura = cv2.VideoCapture(ruta)
+    if not captura.isOpened():
+        raise ValueError("No se pudo abrir el video")
+    try:
+        fps = captura.get(cv2.CAP_PROP_FPS) or 25.0
+        paso = max(1, int(round(fps / fps_muestreo))) if fps_muestreo > 0 else 1
+        for indice in range(max_fotogramas):
+            if indice % paso:
+                if not captura.grab():
+                    break
+                continue
+            leido, fotograma = captura.read()
+            if not leido:
+                break
+            yield indice, indice / fps, fotograma
+    finally:
+        captura.release()
@@ -0,0 +1,166 @@
+# serializadores.py
+# -----------------
+# Construcción de las respuestas JSON de usuarios, compartida por todos los
+# endpoints. Cada campo de la respuesta declara las columnas de 'users' que
+# necesita: los listados seleccionan solo esas columnas (nunca el embedding)
+# en lugar de hidratar objetos User completos, y el nombre se divide una sola
+# vez por fila. También implementa la paginación por clave (cursor) de los
+# listados.
+
+import base64
+import binascii
+import os
+import uuid
+
+from database import User
+
+# --- Configuración de los Listados ---
+# Máximo de filas por página aceptado en los listados paginados
+USERS_PAGE_SIZE_MAX = int(os.getenv("USERS_PAGE_SIZE_MAX", "1000"))
+
+URL_FOTOS_PERFIL = "/static/fotos_perfil"
+
+
+class CamposInvalidosError(ValueError):
+    """Se pidieron campos que la respuesta no ofrece."""
+
+
+class CursorInvalidoError(ValueError):
+    """El cursor de paginación no es válido."""
+
+
+def dividir_nombre(nombre):
+    """
+    Separa el nombre completo guardado en 'name' en (nombre, apellido):
+    la primera palabra y el resto.
+    """
+    partes = nombre.split() if nombre else []
+    if not partes:
+        return "", ""
+    return partes[0], " ".join(partes[1:])
+
+
+def url_foto(user_id):
+    return f"{URL_FOTOS_PERFIL}/{user_id}.jpg"
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else None
+
+
+# Campo de la respuesta -> (columnas de User que necesita, cómo se obtiene a
+# partir de la fila y del nombre ya dividido)
+CAMPOS_USUARIO = {
+    "id": ((User.id,), lambda fila, nombre: str(fila.id)),
+    "nombre": ((User.name,), lambda fila, nombre: nombre[0]),
+    "apellido": ((User.name,), lambda fila, nombre: nombre[1]),
+    "email": ((User.email,), lambda fila, nombre: fila.email),
+    "telefono": ((User.telefono,), lambda fila, nombre: fila.telefono),
+    "requisitoriado": ((User.requested,), lambda fila, nombre: fila.requested),
+    "url_foto": ((User.id,), lambda fila, nombre: url_foto(fila.id)),
+    "created_at": ((User.created_at,), lambda fila, nombre: _fecha(fila.created_at)),
+    "updated_at": ((User.updated_at,), lambda fila, nombre: _fecha(fila.updated_at)),
+}
+
+# Campos por defecto de cada respuesta (los de siempre de cada endpoint)
+CAMPOS_LISTADO = ("id", "nombre", "apellido", "email", "telefono", "requisitoriado", "url_foto", "created_at")
+CAMPOS_ALERTA = ("id", "nombre", "apellido", "email", "telefono", "url_foto", "created_at")
+CAMPOS_DETALLE = CAMPOS_LISTADO + ("updated_at",)
+CAMPOS_RECONOCIMIENTO = ("id", "nombre", "apellido", "email", "telefono", "requisitoriado", "url_foto")
+
+
+class SerializadorUsuario:
+    """
+    Convierte filas de 'users' (objetos User o filas con solo algunas
+    columnas) en el dict de la respuesta con los campos pedidos.
+    """
+
+    def __init__(self, campos):
+        desconocidos = [campo for campo in campos if campo not in CAMPOS_USUARIO]
+        if desconocidos:
+            raise CamposInvalidosError(
+                f"Campos desconocidos: {', '.join(desconocidos)}. "
+                f"Disponibles: {', '.join(CAMPOS_USUARIO)}"
+            )
+        self.campos = tuple(dict.fromkeys(campos))
+        self._extractores = [(campo, CAMPOS_USUARIO[campo][1]) for campo in self.campos]
+        self._divide_nombre = "nombre" in self.campos or "apellido" in self.campos
+
+    @classmethod
+    def desde_parametro(cls, campos, por_defecto):
+        """
+        Crea el serializador a partir del parámetro `campos` de la petición
+        (lista separada por comas) o, si no se envió, de los campos por defecto.
+
+        Raises:
+            CamposInvalidosError: Si se pide algún campo desconocido.
+        """
+        if campos is None:
+            return cls(por_defecto)
+        pedidos = [campo.strip() for campo in campos.split(",") if campo.strip()]
+        if not pedidos:
+            raise CamposInvalidosError("No se pidió ningún campo")
+        return cls(pedidos)
+
+    def columnas(self):
+        """Columnas de User necesarias; 'id' siempre se incluye (clave del cursor)."""
+        columnas = {User.id.key: User.id}
+        for campo in self.campos:
+            for columna in CAMPOS_USUARIO[campo][0]:
+                columnas.setdefault(columna.key, columna)
+        return list(columnas.values())
+
+    def consulta(self, db):
+        """Query que selecciona solo las columnas necesarias."""
+        return db.query(*self.columnas())
+
+    def __call__(self, fila):
+        nombre = dividir_nombre(fila.name) if self._divide_nombre else None
+        return {campo: extraer(fila, nombre) for campo, extraer in self._extractores}
+
+
+def codificar_cursor(user_id):
+    """Cursor opaco que apunta a la fila siguiente a `user_id`."""
+    return base64.urlsafe_b64encode(uuid.UUID(str(user_id)).bytes).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """
+    Raises:
+        CursorInvalidoError: Si el cursor no fue generado por codificar_cursor.
+    """
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise CursorInvalidoError("Cursor de paginación inválido")
+
+
+def paginar(consulta, cursor=None, limite=None):
+    """
+    Paginación por clave sobre el ID de usuario (la clave primaria): cada
+    página empieza tras el último ID de la anterior, sin OFFSET, así que
+    cuesta lo mismo al principio que al final del listado y no salta ni
+    repite filas si se inscriben usuarios entre página y página.
+
+    Args:
+        consulta: Query sobre 'users' que incluye la columna id.
+        cursor (str): Cursor devuelto por la página anterior, o None.
+        limite (int): Filas por página; None devuelve todas las restantes.
+
+    Returns:
+        tuple: (filas, cursor de la página siguiente o None si no hay más).
+
+    Raises:
+        CursorInvalidoError: Si el cursor no es válido.
+    """
+    if cursor is not None:
+        consulta = consulta.filter(User.id > decodificar_cursor(cursor))
+    consulta = consulta.order_by(User.id)
+    if limite is None:
+        return consulta.all(), None
+    # Una fila de más indica si hay otra página sin hacer un COUNT
+    filas = consulta.limit(limite + 1).all()
+    if len(filas) <= limite:
+        return filas, None
+    filas = filas[:limite]
+    return filas, codificar_cursor(filas[-1].id)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the recognition micro-batcher (AgrupadorLotes): a full
+batcher rejects new requests with ColaLlenaError (503 in the API), and every
+request gets its own result back, also when a batch mixes image sizes
+"""
+
+import asyncio
+import glob
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from agrupador_lotes import AgrupadorLotes
+from pool_embeddings import ColaLlenaError
+
+def test_cola_llena():
+    """Submissions beyond max_pendientes fail fast; the accepted ones still complete"""
+    print("🔍 Testing micro-batch queue limit...")
+
+    async def correr():
+        liberar = asyncio.Event()
+
+        async def ejecutor(funcion, *args):
+            await liberar.wait()
+            return funcion(*args)
+
+        agrupador = AgrupadorLotes(lambda lote: [x * 10 for x in lote], ejecutor,
+                                   max_lote=2, max_espera_ms=1, max_pendientes=3)
+        tareas = [asyncio.ensure_future(agrupador.enviar(i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        rechazadas = [t for t in tareas if t.done()]
+        assert len(rechazadas) == 2
+        assert all(isinstance(t.exception(), ColaLlenaError) for t in rechazadas)
+
+        liberar.set()
+        assert await asyncio.gather(*tareas[:3]) == [0, 10, 20]
+        # Resueltas las pendientes, vuelve a aceptar
+        assert await agrupador.enviar(7) == 70
+        await agrupador.detener()
+
+    asyncio.run(correr())
+
+def test_resultados_en_orden():
+    """Each request gets its own result across many batches and arrival orders"""
+    print("🔍 Testing micro-batch result mapping...")
+
+    async def correr():
+        async def ejecutor(funcion, *args):
+            await asyncio.sleep(random.random() / 100)
+            return funcion(*args)
+
+        agrupador = AgrupadorLotes(lambda lote: [("r", x) for x in lote], ejecutor,
+                                   max_lote=4, max_espera_ms=2, max_pendientes=1000)
+
+        async def cliente(i):
+            await asyncio.sleep(random.random() / 50)
+            return await agrupador.enviar(i)
+
+        resultados = await asyncio.gather(*(cliente(i) for i in range(100)))
+        assert resultados == [("r", i) for i in range(100)]
+        assert 1 < agrupador.lotes_procesados < 100
+        await agrupador.detener()
+
+    random.seed(0)
+    asyncio.run(correr())
+
+def test_tamaños_mixtos():
+    """Batched extraction of mixed-size uploads matches one-by-one extraction"""
+    print("🔍 Testing micro-batching with mixed image sizes...")
+    from face_embedding_extractor import extraer_embedding_pca, extraer_embeddings_pca_lote
+    from modelos import registro_modelos
+
+    if registro_modelos.pca() is None:
+        pytest.skip("No PCA model available")
+    rutas = sorted(glob.glob("data/initial_enrollment/*"))[:4]
+    if not rutas:
+        pytest.skip("No images in data/initial_enrollment")
+
+    # Cada foto a dos tamaños distintos, intercaladas, más una imagen sin rostro
+    imagenes = []
+    for ruta in rutas:
+        imagen = cv2.imread(ruta)
+        for lado in (320, 480):
+            imagenes.append(cv2.imencode(".jpg", cv2.resize(imagen, (lado, lado)))[1].tobytes())
+    imagenes.insert(3, cv2.imencode(".jpg", np.zeros((320, 320, 3), np.uint8))[1].tobytes())
+    esperados = [extraer_embedding_pca(imagen) for imagen in imagenes]
+    assert esperados[3] is None
+
+    async def correr():
+        async def ejecutor(funcion, *args):
+            return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
+
+        agrupador = AgrupadorLotes(extraer_embeddings_pca_lote, ejecutor, max_lote=len(imagenes),
+                                   max_espera_ms=200, max_pendientes=len(imagenes))
+        resultados = await asyncio.gather(*(agrupador.enviar(imagen) for imagen in imagenes))
+        lotes = agrupador.lotes_procesados
+        await agrupador.detener()
+        return resultados, lotes
+
+    resultados, lotes = asyncio.run(correr())
+    assert lotes == 1
+    # La inferencia MTCNN por lotes puede mover unos píxeles una caja respecto
+    # a la detección individual, así que no se exige igualdad exacta: cada
+    # petición debe recibir el embedding más cercano al de su propia imagen
+    validos = [i for i, esperado in enumerate(esperados) if esperado is not None]
+    referencia = np.stack([esperados[i] for i in validos])
+    for i, (esperado, obtenido) in enumerate(zip(esperados, resultados)):
+        if esperado is None:
+            assert obtenido is None
+        else:
+            distancias = np.linalg.norm(referencia - obtenido, axis=1)
+            assert validos[int(np.argmin(distancias))] == i
+
+if __name__ == "__main__":
+    test_cola_llena()
+    test_resultados_en_orden()
+    print("✅ Micro-batcher queue and mapping: PASSED")
+    test_tamaños_mixtos()
+    print("✅ Micro-batching with mixed sizes: PASSED")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the alert queue (ColaAlertas): a full queue drops and
+counts new events without blocking, and the writer delivers events to the
+sinks in batches, flushing what is pending on detener()
+"""
+
+import threading
+import time
+
+from alertas import ColaAlertas, crear_evento
+
+class SumideroMemoria:
+    """Sink that records each batch; optionally blocks until released"""
+    nombre = "memoria"
+
+    def __init__(self, bloquear=False):
+        self.lotes = []
+        self.liberar = threading.Event()
+        self.ocupado = threading.Event()
+        if not bloquear:
+            self.liberar.set()
+
+    def escribir(self, eventos):
+        self.ocupado.set()
+        self.liberar.wait(10)
+        self.lotes.append(list(eventos))
+
+class SumideroRoto:
+    nombre = "roto"
+
+    def escribir(self, eventos):
+        raise IOError("sin conexión")
+
+def evento(i):
+    return crear_evento(f"u{i}", f"Usuario {i}", f"u{i}@x.com", "1", 0.9, 100.0)
+
+def test_cola_llena_descarta():
+    """With the writer stuck, events beyond the capacity are dropped and counted"""
+    print("🔍 Testing alert queue overflow...")
+    sumidero = SumideroMemoria(bloquear=True)
+    cola = ColaAlertas([sumidero], capacidad=3, max_lote=1, intervalo_ms=0)
+
+    assert cola.publicar(evento(0))
+    # El escritor tomó el primer evento y quedó bloqueado en el sumidero
+    assert sumidero.ocupado.wait(5)
+    inicio = time.perf_counter()
+    aceptados = [cola.publicar(evento(i)) for i in range(1, 10)]
+    assert time.perf_counter() - inicio < 1.0  # publicar nunca espera
+    assert aceptados == [True] * 3 + [False] * 6
+
+    estadisticas = cola.estadisticas()
+    assert estadisticas["published"] == 4
+    assert estadisticas["dropped"] == 6
+    assert estadisticas["pending"] == 3
+    assert estadisticas["max_pending"] == 3
+
+    sumidero.liberar.set()
+    cola.detener()
+    assert [e["user_id"] for lote in sumidero.lotes for e in lote] == ["u0", "u1", "u2", "u3"]
+    assert cola.estadisticas()["written"] == 4
+
+def test_detener_vacia_por_lotes():
+    """detener() delivers the pending events in batches of at most max_lote"""
+    print("🔍 Testing batched flush on detener()...")
+    sumidero = SumideroMemoria()
+    roto = SumideroRoto()
+    # Intervalo largo: sin detener(), el último lote esperaría 30 s
+    cola = ColaAlertas([sumidero, roto], capacidad=100, max_lote=4, intervalo_ms=30000)
+    for i in range(10):
+        assert cola.publicar(evento(i))
+
+    inicio = time.perf_counter()
+    cola.detener()
+    assert time.perf_counter() - inicio < 5.0
+
+    assert [e["user_id"] for lote in sumidero.lotes for e in lote] == [f"u{i}" for i in range(10)]
+    assert all(len(lote) <= 4 for lote in sumidero.lotes)
+    assert len(sumidero.lotes) == 3
+    estadisticas = cola.estadisticas()
+    assert estadisticas["written"] == 10
+    assert estadisticas["batches"] == 3
+    # El fallo de un sumidero no impide entregar a los demás
+    assert estadisticas["sink_errors"] == {"memoria": 0, "roto": 3}
+
+def test_sin_sumideros():
+    cola = ColaAlertas([])
+    assert cola.publicar(evento(0))
+    cola.detener()
+    assert cola.estadisticas()["published"] == 0
+
+if __name__ == "__main__":
+    test_cola_llena_descarta()
+    print("✅ Alert queue overflow: PASSED")
+    test_detener_vacia_por_lotes()
+    print("✅ Alert batched flush: PASSED")
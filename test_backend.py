@@ -19,6 +19,14 @@ def test_health():
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
+def test_ready():
+    """Test the readiness endpoint (503 while models are warming up)"""
+    print("\n🔥 Testing readiness endpoint...")
+    response = requests.get(f"{BASE_URL}/ready")
+    print(f"Status: {response.status_code}")
+    print(f"Response: {response.json()}")
+    return response.status_code in (200, 503)
+
 def test_stats():
     """Test the stats endpoint"""
     print("\n📊 Testing stats endpoint...")
@@ -54,6 +62,18 @@ def test_recognition_without_image():
         print(f"Expected error: {e}")
     return True
 
+def test_recognition_batch_invalid_images():
+    """Test batch recognition with undecodable images (one result per image expected)"""
+    print("\n🔍 Testing batch recognition endpoint with invalid images...")
+    files = [
+        ('face_images', ('frame1.jpg', b'fake_image_data', 'image/jpeg')),
+        ('face_images', ('frame2.jpg', b'fake_image_data', 'image/jpeg')),
+    ]
+    response = requests.post(f"{BASE_URL}/recognize/batch", files=files)
+    print(f"Status: {response.status_code}")
+    print(f"Response: {response.json()}")
+    return response.status_code == 200 and len(response.json()["results"]) == 2
+
 def main():
     """Run all tests"""
     print("🧪 Starting Face Recognition Backend Tests")
@@ -61,10 +81,12 @@ def main():
     
     tests = [
         ("Health Check", test_health),
+        ("Readiness", test_ready),
         ("Stats", test_stats),
         ("Users List", test_users_list),
         ("Alertas", test_alertas),
         ("Recognition (no image)", test_recognition_without_image),
+        ("Batch Recognition (invalid images)", test_recognition_batch_invalid_images),
     ]
     
     passed = 0
@@ -90,14 +112,24 @@ def main():
     
     print("\n📋 Available Endpoints:")
     print(f"  GET  {BASE_URL}/health")
+    print(f"  GET  {BASE_URL}/ready")
     print(f"  GET  {BASE_URL}/stats/")
     print(f"  GET  {BASE_URL}/usuarios/")
     print(f"  POST {BASE_URL}/usuarios/")
+    print(f"  POST {BASE_URL}/usuarios/masivo")
     print(f"  GET  {BASE_URL}/usuarios/{{id}}")
     print(f"  PUT  {BASE_URL}/usuarios/{{id}}")
     print(f"  DELETE {BASE_URL}/usuarios/{{id}}")
+    print(f"  POST {BASE_URL}/usuarios/{{id}}/muestras")
+    print(f"  GET  {BASE_URL}/usuarios/{{id}}/muestras")
+    print(f"  POST {BASE_URL}/modelo/reextraer")
     print(f"  POST {BASE_URL}/recognize/")
+    print(f"  POST {BASE_URL}/recognize/batch")
+    print(f"  POST {BASE_URL}/recognize/video")
+    print(f"  WS   {BASE_URL.replace('http', 'ws', 1)}/recognize/stream")
     print(f"  GET  {BASE_URL}/alertas/")
+    print(f"  GET  {BASE_URL}/alertas/eventos")
+    print(f"  GET  {BASE_URL}/metrics")
     print(f"  POST {BASE_URL}/usuarios/{{id}}/toggle-requisitoriado")
 
 if __name__ == "__main__":
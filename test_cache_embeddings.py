@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the embedding cache (CacheEmbeddings): LRU eviction,
+TTL expiry and invalidation when the PCA model files change, including an
+embedding extracted with the previous model
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+import cache_embeddings
+from cache_embeddings import CacheEmbeddings
+
+def test_desalojo_lru():
+    """The least recently used entry is evicted first"""
+    print("🔍 Testing LRU eviction...")
+    cache = CacheEmbeddings(max_entradas=2, ttl=0, rutas_modelo=())
+    cache.guardar("a", np.ones(3))
+    cache.guardar("b", None)  # "no face" is cached too
+    assert cache.obtener("a")[0]  # 'a' becomes the most recent
+    cache.guardar("c", np.zeros(3))
+
+    assert cache.obtener("b") == (False, None)
+    encontrado, embedding = cache.obtener("a")
+    assert encontrado and np.array_equal(embedding, np.ones(3))
+    assert cache.obtener("c")[0]
+    assert cache.estadisticas()["evictions"] == 1
+    assert cache.estadisticas()["size"] == 2
+
+def test_sin_rostro_y_deshabilitada():
+    """A cached None is a hit; a zero-size cache never stores anything"""
+    print("🔍 Testing cached misses and a disabled cache...")
+    cache = CacheEmbeddings(max_entradas=4, ttl=0, rutas_modelo=())
+    cache.guardar("x", None)
+    assert cache.obtener("x") == (True, None)
+
+    deshabilitada = CacheEmbeddings(max_entradas=0, ttl=0, rutas_modelo=())
+    deshabilitada.guardar("x", np.ones(3))
+    assert deshabilitada.obtener("x") == (False, None)
+
+def test_expiracion_ttl(monkeypatch):
+    """Entries expire after the TTL"""
+    print("🔍 Testing TTL expiry...")
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_embeddings.time, "monotonic", lambda: ahora[0])
+    cache = CacheEmbeddings(max_entradas=4, ttl=10, rutas_modelo=())
+    cache.guardar("a", np.ones(3))
+
+    ahora[0] += 9
+    assert cache.obtener("a")[0]
+    ahora[0] += 2
+    assert cache.obtener("a") == (False, None)
+    assert cache.estadisticas()["size"] == 0
+
+def test_invalidacion_por_modelo():
+    """Changing the model files clears the cache and drops stale extractions"""
+    print("🔍 Testing invalidation when the PCA model changes...")
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "pca_model.json")
+        with open(ruta, "w") as f:
+            f.write('{"version": 1}')
+        cache = CacheEmbeddings(max_entradas=4, ttl=0, rutas_modelo=(ruta,))
+        cache.guardar("a", np.ones(3))
+        assert cache.obtener("a")[0]
+
+        # Fallo: la huella se toma antes de extraer con el modelo en uso
+        huella = cache.huella_modelo()
+        with open(ruta, "w") as f:
+            f.write('{"version": 2, "data_file": "pca_model.v2.npy"}')
+
+        # Se publicó otro modelo durante la extracción: no se guarda
+        cache.guardar("b", np.zeros(3), huella)
+        assert cache.obtener("a") == (False, None)
+        assert cache.obtener("b") == (False, None)
+        assert cache.estadisticas()["invalidations"] == 1
+
+        # Con la huella del modelo nuevo sí se guarda
+        cache.guardar("b", np.zeros(3), cache.huella_modelo())
+        assert cache.obtener("b")[0]
+
+if __name__ == "__main__":
+    test_desalojo_lru()
+    test_sin_rostro_y_deshabilitada()
+    print("✅ Embedding cache LRU: PASSED")
+    test_invalidacion_por_modelo()
+    print("✅ Embedding cache invalidation: PASSED")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the in-memory gallery index (IndiceGaleria) returns
+the same top-k users as a NumPy brute force after a random mix of writes
+(establecer, establecer_varios, agregar, eliminar) that exercises the append
+buffer, dead rows and compaction, for both aggregations
+"""
+
+import numpy as np
+import pytest
+
+from galeria import IndiceGaleria
+
+DIMENSION = 16
+
+def fuerza_bruta(muestras, consulta, k, agregacion):
+    """Top-k users by exhaustive search over a dict user_id -> (n, d) samples"""
+    distancias = []
+    for user_id, matriz in muestras.items():
+        if agregacion == "centroide":
+            matriz = matriz.mean(axis=0, keepdims=True)
+        distancias.append((user_id, float(np.linalg.norm(matriz - consulta, axis=1).min())))
+    distancias.sort(key=lambda par: par[1])
+    return distancias[:k]
+
+def comparar(indice, muestras, rng, agregacion, k=5):
+    consultas = rng.normal(size=(8, DIMENSION)).astype(np.float32)
+    obtenidos = indice.buscar_top_k_lote(consultas, k)
+    for consulta, obtenido in zip(consultas, obtenidos):
+        esperado = fuerza_bruta(muestras, consulta, k, agregacion)
+        assert [u for u, _ in obtenido] == [u for u, _ in esperado]
+        np.testing.assert_allclose([d for _, d in obtenido], [d for _, d in esperado], rtol=1e-4)
+    assert len(indice) == len(muestras)
+    assert indice.muestras == sum(len(m) for m in muestras.values())
+
+@pytest.mark.parametrize("agregacion", ["min", "centroide"])
+def test_top_k_igual_a_fuerza_bruta(agregacion):
+    """Random writes against a dict mirror, checking searches after every step"""
+    print(f"🔍 Testing gallery top-k against brute force ({agregacion})...")
+    rng = np.random.default_rng(0)
+    indice = IndiceGaleria(agregacion=agregacion)
+    muestras = {}
+
+    def aleatorias():
+        return rng.normal(size=(int(rng.integers(1, 5)), DIMENSION)).astype(np.float32)
+
+    inicial = {f"u{i}": aleatorias() for i in range(40)}
+    indice.cargar([(u, fila) for u, m in inicial.items() for fila in m], version_modelo=1)
+    muestras.update(inicial)
+    comparar(indice, muestras, rng, agregacion)
+
+    compactaciones, siguiente = 0, 40
+    for _ in range(300):
+        muertas_antes = indice._muertas
+        operacion = rng.integers(0, 4)
+        existentes = sorted(muestras)
+        if operacion == 0 or not existentes:
+            user_id = f"u{siguiente}"
+            siguiente += 1
+            muestras[user_id] = aleatorias()
+            indice.establecer(user_id, list(muestras[user_id]))
+        elif operacion == 1:
+            cambios = {}
+            for user_id in rng.choice(existentes, size=min(3, len(existentes)), replace=False):
+                cambios[str(user_id)] = aleatorias()
+            cambios[f"u{siguiente}"] = aleatorias()
+            siguiente += 1
+            muestras.update(cambios)
+            indice.establecer_varios({u: list(m) for u, m in cambios.items()})
+        elif operacion == 2:
+            user_id = str(rng.choice(existentes))
+            vector = rng.normal(size=DIMENSION).astype(np.float32)
+            muestras[user_id] = np.vstack([muestras[user_id], vector])
+            indice.agregar(user_id, vector)
+        else:
+            user_id = str(rng.choice(existentes))
+            del muestras[user_id]
+            if rng.integers(0, 2):
+                indice.eliminar(user_id)
+            else:
+                indice.establecer(user_id, [])
+
+        comparar(indice, muestras, rng, agregacion)
+        compactaciones += muertas_antes > 0 and indice._muertas == 0
+
+    # Las escrituras incrementales dejaron filas muertas y se compactaron
+    assert compactaciones > 0
+    indice.eliminar("no-existe")
+    comparar(indice, muestras, rng, agregacion)
+
+def test_cambio_de_dimension():
+    """Writes with a new model dimension drop the old rows instead of failing"""
+    print("🔍 Testing a dimension change in the gallery index...")
+    rng = np.random.default_rng(1)
+    indice = IndiceGaleria(agregacion="min")
+    indice.cargar([(f"u{i}", rng.normal(size=DIMENSION)) for i in range(5)])
+
+    nuevo = rng.normal(size=DIMENSION + 4).astype(np.float32)
+    indice.agregar("n1", nuevo)
+    assert len(indice) == 1
+    resultado = indice.buscar_top_k(nuevo, 3)
+    assert [u for u, _ in resultado] == ["n1"]
+    assert resultado[0][1] == pytest.approx(0.0, abs=1e-5)
+
+    # Mezcla de dimensiones en una misma escritura: gana la última
+    indice.establecer_varios({
+        "v1": [rng.normal(size=DIMENSION)],
+        "n2": [rng.normal(size=DIMENSION + 4)],
+    })
+    assert sorted(u for u, _ in indice.buscar_top_k(nuevo, 5)) == ["n1", "n2"]
+
+if __name__ == "__main__":
+    for agregacion in ("min", "centroide"):
+        test_top_k_igual_a_fuerza_bruta(agregacion)
+    print("✅ Gallery top-k vs brute force: PASSED")
+    test_cambio_de_dimension()
+    print("✅ Gallery dimension change: PASSED")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pgvector nearest-neighbour search against the NumPy index
+Requires a local PostgreSQL (DATABASE_URL) with the pgvector extension; skipped otherwise
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal, User, pgvector_disponible, buscar_vecinos_pgvector
+from galeria import IndiceGaleria
+
+def test_pgvector_vs_numpy():
+    """Compare top-1 results from pgvector and from the in-memory index"""
+    print("🔍 Testing pgvector search against the NumPy gallery index...")
+    db = SessionLocal()
+    try:
+        try:
+            db.execute(text("SELECT 1"))
+        except OperationalError as e:
+            pytest.skip(f"Database not available: {e.orig}")
+        if not pgvector_disponible():
+            pytest.skip("pgvector extension not available; recognition uses the NumPy index")
+
+        indice = IndiceGaleria()
+        indice.cargar_desde_db(db)
+        print(f"   Embeddings in gallery: {len(indice)}")
+        if len(indice) == 0:
+            pytest.skip("No users with embeddings, nothing to compare")
+
+        usuarios = db.query(User.id, User.embedding).filter(User.embedding.isnot(None)).limit(20).all()
+        rng = np.random.default_rng(0)
+
+        coincidencias = 0
+        for user_id, embedding in usuarios:
+            consulta = np.asarray(embedding) + rng.normal(scale=1.0, size=len(embedding))
+            id_numpy, dist_numpy = indice.buscar_top_k(consulta, 1)[0]
+            vecinos = buscar_vecinos_pgvector(db, consulta, k=1)
+            id_pg, dist_pg = str(vecinos[0][0].id), vecinos[0][1]
+            if id_pg == id_numpy and abs(dist_pg - dist_numpy) < 1e-2 * max(1.0, dist_numpy):
+                coincidencias += 1
+            else:
+                print(f"   Mismatch for {user_id}: numpy={id_numpy} ({dist_numpy:.3f}) pgvector={id_pg} ({dist_pg:.3f})")
+
+        print(f"   Matching results: {coincidencias}/{len(usuarios)}")
+        # An ANN index may miss a few neighbours; require a high recall
+        assert coincidencias >= 0.9 * len(usuarios)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_pgvector_vs_numpy()
+    print("✅ pgvector search: PASSED")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the compact .npy PCA artifact produces exactly the
+same embeddings as the pickled scikit-learn model
+Requires models/pca_model.pkl (run init_model.py or entrenador_pca.py first)
+"""
+
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pytest
+
+from proyeccion_pca import cargar_proyeccion, exportar_desde_pickle
+
+RUTA_PICKLE = 'models/pca_model.pkl'
+
+def test_proyeccion_identica():
+    """Export the pickle, reload it memory-mapped and compare the projections"""
+    print("🔍 Testing compact PCA artifact against the pickled model...")
+    if not os.path.exists(RUTA_PICKLE):
+        pytest.skip(f"{RUTA_PICKLE} not found, nothing to compare")
+
+    with open(RUTA_PICKLE, 'rb') as f:
+        pca = pickle.load(f)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_npy = os.path.join(directorio, 'pca_model.npy')
+        exportar_desde_pickle(RUTA_PICKLE, ruta_npy)
+
+        inicio = time.perf_counter()
+        proyeccion = cargar_proyeccion(ruta_npy)
+        print(f"   Load time: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+        rng = np.random.default_rng(0)
+        # 1 fila (reconocimiento individual) y lotes (/recognize/batch)
+        for n in (1, 8, 32):
+            caras = rng.integers(0, 256, size=(n, pca.n_features_in_), dtype=np.uint8)
+            esperado = pca.transform(caras)
+            obtenido = proyeccion.transform(caras)
+            assert np.array_equal(esperado, obtenido), (
+                f"Mismatch for batch of {n}: max diff {np.abs(esperado - obtenido).max():.3e}"
+            )
+        del proyeccion
+
+def test_exportar_conserva_version():
+    """Upgrading a pickle-only install: exporting the pickle must not bump the model version"""
+    print("🔍 Testing the pickle export keeps the model version of a pickle-only install...")
+    from sklearn.decomposition import PCA
+    from modelos import RegistroModelos
+    from proyeccion_pca import leer_metadatos, publicar_proyeccion
+
+    rng = np.random.default_rng(0)
+    pca = PCA(n_components=5).fit(rng.normal(size=(40, 64)))
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_pickle = os.path.join(directorio, 'pca_model.pkl')
+        ruta_npy = os.path.join(directorio, 'pca_model.npy')
+        with open(ruta_pickle, 'wb') as f:
+            pickle.dump(pca, f)
+
+        # Antes de exportar, los embeddings guardados se etiquetan con esta versión
+        registro = RegistroModelos(ruta_pca=ruta_pickle, ruta_proyeccion=ruta_npy)
+        version_anterior = registro.version_pca()
+        assert version_anterior == 0
+
+        # Lo que hace init_model.py en el primer arranque tras actualizar
+        exportar_desde_pickle(ruta_pickle, ruta_npy)
+        assert leer_metadatos(ruta_npy)["version"] == version_anterior
+        assert registro.version_pca() == version_anterior
+        assert RegistroModelos(ruta_pca=ruta_pickle, ruta_proyeccion=ruta_npy).version_pca() == version_anterior
+
+        # Un reentrenamiento posterior sí publica una versión nueva
+        assert publicar_proyeccion(cargar_proyeccion(ruta_npy), ruta_npy)["version"] == version_anterior + 1
+
+if __name__ == "__main__":
+    test_proyeccion_identica()
+    print("✅ PCA artifact: PASSED")
+    test_exportar_conserva_version()
+    print("✅ Pickle export keeps the model version: PASSED")
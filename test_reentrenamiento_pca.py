@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the incremental PCA retraining on synthetic data:
+the incremental estimator continues from a published model, the linear
+re-projection of stored embeddings matches a fresh projection with the new
+model, and the publish path leaves the database and the gallery index on the
+new version, including users enrolled or deleted while it ran
+"""
+
+import os
+import tempfile
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import galeria
+import reentrenamiento_pca
+from database import Base, FaceEmbedding, User
+from proyeccion_pca import desde_sklearn, guardar_proyeccion, publicar_proyeccion
+from reentrenamiento_pca import ReentrenadorPCA, estimador_incremental, transformacion_reproyeccion
+
+PIXELES = 128
+# La columna vector de la base de datos fija la dimensión de los embeddings
+COMPONENTES = User.__table__.c.embedding.type.dim
+# Error relativo admitido frente a proyectar de nuevo el rostro original: el
+# embedding guardado ya no tiene la parte del rostro fuera de la base anterior
+TOLERANCIA = 0.1
+
+def rostros(rng, n, base):
+    """Low-rank synthetic 'faces': combinations of a few patterns plus small noise"""
+    return 128 + rng.normal(size=(n, len(base))) @ base * 20 + rng.normal(size=(n, PIXELES))
+
+def modelos(semilla=0):
+    """(anterior, nueva, rostros de prueba): a model and its incremental retraining"""
+    from sklearn.decomposition import IncrementalPCA
+
+    rng = np.random.default_rng(semilla)
+    base = rng.normal(size=(COMPONENTES, PIXELES))
+    anterior = desde_sklearn(IncrementalPCA(n_components=COMPONENTES).fit(rostros(rng, 200, base)))
+    ipca = estimador_incremental(anterior)
+    # Rostros nuevos con algo de variación que el modelo anterior no vio
+    base_nueva = base + 0.3 * rng.normal(size=base.shape)
+    ipca.partial_fit(rostros(rng, 100, base_nueva))
+    return anterior, desde_sklearn(ipca), rostros(rng, 30, base_nueva)
+
+def test_estimador_continua_el_ajuste():
+    """Continuing from a published model equals continuing the original IncrementalPCA"""
+    print("🔍 Testing the incremental estimator resumes the published state...")
+    from sklearn.decomposition import IncrementalPCA
+
+    rng = np.random.default_rng(1)
+    base = rng.normal(size=(COMPONENTES, PIXELES))
+    lote1, lote2 = rostros(rng, 120, base), rostros(rng, 80, base)
+
+    original = IncrementalPCA(n_components=COMPONENTES).fit(lote1)
+    reanudado = estimador_incremental(desde_sklearn(original))
+    assert reanudado.n_samples_seen_ == 120
+
+    original.partial_fit(lote2)
+    reanudado.partial_fit(lote2)
+    np.testing.assert_allclose(reanudado.mean_, original.mean_, rtol=1e-10)
+    np.testing.assert_allclose(np.abs(reanudado.components_), np.abs(original.components_), atol=1e-8)
+    np.testing.assert_allclose(reanudado.singular_values_, original.singular_values_, rtol=1e-10)
+
+def test_estimador_sin_estado():
+    """A model without its training state cannot be continued"""
+    anterior, _, _ = modelos()
+    anterior.metadatos = {}
+    with pytest.raises(ValueError):
+        estimador_incremental(anterior)
+
+def test_reproyeccion_igual_a_proyectar():
+    """e_old @ R + b matches projecting with the new model"""
+    print("🔍 Testing the linear re-projection against a fresh projection...")
+    anterior, nueva, caras = modelos()
+    R, b = transformacion_reproyeccion(anterior, nueva)
+
+    # Exacta para la parte del rostro contenida en la base anterior
+    embeddings = anterior.transform(caras)
+    reconstruidos = np.asarray(anterior.media) + embeddings @ np.asarray(anterior.componentes)
+    np.testing.assert_allclose(embeddings @ R + b, nueva.transform(reconstruidos), rtol=1e-9, atol=1e-6)
+
+    # Y cercana a proyectar el rostro original
+    frescos = nueva.transform(caras)
+    error = np.linalg.norm(embeddings @ R + b - frescos, axis=1) / np.linalg.norm(frescos, axis=1)
+    assert error.max() < TOLERANCIA
+
+@pytest.fixture
+def entorno(monkeypatch):
+    """Temporary SQLite database, model directory and gallery index"""
+    with tempfile.TemporaryDirectory() as directorio:
+        engine = create_engine(f"sqlite:///{os.path.join(directorio, 'test.db')}")
+        Base.metadata.create_all(engine, tables=[User.__table__, FaceEmbedding.__table__])
+        sesiones = sessionmaker(bind=engine, autoflush=False)
+        monkeypatch.setattr("database.SessionLocal", sesiones)
+
+        ruta_npy = os.path.join(directorio, "pca_model.npy")
+        monkeypatch.setattr(
+            reentrenamiento_pca, "publicar_proyeccion",
+            lambda proyeccion, origen=None: publicar_proyeccion(proyeccion, ruta_npy, origen)
+        )
+        indice = galeria.IndiceGaleria(agregacion="min")
+        monkeypatch.setattr(galeria, "indice_galeria", indice)
+        yield sesiones, ruta_npy, indice
+        engine.dispose()
+
+def inscribir(sesiones, caras, modelo, version):
+    """One user per face, with the face as its enrollment sample; returns the user IDs"""
+    db = sesiones()
+    ids = []
+    fecha = datetime(2024, 1, 1)
+    for cara in caras:
+        embedding = modelo.transform(cara[None, :])[0].tolist()
+        user = User(id=uuid.uuid4(), name="Nombre Apellido", email=f"{uuid.uuid4()}@x.com",
+                    embedding=embedding, model_version=version, created_at=fecha, updated_at=fecha)
+        user.muestras.append(FaceEmbedding(embedding=embedding, model_version=version, source="enrollment"))
+        db.add(user)
+        ids.append(user.id)
+    db.commit()
+    db.close()
+    return ids
+
+def test_publicar_reproyecta_bd_e_indice(entorno, monkeypatch):
+    """After publishing, every row and the index are on the new version, close to a fresh projection"""
+    print("🔍 Testing the retraining publish path on SQLite...")
+    sesiones, ruta_npy, indice = entorno
+    anterior, nueva, caras = modelos()
+    guardar_proyeccion(anterior, ruta_npy, version=0)
+
+    ids = inscribir(sesiones, caras[:20], anterior, 0)
+    # Una muestra de una versión aún más antigua queda para la re-extracción
+    db = sesiones()
+    db.add(FaceEmbedding(user_id=ids[0], embedding=[0.0] * COMPONENTES, model_version=-1, source="sample"))
+    db.commit()
+    db.close()
+
+    # Durante la publicación otra petición inscribe dos usuarios y elimina uno
+    publicar = reentrenamiento_pca.publicar_proyeccion
+    tardios = []
+
+    def publicar_con_escrituras(proyeccion, origen=None):
+        tardios.extend(inscribir(sesiones, caras[20:22], anterior, 0))
+        db = sesiones()
+        db.delete(db.get(User, ids[1]))
+        db.commit()
+        db.close()
+        return publicar(proyeccion, origen)
+    monkeypatch.setattr(reentrenamiento_pca, "publicar_proyeccion", publicar_con_escrituras)
+
+    reentrenador = ReentrenadorPCA(tamaño_bloque=7)
+    metadatos = reentrenador._reproyectar_y_publicar(anterior, nueva)
+    assert metadatos["version"] == 1
+    assert metadatos["source"] == "incremental"
+
+    db = sesiones()
+    usuarios = {u.id: u for u in db.query(User)}
+    muestras = db.query(FaceEmbedding).all()
+    db.close()
+    assert sorted(m.model_version for m in muestras) == [-1] + [1] * 21
+    assert all(u.model_version == 1 for u in usuarios.values())
+    # Re-proyectar no cuenta como actualización del usuario
+    assert all(u.updated_at == datetime(2024, 1, 1) for u in usuarios.values())
+
+    frescos = nueva.transform(caras)
+    for i, user_id in enumerate(ids[:1] + ids[2:20] + tardios):
+        fila = i if i == 0 else i + 1
+        obtenido = np.asarray(usuarios[user_id].embedding, dtype=np.float64)
+        error = np.linalg.norm(obtenido - frescos[fila]) / np.linalg.norm(frescos[fila])
+        assert error < TOLERANCIA
+
+    # El índice está en la versión nueva, con los inscritos durante la
+    # publicación y sin el eliminado
+    assert indice.version_modelo == 1
+    assert len(indice) == 21
+    assert str(ids[1]) not in {u for u, _ in indice.buscar_top_k(frescos[1], 21)}
+    for fila, user_id in [(0, ids[0]), (5, ids[5]), (20, tardios[0]), (21, tardios[1])]:
+        assert indice.buscar_top_k(frescos[fila], 1)[0][0] == str(user_id)
+
+if __name__ == "__main__":
+    test_estimador_continua_el_ajuste()
+    test_reproyeccion_igual_a_proyectar()
+    print("✅ Incremental PCA re-projection: PASSED")
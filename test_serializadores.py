@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the keyset pagination cursors of the user listings:
+cursors round-trip to the same ID, invalid cursors are rejected and paging
+through an in-memory SQLite table returns every user exactly once
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import User
+from serializadores import (
+    CAMPOS_LISTADO, CamposInvalidosError, CursorInvalidoError, SerializadorUsuario,
+    codificar_cursor, decodificar_cursor, paginar
+)
+
+def test_cursor_ida_y_vuelta():
+    """Encoding then decoding a cursor gives back the same user ID"""
+    print("🔍 Testing cursor round-trip...")
+    for user_id in [uuid.uuid4() for _ in range(50)] + [uuid.UUID(int=0), uuid.UUID(int=2**128 - 1)]:
+        cursor = codificar_cursor(user_id)
+        assert "=" not in cursor
+        assert decodificar_cursor(cursor) == user_id
+        # También acepta el ID como texto
+        assert decodificar_cursor(codificar_cursor(str(user_id))) == user_id
+
+@pytest.mark.parametrize("cursor", ["", "abc", "!!!!", "AAAA", codificar_cursor(uuid.uuid4()) + "AA"])
+def test_cursor_invalido(cursor):
+    """Cursors not produced by codificar_cursor raise CursorInvalidoError"""
+    with pytest.raises(CursorInvalidoError):
+        decodificar_cursor(cursor)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    User.__table__.create(engine)
+    sesion = sessionmaker(bind=engine)()
+    for i in range(23):
+        sesion.add(User(id=uuid.uuid4(), name=f"Nombre{i} Apellido Dos", email=f"u{i}@x.com", telefono=str(i)))
+    sesion.commit()
+    yield sesion
+    sesion.close()
+    engine.dispose()
+
+def test_paginar_recorre_todo(db):
+    """Pages follow ID order and together contain every user once"""
+    print("🔍 Testing keyset pagination over all pages...")
+    serializador = SerializadorUsuario(CAMPOS_LISTADO)
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        filas, cursor = paginar(serializador.consulta(db), cursor, limite=5)
+        vistos.extend(serializador(fila)["id"] for fila in filas)
+        paginas += 1
+        if cursor is None:
+            break
+    esperados = sorted(str(user_id) for (user_id,) in db.query(User.id))
+    assert paginas == 5
+    assert vistos == esperados
+
+    # Sin límite se devuelve todo lo restante y no hay página siguiente
+    filas, siguiente = paginar(serializador.consulta(db), codificar_cursor(esperados[9]))
+    assert [str(fila.id) for fila in filas] == esperados[10:]
+    assert siguiente is None
+
+def test_paginar_cursor_invalido(db):
+    with pytest.raises(CursorInvalidoError):
+        paginar(db.query(User.id), "no-es-un-cursor", limite=5)
+
+def test_serializador_campos():
+    """Only the requested columns are selected; unknown fields are rejected"""
+    serializador = SerializadorUsuario.desde_parametro("email, nombre", CAMPOS_LISTADO)
+    assert [columna.key for columna in serializador.columnas()] == ["id", "email", "name"]
+    with pytest.raises(CamposInvalidosError):
+        SerializadorUsuario.desde_parametro("email,embedding", CAMPOS_LISTADO)
+
+if __name__ == "__main__":
+    test_cursor_ida_y_vuelta()
+    print("✅ Pagination cursor round-trip: PASSED")